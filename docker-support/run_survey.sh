@@ -32,6 +32,15 @@ echo "Running survey..."
 echo "Running migrations"
 python manage.py migrate
 
+# The uwsgi processes write their metrics in a shared directory, the metrics of the previous run are discarded
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-"/tmp/prometheus-survey"}
+rm -rf ${PROMETHEUS_MULTIPROC_DIR} && mkdir -p ${PROMETHEUS_MULTIPROC_DIR}
 
 
+
+if [[ "${SURVEY_SERVER}" == "asgi" ]]; then
+    # the async views serve many requests from each process while their calls to the platform are in flight
+    exec uvicorn wenet_survey.asgi:application --host 0.0.0.0 --port 80 --workers ${ASGI_WORKERS:-2} --lifespan off
+fi
+
 exec uwsgi --ini=./uwsgi.ini --socket=0.0.0.0:80 --static-map "/${BASE_URL}static/=/var/www/static" 
@@ -8,8 +8,22 @@ echo "Running worker..."
 # This will allow for an easier automatisation of the docker support creation.
 #
 
-
-
-
-exec celery -A wenet_survey worker -B -l INFO --scheduler django_celery_beat.schedulers:DatabaseScheduler
-
+# The queues consumed by the worker, a deployment can run a separate worker for each queue with its own concurrency
+# and prefetch. The `celery` queue is still consumed by default for the tasks published before the queues were split.
+WORKER_QUEUES=${WORKER_QUEUES:-"profile_updates,recovery,maintenance,celery"}
+WORKER_PREFETCH_MULTIPLIER=${WORKER_PREFETCH_MULTIPLIER:-"4"}
+WORKER_BEAT=${WORKER_BEAT:-"1"}
+
+# The processes of the pool write their metrics in a shared directory, the metrics of the previous run are discarded
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-"/tmp/prometheus-worker"}
+rm -rf ${PROMETHEUS_MULTIPROC_DIR} && mkdir -p ${PROMETHEUS_MULTIPROC_DIR}
+
+WORKER_OPTIONS="-Q ${WORKER_QUEUES} --prefetch-multiplier ${WORKER_PREFETCH_MULTIPLIER}"
+if [[ -n "${WORKER_CONCURRENCY}" ]]; then
+    WORKER_OPTIONS="${WORKER_OPTIONS} --concurrency ${WORKER_CONCURRENCY}"
+fi
+if [[ ${WORKER_BEAT} == 1 ]]; then
+    WORKER_OPTIONS="${WORKER_OPTIONS} -B --scheduler django_celery_beat.schedulers:DatabaseScheduler"
+fi
+
+exec celery -A wenet_survey worker -l INFO ${WORKER_OPTIONS}
@@ -0,0 +1,71 @@
+from __future__ import absolute_import, annotations
+
+import random
+import time
+import uuid
+from typing import Callable, List
+
+from django.core.management.base import BaseCommand
+
+from authentication.models import CachedCredentials
+from common.cache import DjangoCacheCredentials
+from common.db import delete_in_batches
+
+
+class Command(BaseCommand):
+
+    help = "Measure the latency of the credentials cache operations while the cached credentials table grows"
+
+    KEY_PREFIX = "benchmark-"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000000, help="The number of rows of the table at the last checkpoint (default 1000000)")
+        parser.add_argument("--checkpoints", type=int, default=4, help="The number of table sizes, growing by a factor of 10, to measure (default 4)")
+        parser.add_argument("--samples", type=int, default=500, help="The number of measured calls for each operation (default 500)")
+        parser.add_argument("--batch-size", type=int, default=10000, help="The number of rows inserted by each statement while filling the table (default 10000)")
+        parser.add_argument("--keep", action="store_true", help="Do not delete the benchmark rows at the end")
+
+    def handle(self, *args, **options):
+        sizes = [max(options["rows"] // 10 ** exponent, 1) for exponent in reversed(range(options["checkpoints"]))]
+        cache = DjangoCacheCredentials()
+        data = {"access_token": uuid.uuid4().hex, "refresh_token": uuid.uuid4().hex}
+
+        self.stdout.write(f"{'rows':>10} {'operation':>12} {'median ms':>10} {'p99 ms':>10}")
+        rows = 0
+        try:
+            for size in sizes:
+                rows = self._fill(rows, size, options["batch_size"], data)
+                samples = options["samples"]
+                self._report(size, "get", self._measure(lambda: cache.get(self._random_key(rows)), samples))
+                self._report(size, "cache", self._measure(lambda: cache.cache(data, key=self._random_key(rows)), samples))
+                self._report(size, "update_key", self._measure(lambda: cache.update_key(cache.cache(data), self._random_key(rows)), samples))
+        finally:
+            if not options["keep"]:
+                self._clean(options["batch_size"])
+
+    def _fill(self, rows: int, size: int, batch_size: int, data: dict) -> int:
+        while rows < size:
+            batch = [CachedCredentials(key=f"{self.KEY_PREFIX}{index}", data=data) for index in range(rows, min(rows + batch_size, size))]
+            CachedCredentials.objects.bulk_create(batch)
+            rows += len(batch)
+        return rows
+
+    def _clean(self, batch_size: int) -> None:
+        delete_in_batches(CachedCredentials.objects.filter(key__startswith=self.KEY_PREFIX), batch_size)
+
+    def _random_key(self, rows: int) -> str:
+        return f"{self.KEY_PREFIX}{random.randrange(rows)}"
+
+    @staticmethod
+    def _measure(operation: Callable[[], object], samples: int) -> List[float]:
+        durations = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            operation()
+            durations.append((time.perf_counter() - start) * 1000)
+        return sorted(durations)
+
+    def _report(self, size: int, operation: str, durations: List[float]) -> None:
+        median = durations[len(durations) // 2]
+        p99 = durations[min(int(len(durations) * 0.99), len(durations) - 1)]
+        self.stdout.write(f"{size:>10} {operation:>12} {median:>10.3f} {p99:>10.3f}")
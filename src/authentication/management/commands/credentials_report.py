@@ -0,0 +1,49 @@
+from __future__ import absolute_import, annotations
+
+from datetime import timedelta
+from typing import Optional
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from authentication.models import CachedCredentials
+from common.credentials import CredentialsCollector
+
+
+class Command(BaseCommand):
+
+    help = "Report the growth of the cached credentials table and, optionally, purge the orphaned and the idle credentials"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--purge", action="store_true", help="Delete the orphaned and the idle credentials")
+        parser.add_argument("--batch-size", type=int, default=None, help="The maximum number of rows deleted by each transaction")
+
+    def handle(self, *args, **options):
+        collector = CredentialsCollector()
+        now = timezone.now()
+
+        self.stdout.write(f"Cached credentials: {CachedCredentials.objects.count()}")
+        for days in [1, 7, 30]:
+            self.stdout.write(f"  created in the last {days} day(s): {CachedCredentials.objects.filter(created_at__gte=now - timedelta(days=days)).count()}")
+        self.stdout.write(f"  without a refreshable token: {CachedCredentials.objects.filter(expires_at__isnull=True).count()}")
+        self.stdout.write(f"  orphaned: {collector.orphaned().count()}")
+        self.stdout.write(f"  idle: {collector.idle().count()}")
+        table_size = self._table_size()
+        if table_size is not None:
+            self.stdout.write(f"  table size: {table_size} bytes")
+
+        if options["purge"]:
+            deleted = collector.purge(options["batch_size"])
+            self.stdout.write(f"Reclaimed {deleted['orphaned'] + deleted['idle']} rows ({deleted['orphaned']} orphaned, {deleted['idle']} idle)")
+            if table_size is not None:
+                # the space of the deleted rows is reused by the table once vacuumed, it is not returned to the system
+                self.stdout.write(f"  table size after the purge: {self._table_size()} bytes")
+
+    @staticmethod
+    def _table_size() -> Optional[int]:
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_total_relation_size(%s)", [CachedCredentials._meta.db_table])
+            return cursor.fetchone()[0]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.6 on 2026-10-19 09:12
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicated_keys(apps, schema_editor):
+    # keep only the most recent credentials for each key, otherwise the unique index can not be created
+    CachedCredentials = apps.get_model("authentication", "CachedCredentials")
+    duplicated_keys = CachedCredentials.objects.values("key").annotate(count=Count("id"), last_id=Max("id")).filter(count__gt=1)
+    for duplicated_key in duplicated_keys.iterator():
+        CachedCredentials.objects.filter(key=duplicated_key["key"]).exclude(id=duplicated_key["last_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_alter_cachedcredentials_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicated_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cachedcredentials',
+            name='key',
+            field=models.CharField(max_length=1024, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.6 on 2026-10-19 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_cachedcredentials_unique_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cachedcredentials',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.6 on 2026-10-19 11:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_cachedcredentials_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cachedcredentials',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='cachedcredentials',
+            name='last_used_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
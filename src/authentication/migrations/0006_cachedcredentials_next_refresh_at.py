@@ -0,0 +1,18 @@
+# Generated by Django 3.2.6 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_cachedcredentials_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cachedcredentials',
+            name='next_refresh_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
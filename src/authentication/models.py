@@ -1,12 +1,17 @@
 from __future__ import absolute_import, annotations
 
 from django.db import models
+from django.utils import timezone
 
 
 class CachedCredentials(models.Model):
 
-    key = models.CharField(max_length=1024)
+    key = models.CharField(max_length=1024, unique=True)
     data = models.JSONField()
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)  # expiration of the access token, None when it can not be refreshed
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    next_refresh_at = models.DateTimeField(null=True, blank=True)  # set after a refresh failed for a transient error, the background refresh skips the credentials until then
 
     class Meta:
 
@@ -1,11 +1,22 @@
+import asyncio
+import time
+from datetime import timedelta
 from unittest.mock import patch
 
+from asgiref.sync import async_to_sync
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TestCase, Client
+from django.core.cache import caches
+from django.test import AsyncClient, TestCase, Client, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from prometheus_client import REGISTRY
 from wenet.model.user.profile import WeNetUserProfile
 from wenet.model.user.token import TokenDetails
 
+from authentication.models import CachedCredentials
+from common.cache import DjangoCacheCredentials, LocalCache
+
 
 class TestHomeView(TestCase):
 
@@ -27,3 +38,217 @@ class TestHomeView(TestCase):
                 self.assertEqual(200, response.status_code)
                 mock_get_profile.assert_called_once()
                 mock_token_details.assert_called_once()
+
+    def test_async_view(self):
+        view = resolve("/").func
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertEqual("HomeView", view.view_class.__name__)
+
+    def test_method_not_allowed(self):
+        client = Client()
+        for path in ["/", "/oauth/", "/survey/"]:
+            self.assertEqual(405, client.post(path).status_code)
+            self.assertEqual(405, client.delete(path).status_code)
+            response = client.options(path)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual("0", response["Content-Length"])
+
+    def test_concurrent_requests(self):
+        def get_user_profile(profile_id: str) -> WeNetUserProfile:
+            time.sleep(0.5)
+            return WeNetUserProfile.empty(profile_id)
+
+        with patch("wenet.interface.service_api.ServiceApiInterface.get_token_details", return_value=TokenDetails("1", "1", [])):
+            with patch("wenet.interface.service_api.ServiceApiInterface.get_user_profile", side_effect=get_user_profile):
+                client = AsyncClient()
+                session = client.session
+                session["has_logged"] = True
+                session["resource_id"] = "1"
+                session.save()
+
+                async def get_home_pages():
+                    return await asyncio.gather(*[client.get("/") for _ in range(5)])
+
+                start = time.monotonic()
+                responses = async_to_sync(get_home_pages)()
+
+                # the calls to the platform of the requests are in flight at the same time
+                self.assertLess(time.monotonic() - start, 2)
+                self.assertEqual([200] * 5, [response.status_code for response in responses])
+
+
+class TestOauthView(TestCase):
+
+    def test_login(self):
+        with patch("wenet.interface.client.Oauth2Client.initialize_with_code"):
+            with patch("wenet.interface.service_api.ServiceApiInterface.get_token_details", return_value=TokenDetails("1", "1", [])):
+                with patch("common.cache.DjangoCacheCredentials.update_key") as mock_update_key:
+                    client = Client()
+                    response = client.get("/oauth/", {"code": "code"})
+
+                    self.assertEqual(302, response.status_code)
+                    mock_update_key.assert_called_once()
+                    self.assertTrue(client.session["has_logged"])
+                    self.assertEqual("1", client.session["resource_id"])
+
+    def test_login_error(self):
+        with patch("wenet.interface.client.Oauth2Client.initialize_with_code", side_effect=Exception()):
+            client = Client()
+            response = client.get("/oauth/", {"code": "code"})
+
+            self.assertEqual(200, response.status_code)
+            self.assertFalse(client.session.get("has_logged", False))
+
+
+class TestDjangoCacheCredentials(TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        DjangoCacheCredentials.clear_local_cache()
+        DjangoCacheCredentials.statistics.reset()
+
+    def test_cache(self):
+        cache = DjangoCacheCredentials()
+        key = cache.cache({"token": "1"})
+        self.assertEqual({"token": "1"}, cache.get(key))
+
+        self.assertEqual(key, cache.cache({"token": "2"}, key=key))
+        self.assertEqual({"token": "2"}, cache.get(key))
+        self.assertEqual(1, CachedCredentials.objects.filter(key=key).count())
+
+    def test_get_missing_key(self):
+        self.assertIsNone(DjangoCacheCredentials().get("missing"))
+
+    def test_update_key(self):
+        cache = DjangoCacheCredentials()
+        key = cache.cache({"token": "1"})
+        self.assertEqual("wenetId", cache.update_key(key, "wenetId"))
+        self.assertIsNone(cache.get(key))
+        self.assertEqual({"token": "1"}, cache.get("wenetId"))
+
+    def test_update_key_existing_credentials(self):
+        cache = DjangoCacheCredentials()
+        cache.cache({"token": "old"}, key="wenetId")
+        key = cache.cache({"token": "new"})
+        self.assertEqual("wenetId", cache.update_key(key, "wenetId"))
+        self.assertEqual(1, CachedCredentials.objects.count())
+        self.assertEqual({"token": "new"}, cache.get("wenetId"))
+
+    def test_update_key_missing_credentials(self):
+        cache = DjangoCacheCredentials()
+        cache.cache({"token": "old"}, key="wenetId")
+        with self.assertRaises(CachedCredentials.DoesNotExist):
+            cache.update_key("missing", "wenetId")
+        self.assertEqual({"token": "old"}, cache.get("wenetId"))
+
+    def test_get_from_local_cache(self):
+        cache = DjangoCacheCredentials()
+        with self.captureOnCommitCallbacks(execute=True):
+            key = cache.cache({"token": "1"})
+        CachedCredentials.objects.filter(key=key).update(data={"token": "2"})
+        self.assertEqual({"token": "1"}, cache.get(key))
+        self.assertEqual(1, DjangoCacheCredentials.statistics.to_repr()[DjangoCacheCredentials.LOCAL_TIER]["hits"])
+
+        cache.invalidate(key)
+        self.assertEqual({"token": "2"}, cache.get(key))
+        self.assertEqual(1, DjangoCacheCredentials.statistics.to_repr()[DjangoCacheCredentials.DATABASE_TIER]["hits"])
+
+    def test_local_cache_bounded_by_expiration(self):
+        cache = DjangoCacheCredentials()
+        with self.captureOnCommitCallbacks(execute=True):
+            key = cache.cache({"token": "1"}, expires_in=0)
+        CachedCredentials.objects.filter(key=key).update(data={"token": "2"})
+        # the expired access token is not kept by the process, the read goes to the database
+        self.assertEqual({"token": "2"}, cache.get(key))
+
+    def test_local_cache_add(self):
+        local_cache = LocalCache(10)
+        self.assertTrue(local_cache.add("key", {"token": "1"}, 10))
+        self.assertFalse(local_cache.add("key", {"token": "2"}, 10))
+        self.assertFalse(local_cache.add("other", {"token": "1"}, 0))
+        self.assertEqual({"token": "1"}, local_cache.get("key"))
+        self.assertIsNone(local_cache.get("other"))
+
+    def test_lookups_metric(self):
+        def lookups(tier: str, outcome: str) -> float:
+            return REGISTRY.get_sample_value("survey_credentials_cache_lookups_total", {"tier": tier, "outcome": outcome}) or 0
+
+        local_misses = lookups(DjangoCacheCredentials.LOCAL_TIER, "miss")
+        database_hits = lookups(DjangoCacheCredentials.DATABASE_TIER, "hit")
+        local_hits = lookups(DjangoCacheCredentials.LOCAL_TIER, "hit")
+        cache = DjangoCacheCredentials()
+        key = cache.cache({"token": "1"})
+        cache.get(key)
+        cache.get(key)
+
+        self.assertEqual(local_misses + 1, lookups(DjangoCacheCredentials.LOCAL_TIER, "miss"))
+        self.assertEqual(database_hits + 1, lookups(DjangoCacheCredentials.DATABASE_TIER, "hit"))
+        self.assertEqual(local_hits + 1, lookups(DjangoCacheCredentials.LOCAL_TIER, "hit"))
+
+    @override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "credentials": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "credentials"}
+    })
+    def test_get_from_shared_cache(self):
+        cache = DjangoCacheCredentials()
+        with self.captureOnCommitCallbacks(execute=True):
+            key = cache.cache({"token": "1"})
+        CachedCredentials.objects.filter(key=key).delete()
+        DjangoCacheCredentials.clear_local_cache()
+        self.assertEqual({"token": "1"}, cache.get(key))
+        statistics = DjangoCacheCredentials.statistics.to_repr()
+        self.assertEqual(1.0, statistics[DjangoCacheCredentials.SHARED_TIER]["hit_ratio"])
+        self.assertNotIn(DjangoCacheCredentials.DATABASE_TIER, statistics)
+
+    def test_update_key_invalidates_cached_credentials(self):
+        cache = DjangoCacheCredentials()
+        with self.captureOnCommitCallbacks(execute=True):
+            cache.cache({"token": "old"}, key="wenetId")
+        self.assertEqual({"token": "old"}, cache.get("wenetId"))
+        key = cache.cache({"token": "new"})
+        cache.update_key(key, "wenetId")
+        self.assertEqual({"token": "new"}, cache.get("wenetId"))
+
+    def test_get_updates_last_use(self):
+        cache = DjangoCacheCredentials()
+        key = cache.cache({"token": "1"})
+        CachedCredentials.objects.filter(key=key).update(last_used_at=timezone.now() - timedelta(days=1))
+        DjangoCacheCredentials.clear_local_cache()
+
+        cache.get(key)
+        self.assertGreater(CachedCredentials.objects.get(key=key).last_used_at, timezone.now() - timedelta(minutes=1))
+
+    def _get_database_during_write(self, cache: DjangoCacheCredentials):
+        get_database = cache._get_database
+
+        def read_then_write(key: str):
+            # the row is loaded before a concurrent write commits and fills the upper tiers
+            loaded = get_database(key)
+            with self.captureOnCommitCallbacks(execute=True):
+                DjangoCacheCredentials().cache({"token": "new"}, key=key)
+            return loaded
+
+        return patch.object(cache, "_get_database", side_effect=read_then_write)
+
+    def test_read_fill_does_not_overwrite_write(self):
+        cache = DjangoCacheCredentials()
+        cache.cache({"token": "old"}, key="wenetId")
+
+        with self._get_database_during_write(cache):
+            self.assertEqual({"token": "old"}, cache.get("wenetId"))
+        self.assertEqual({"token": "new"}, cache.get("wenetId"))
+
+    @override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "credentials": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "credentials-fill"}
+    })
+    def test_read_fill_does_not_overwrite_shared_write(self):
+        cache = DjangoCacheCredentials()
+        cache.cache({"token": "old"}, key="wenetId")
+
+        with self._get_database_during_write(cache):
+            self.assertEqual({"token": "old"}, cache.get("wenetId"))
+        self.assertEqual({"token": "new"}, cache.get("wenetId"))
+        DjangoCacheCredentials.clear_local_cache()
+        self.assertEqual({"token": "new"}, cache.get("wenetId"))
+        self.assertEqual({"token": "new"}, caches[DjangoCacheCredentials.SHARED_CACHE_ALIAS].get("credentials:wenetId"))
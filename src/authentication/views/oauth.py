@@ -2,44 +2,32 @@ from __future__ import absolute_import, annotations
 
 import logging
 import uuid
+from typing import Optional
 
 from django.conf import settings
+from django.http import HttpRequest
 from django.shortcuts import redirect, render
 from django.utils import translation
-from rest_framework.request import Request
-from rest_framework.views import APIView
 from wenet.interface.client import Oauth2Client
 from wenet.interface.service_api import ServiceApiInterface
 
+from common.asynchronous import AsyncView, load_session, run_blocking
 from common.cache import DjangoCacheCredentials
 from wenet_survey.mixin import ActivateTranslationMixin
 
 logger = logging.getLogger("wenet-survey-web-app.authentication.views.oauth")
 
 
-class OauthView(ActivateTranslationMixin, APIView):
+class OauthView(ActivateTranslationMixin, AsyncView):
 
-    def get(self, request: Request):
+    async def get(self, request: HttpRequest):
         super().initialize_translations()
+        await load_session(request)
         if not request.session.get("has_logged", False):
             try:
-                oauth2_code = request.query_params.get("code", None)
-                resource_id = str(uuid.uuid4())
-                cache = DjangoCacheCredentials()
-                client = Oauth2Client.initialize_with_code(
-                    settings.WENET_APP_ID,
-                    settings.WENET_APP_SECRET,
-                    oauth2_code,
-                    settings.OAUTH_CALLBACK_URL,
-                    resource_id,
-                    cache,
-                    token_endpoint_url=f"{settings.WENET_INSTANCE_URL}/api/oauth2/token"
-                )
-                service_api_interface = ServiceApiInterface(client, platform_url=settings.WENET_INSTANCE_URL)
-                token_details = service_api_interface.get_token_details()
-                cache.update_key(resource_id, token_details.profile_id)
+                profile_id = await run_blocking(self._login, request.GET.get("code", None))
                 request.session["has_logged"] = True
-                request.session["resource_id"] = token_details.profile_id
+                request.session["resource_id"] = profile_id
                 return redirect(f"/{settings.BASE_URL}")
             except Exception as e:
                 logger.exception("Something went wrong during the login operation", exc_info=e)
@@ -53,3 +41,24 @@ class OauthView(ActivateTranslationMixin, APIView):
                 return render(request, "error.html", context=context)
         else:
             return redirect(f"/{settings.BASE_URL}")
+
+    @staticmethod
+    def _login(oauth2_code: Optional[str]) -> str:
+        """
+        Exchange the code for the credentials of the user and store them by the id of the user, that is returned.
+        """
+        resource_id = str(uuid.uuid4())
+        cache = DjangoCacheCredentials()
+        client = Oauth2Client.initialize_with_code(
+            settings.WENET_APP_ID,
+            settings.WENET_APP_SECRET,
+            oauth2_code,
+            settings.OAUTH_CALLBACK_URL,
+            resource_id,
+            cache,
+            token_endpoint_url=f"{settings.WENET_INSTANCE_URL}/api/oauth2/token"
+        )
+        service_api_interface = ServiceApiInterface(client, platform_url=settings.WENET_INSTANCE_URL)
+        token_details = service_api_interface.get_token_details()
+        cache.update_key(resource_id, token_details.profile_id)
+        return token_details.profile_id
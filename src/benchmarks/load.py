@@ -0,0 +1,118 @@
+from __future__ import absolute_import, annotations
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+from benchmarks.payloads import TallyPayloadGenerator
+from common.cache import DjangoCacheCredentials
+from common.ratelimit import RateLimiter
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    return {
+        "p50": ordered[len(ordered) // 2],
+        "p90": ordered[min(int(len(ordered) * 0.9), len(ordered) - 1)],
+        "p99": ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)],
+        "max": ordered[-1]
+    }
+
+
+class LoadDriver:
+    """
+    Submit survey events to the webhook of the web app at a constant rate and measure the whole pipeline against a
+    fake platform:
+
+    * the webhook latency, from the POST of the event to the response of the web app;
+    * the queue lag, from the POST of the event to the first read of the profile by a worker;
+    * the end-to-end latency, from the POST of the event to the last write of the profile.
+    """
+
+    def __init__(self, webhook_url: str, platform_url: str, rate: float = 10, concurrency: int = 8, fields: int = 91, timeout: float = 10) -> None:
+        self.webhook_url = webhook_url
+        self.platform_url = platform_url.rstrip("/")
+        self.rate = rate
+        self.concurrency = concurrency
+        self.fields = fields
+        self.timeout = timeout
+        self.submissions: Dict[str, float] = {}
+        self.webhook_latencies: List[float] = []
+        self.webhook_statuses: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def seed_credentials(self, wenet_ids: List[str]) -> None:
+        cache = DjangoCacheCredentials()
+        for wenet_id in wenet_ids:
+            token = uuid.uuid4().hex
+            # both the names used for the access token, the fake platform accepts any token
+            cache.cache({"token": token, "access_token": token, "refresh_token": uuid.uuid4().hex}, key=wenet_id, touch=False)
+
+    def run(self, events: int, run_id: Optional[str] = None) -> None:
+        """
+        Submit the events, each one from a different synthetic user.
+        """
+        run_id = run_id if run_id is not None else uuid.uuid4().hex[:8]
+        wenet_ids = [f"load-{run_id}-{index}" for index in range(events)]
+        self.seed_credentials(wenet_ids)
+        requests.post(f"{self.platform_url}/_reset", timeout=self.timeout)
+
+        payloads = [TallyPayloadGenerator(self.fields, seed=index).generate(wenet_id) for index, wenet_id in enumerate(wenet_ids)]
+        rate_limiter = RateLimiter(self.rate)
+        session = requests.Session()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for wenet_id, payload in zip(wenet_ids, payloads):
+                rate_limiter.acquire()
+                executor.submit(self._submit, session, wenet_id, payload)
+
+    def _submit(self, session: requests.Session, wenet_id: str, payload: dict) -> None:
+        submitted_at = time.time()
+        start = time.perf_counter()
+        try:
+            status = session.post(self.webhook_url, json=payload, timeout=self.timeout).status_code
+        except requests.RequestException:
+            status = 0
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.webhook_statuses[status] = self.webhook_statuses.get(status, 0) + 1
+            if status == 200:
+                self.submissions[wenet_id] = submitted_at
+                self.webhook_latencies.append(latency)
+
+    def wait(self, timeout: float, poll_interval: float = 1) -> dict:
+        """
+        Wait until the profile of each submitted event is written by the workers or the timeout expires.
+
+        :return: The statistics of the platform
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            statistics = requests.get(f"{self.platform_url}/_stats", timeout=self.timeout).json()
+            completed = sum(1 for wenet_id in self.submissions if wenet_id in statistics["users"])
+            if completed >= len(self.submissions) or time.monotonic() >= deadline:
+                return statistics
+            time.sleep(poll_interval)
+
+    def report(self, statistics: dict) -> dict:
+        users = statistics["users"]
+        queue_lags = [users[wenet_id]["first_read"] - submitted_at for wenet_id, submitted_at in self.submissions.items() if wenet_id in users and users[wenet_id]["first_read"] is not None]
+        end_to_end = [users[wenet_id]["last_write"] - submitted_at for wenet_id, submitted_at in self.submissions.items() if wenet_id in users]
+        completions = [users[wenet_id]["last_write"] for wenet_id in self.submissions if wenet_id in users]
+        first_submission = min(self.submissions.values()) if self.submissions else None
+        duration = max(completions) - first_submission if completions and first_submission is not None else None
+        return {
+            "submitted": len(self.submissions),
+            "completed": len(completions),
+            "webhook_statuses": {str(status): count for status, count in self.webhook_statuses.items()},
+            "platform_statuses": statistics["responses"],
+            "throughput": len(completions) / duration if duration else None,
+            "webhook_latency": percentiles(self.webhook_latencies),
+            "queue_lag": percentiles(queue_lags),
+            "end_to_end_latency": percentiles(end_to_end)
+        }
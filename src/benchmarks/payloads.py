@@ -0,0 +1,105 @@
+from __future__ import absolute_import, annotations
+
+import random
+import uuid
+from typing import List, Tuple
+
+from wenet.model.user.profile import WeNetUserProfile
+
+from ws.models.tally import NumberField, LinearScaleField, DropdownField, MultipleChoiceField, CheckboxesField, \
+    DateField, HiddenField
+
+
+def _production_questions() -> List[Tuple[str, str]]:
+    # the question codes read by the production rule set, with the type of their field in the survey form
+    questions = [("Q01", MultipleChoiceField.FIELD_TYPE), ("Q02", NumberField.FIELD_TYPE)]
+    questions += [(code, DropdownField.FIELD_TYPE) for code in ["Q03", "Q04", "Q05", "Q05a"]]
+    for prefix, count in [("Q06", 15), ("Q07", 8), ("Q08", 18), ("Q09", 20)]:
+        questions += [(f"{prefix}{chr(ord('a') + index)}", LinearScaleField.FIELD_TYPE) for index in range(count)]
+    questions += [(code, DropdownField.FIELD_TYPE) for code in ["Q10", "Q11", "Q12", "Q13"]]
+    questions += [(code, NumberField.FIELD_TYPE) for code in ["Q14", "Q15"]]
+    questions += [(f"Q{number}", DropdownField.FIELD_TYPE) for number in range(16, 23)]
+    questions += [("Q23", NumberField.FIELD_TYPE)]
+    questions += [(code, LinearScaleField.FIELD_TYPE) for code in ["Q24", "Q24a", "Q24b", "Q24c", "Q24d", "Q24e"]]
+    questions += [(code, NumberField.FIELD_TYPE) for code in ["Q25", "Q26", "Q27"]]
+    questions += [("Q28", DropdownField.FIELD_TYPE)]
+    return questions
+
+
+PRODUCTION_QUESTIONS = _production_questions()
+FILLER_FIELD_TYPES = [LinearScaleField.FIELD_TYPE, DropdownField.FIELD_TYPE, CheckboxesField.FIELD_TYPE, DateField.FIELD_TYPE]
+
+
+class TallyPayloadGenerator:
+    """
+    Generate synthetic Tally form response events.
+
+    The first fields answer the questions read by the production rule set, the following ones (if any) are filler
+    questions of the other types. Each choice field has `options` options and the generated values are deterministic
+    for a given seed.
+    """
+
+    def __init__(self, fields: int = len(PRODUCTION_QUESTIONS), options: int = 10, seed: int = 0) -> None:
+        self.fields = fields
+        self.options = options
+        self._random = random.Random(seed)
+
+    def questions(self) -> List[Tuple[str, str]]:
+        questions = PRODUCTION_QUESTIONS[:self.fields]
+        for index in range(self.fields - len(questions)):
+            questions.append((f"X{index + 1:03d}", FILLER_FIELD_TYPES[index % len(FILLER_FIELD_TYPES)]))
+        return questions
+
+    def generate(self, wenet_id: str = "1") -> dict:
+        fields = [{
+            "key": f"question_{uuid.UUID(int=self._random.getrandbits(128))}",
+            "label": "wenetId",
+            "type": HiddenField.FIELD_TYPE,
+            "value": wenet_id
+        }]
+        fields += [self._field(code, field_type) for code, field_type in self.questions()]
+        return {
+            "eventId": str(uuid.UUID(int=self._random.getrandbits(128))),
+            "eventType": "FORM_RESPONSE",
+            "createdAt": "2021-08-24T11:20:11.081Z",
+            "data": {
+                "responseId": str(uuid.UUID(int=self._random.getrandbits(128))),
+                "respondentId": "n9BX25",
+                "formId": "mR01vw",
+                "formName": "Benchmark survey",
+                "createdAt": "2021-08-24T11:20:10.000Z",
+                "fields": fields
+            }
+        }
+
+    def _field(self, code: str, field_type: str) -> dict:
+        field = {
+            "key": f"question_{code}",
+            "label": f"{code}: Benchmark question {code}",
+            "type": field_type
+        }
+        if field_type in [NumberField.FIELD_TYPE, LinearScaleField.FIELD_TYPE]:
+            field["value"] = self._random.randint(1, 5)
+        elif field_type == DateField.FIELD_TYPE:
+            field["value"] = f"{self._random.randint(1980, 2005)}-0{self._random.randint(1, 9)}-1{self._random.randint(0, 9)}"
+        else:
+            options = [{"id": str(uuid.UUID(int=self._random.getrandbits(128))), "text": f"{index + 1:02d}: Option {index + 1}"} for index in range(self.options)]
+            field["options"] = options
+            if field_type == CheckboxesField.FIELD_TYPE:
+                field["value"] = [option["id"] for option in self._random.sample(options, min(2, len(options)))]
+            else:
+                field["value"] = self._random.choice(options)["id"]
+        return field
+
+    @staticmethod
+    def profile(wenet_id: str = "1", size: int = 0) -> WeNetUserProfile:
+        """
+        Build a profile with `size` competences, meanings and materials that no rule of the survey updates, so each rule
+        scans all of them.
+        """
+        profile = WeNetUserProfile.empty(wenet_id)
+        for index in range(size):
+            profile.competences.append({"name": f"competence_{index}", "ontology": "benchmark", "level": 0.5})
+            profile.meanings.append({"name": f"meaning_{index}", "category": "benchmark", "level": 0.5})
+            profile.materials.append({"name": f"material_{index}", "classification": "benchmark", "description": "benchmark", "quantity": 1})
+        return profile
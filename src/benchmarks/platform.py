@@ -0,0 +1,196 @@
+from __future__ import absolute_import, annotations
+
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+logger = logging.getLogger("wenet-survey-web-app.benchmarks.platform")
+
+
+class FakePlatformState:
+    """
+    The profiles stored by the fake platform, with the time each user profile was first read and last written.
+    """
+
+    PROFILE_SECTIONS = ["competences", "meanings", "materials"]
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, error_rate: float = 0.0, rate_limit: Optional[float] = None) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.profiles: Dict[str, dict] = {}
+        self.sections: Dict[str, Dict[str, list]] = {}
+        self.first_reads: Dict[str, float] = {}
+        self.last_writes: Dict[str, float] = {}
+        self.responses: Dict[str, int] = {}
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._lock = threading.Lock()
+
+    def empty_profile(self, profile_id: str) -> dict:
+        return {
+            "id": profile_id,
+            "name": {"prefix": None, "first": "Benchmark", "middle": None, "last": "User", "suffix": None},
+            "dateOfBirth": {"year": None, "month": None, "day": None},
+            "gender": None,
+            "email": f"{profile_id}@benchmark.local",
+            "phoneNumber": None,
+            "locale": "en",
+            "avatar": None,
+            "nationality": None,
+            "occupation": None,
+            "creationTs": int(time.time()),
+            "lastUpdateTs": int(time.time()),
+            "norms": [],
+            "plannedActivities": [],
+            "relevantLocations": [],
+            "relationships": [],
+            "personalBehaviors": [],
+            "materials": [],
+            "competences": [],
+            "meanings": []
+        }
+
+    def throttled(self) -> bool:
+        if self.rate_limit is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1:
+                self._window_start = now
+                self._window_requests = 0
+            self._window_requests += 1
+            return self._window_requests > self.rate_limit
+
+    def count(self, status: int) -> None:
+        with self._lock:
+            self.responses[str(status)] = self.responses.get(str(status), 0) + 1
+
+    def read(self, profile_id: str, section: Optional[str]):
+        with self._lock:
+            self.first_reads.setdefault(profile_id, time.time())
+            if section is None:
+                return self.profiles.get(profile_id) or self.empty_profile(profile_id)
+            return self.sections.get(profile_id, {}).get(section, [])
+
+    def write(self, profile_id: str, section: Optional[str], body):
+        with self._lock:
+            if section is None:
+                self.profiles[profile_id] = body
+            else:
+                self.sections.setdefault(profile_id, {})[section] = body
+                if section == self.PROFILE_SECTIONS[-1]:
+                    # the materials are the last section written by a profile update
+                    self.last_writes[profile_id] = time.time()
+            return body
+
+    def statistics(self) -> dict:
+        with self._lock:
+            return {
+                "responses": dict(self.responses),
+                "users": {
+                    profile_id: {"first_read": self.first_reads.get(profile_id), "last_write": last_write}
+                    for profile_id, last_write in self.last_writes.items()
+                }
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.profiles.clear()
+            self.sections.clear()
+            self.first_reads.clear()
+            self.last_writes.clear()
+            self.responses.clear()
+
+
+class FakePlatformHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the endpoints of the WeNet platform used by the profile updates: the OAuth2 token endpoint and the
+    profile, competences, meanings and materials of the users in the service API.
+    """
+
+    PROFILE_PATH_REGEX = re.compile(r".*/user/profile/(?P<profile_id>[^/?]+)(?:/(?P<section>competences|meanings|materials))?/?(?:\?.*)?$")
+    TOKEN_PATH_REGEX = re.compile(r".*/oauth2/token/?$")
+
+    server: FakePlatformServer
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/_stats"):
+            self._reply(200, self.server.state.statistics(), simulate=False)
+            return
+        match = self.PROFILE_PATH_REGEX.match(self.path)
+        if match is None:
+            self._reply(404, {"code": "not_found"})
+        else:
+            self._reply(200, lambda: self.server.state.read(match.group("profile_id"), match.group("section")))
+
+    def do_PUT(self) -> None:
+        match = self.PROFILE_PATH_REGEX.match(self.path)
+        if match is None:
+            self._reply(404, {"code": "not_found"})
+        else:
+            body = self._read_body()
+            self._reply(200, lambda: self.server.state.write(match.group("profile_id"), match.group("section"), body))
+
+    def do_PATCH(self) -> None:
+        self.do_PUT()
+
+    def do_POST(self) -> None:
+        if self.path.startswith("/_reset"):
+            self.server.state.reset()
+            self._reply(200, {}, simulate=False)
+        elif self.TOKEN_PATH_REGEX.match(self.path):
+            self._read_body()
+            self._reply(200, {"access_token": uuid.uuid4().hex, "refresh_token": uuid.uuid4().hex, "token_type": "Bearer", "expires_in": 3600})
+        else:
+            self._reply(404, {"code": "not_found"})
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(length) if length > 0 else b""
+        try:
+            return json.loads(raw_body) if raw_body else None
+        except ValueError:
+            return raw_body.decode("utf-8", errors="replace")
+
+    def _reply(self, status: int, body, simulate: bool = True) -> None:
+        state = self.server.state
+        if simulate:
+            if state.throttled():
+                status, body = 429, {"code": "too_many_requests"}
+            else:
+                time.sleep(max(state.latency + random.uniform(-state.jitter, state.jitter), 0))
+                if random.random() < state.error_rate:
+                    status, body = 500, {"code": "internal_error"}
+        if callable(body):
+            body = body()
+
+        payload = json.dumps(body).encode("utf-8")
+        state.count(status)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class FakePlatformServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, address, state: FakePlatformState) -> None:
+        super().__init__(address, FakePlatformHandler)
+        self.state = state
@@ -0,0 +1,92 @@
+from __future__ import absolute_import, annotations
+
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+
+class BenchmarkRunner:
+    """
+    Time the benchmarked operations and compare the results with the ones of a previous run.
+
+    The results are stored as JSON, each one is identified by the name of the benchmark and its parameters.
+    """
+
+    def __init__(self, rounds: int = 200, warmup: int = 10) -> None:
+        self.rounds = rounds
+        self.warmup = warmup
+        self.results: List[dict] = []
+
+    def measure(self, name: str, operation: Callable[..., object], setup: Optional[Callable[[], object]] = None, **params) -> dict:
+        """
+        Time the operation.
+
+        :param name: The name of the benchmark
+        :param operation: The timed operation
+        :param setup: Called before each round, out of the timing, its result is passed to the operation
+        :param params: The parameters of the benchmark
+        :return: The statistics of the durations in milliseconds
+        """
+        def run() -> float:
+            arguments = (setup(),) if setup is not None else ()
+            start = time.perf_counter()
+            operation(*arguments)
+            return (time.perf_counter() - start) * 1000
+
+        for _ in range(self.warmup):
+            run()
+        durations = sorted(run() for _ in range(self.rounds))
+
+        result = {
+            "name": name,
+            "params": params,
+            "rounds": self.rounds,
+            "min_ms": durations[0],
+            "median_ms": durations[len(durations) // 2],
+            "mean_ms": statistics.mean(durations),
+            "p95_ms": durations[min(int(len(durations) * 0.95), len(durations) - 1)]
+        }
+        self.results.append(result)
+        return result
+
+    def to_repr(self) -> dict:
+        return {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": self.results
+        }
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump(self.to_repr(), file, indent=2)
+
+    @staticmethod
+    def key(result: dict) -> str:
+        params = ", ".join(f"{name}={value}" for name, value in sorted(result["params"].items()))
+        return f"{result['name']}[{params}]"
+
+    def compare(self, baseline: dict, tolerance: float = 0.2) -> List[Dict[str, Optional[float]]]:
+        """
+        Compare the median of each result with the one of the same benchmark in the baseline.
+
+        :param baseline: The results of a previous run, as stored by `save`
+        :param tolerance: The relative slowdown of the median above which a benchmark is a regression
+        :return: The comparison of each benchmark, with its ratio to the baseline and whether it is a regression
+        """
+        baseline_results = {self.key(result): result for result in baseline.get("results", [])}
+        comparisons = []
+        for result in self.results:
+            baseline_result = baseline_results.get(self.key(result))
+            ratio = result["median_ms"] / baseline_result["median_ms"] if baseline_result is not None and baseline_result["median_ms"] > 0 else None
+            comparisons.append({
+                "benchmark": self.key(result),
+                "median_ms": result["median_ms"],
+                "baseline_median_ms": baseline_result["median_ms"] if baseline_result is not None else None,
+                "ratio": ratio,
+                "regression": ratio is not None and ratio > 1 + tolerance
+            })
+        return comparisons
@@ -0,0 +1,47 @@
+from __future__ import absolute_import, annotations
+
+import copy
+from typing import List
+
+from benchmarks.payloads import TallyPayloadGenerator
+from benchmarks.runner import BenchmarkRunner
+from tasks.tasks import ProfileHandler
+from ws.models.survey import SurveyAnswer
+from ws.serializers.survey import SurveyEventSerializer
+
+
+def _parse(payload: dict):
+    serializer = SurveyEventSerializer(data=payload)
+    serializer.is_valid(raise_exception=True)
+    return serializer.save()
+
+
+def run_suite(runner: BenchmarkRunner, fields: List[int], options: List[int], profile_sizes: List[int]) -> None:
+    """
+    Benchmark the ingestion of a survey answer: the parsing of the Tally event, the conversion to a survey answer, its
+    serialization for the broker and the application of the production rule set to the profile of the user.
+    """
+    for field_count in fields:
+        for option_count in options:
+            payload = TallyPayloadGenerator(field_count, option_count).generate()
+            survey_data = _parse(payload)
+            survey_answer = SurveyAnswer.from_tally(survey_data)
+            raw_survey_answer = survey_answer.to_repr()
+
+            runner.measure("survey_event_serializer", lambda: _parse(payload), fields=field_count, options=option_count)
+            runner.measure("survey_answer_from_tally", lambda: SurveyAnswer.from_tally(survey_data), fields=field_count, options=option_count)
+            runner.measure("survey_answer_to_repr", survey_answer.to_repr, fields=field_count, options=option_count)
+            runner.measure("survey_answer_from_repr", lambda: SurveyAnswer.from_repr(raw_survey_answer), fields=field_count, options=option_count)
+
+            for profile_size in profile_sizes:
+                rule_manager = ProfileHandler.build_rule_manager()
+                profile = TallyPayloadGenerator.profile(survey_answer.wenet_id, profile_size)
+                # the rules modify the profile in place, each round starts from a copy of the same profile
+                runner.measure(
+                    "rule_manager_update_user_profile",
+                    lambda user_profile: rule_manager.update_user_profile(user_profile, survey_answer),
+                    setup=lambda: copy.deepcopy(profile),
+                    fields=field_count, options=option_count, profile_size=profile_size
+                )
+
+    runner.measure("build_rule_manager", ProfileHandler.build_rule_manager)
@@ -0,0 +1,89 @@
+from __future__ import absolute_import, annotations
+
+import threading
+
+import requests
+from django.test import TestCase
+
+from benchmarks.load import percentiles
+from benchmarks.payloads import TallyPayloadGenerator, PRODUCTION_QUESTIONS
+from benchmarks.platform import FakePlatformServer, FakePlatformState
+from benchmarks.runner import BenchmarkRunner
+from ws.models.survey import SurveyAnswer
+from ws.serializers.survey import SurveyEventSerializer
+
+
+class TestTallyPayloadGenerator(TestCase):
+
+    def test_generate(self):
+        payload = TallyPayloadGenerator(fields=len(PRODUCTION_QUESTIONS) + 8, options=5).generate("wenetId")
+        serializer = SurveyEventSerializer(data=payload)
+        self.assertTrue(serializer.is_valid())
+
+        survey_answer = SurveyAnswer.from_tally(serializer.save())
+        self.assertEqual("wenetId", survey_answer.wenet_id)
+        self.assertEqual(len(PRODUCTION_QUESTIONS) + 8, len(survey_answer.answers))
+        self.assertIn("Q06a", survey_answer.answers)
+
+    def test_deterministic(self):
+        self.assertEqual(TallyPayloadGenerator(seed=1).generate(), TallyPayloadGenerator(seed=1).generate())
+
+    def test_profile(self):
+        profile = TallyPayloadGenerator.profile("wenetId", 10)
+        self.assertEqual(10, len(profile.competences))
+        self.assertEqual(10, len(profile.meanings))
+        self.assertEqual(10, len(profile.materials))
+
+
+class TestBenchmarkRunner(TestCase):
+
+    def test_compare(self):
+        runner = BenchmarkRunner(rounds=5, warmup=0)
+        result = runner.measure("sum", lambda: sum(range(100)), size=100)
+        baseline = {"results": [dict(result, median_ms=result["median_ms"] / 10)]}
+
+        comparison = runner.compare(baseline, tolerance=0.2)[0]
+        self.assertEqual("sum[size=100]", comparison["benchmark"])
+        self.assertTrue(comparison["regression"])
+        self.assertFalse(runner.compare(runner.to_repr())[0]["regression"])
+        self.assertIsNone(runner.compare({"results": []})[0]["ratio"])
+
+
+class TestFakePlatform(TestCase):
+
+    def setUp(self):
+        self.state = FakePlatformState(latency=0, jitter=0)
+        self.server = FakePlatformServer(("127.0.0.1", 0), self.state)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_profile_update(self):
+        profile = requests.get(f"{self.url}/api/service/user/profile/1").json()
+        self.assertEqual("1", profile["id"])
+        requests.put(f"{self.url}/api/service/user/profile/1", json=profile)
+        requests.put(f"{self.url}/api/service/user/profile/1/materials", json=[{"name": "department"}])
+
+        self.assertEqual([{"name": "department"}], requests.get(f"{self.url}/api/service/user/profile/1/materials").json())
+        statistics = requests.get(f"{self.url}/_stats").json()
+        self.assertEqual({"200": 4}, statistics["responses"])
+        self.assertLessEqual(statistics["users"]["1"]["first_read"], statistics["users"]["1"]["last_write"])
+
+        requests.post(f"{self.url}/_reset")
+        self.assertEqual({}, requests.get(f"{self.url}/_stats").json()["users"])
+
+    def test_rate_limit(self):
+        self.state.rate_limit = 2
+        responses = [requests.get(f"{self.url}/api/service/user/profile/1") for _ in range(3)]
+        self.assertEqual([200, 200, 429], [response.status_code for response in responses])
+        self.assertEqual("1", responses[-1].headers["Retry-After"])
+
+
+class TestPercentiles(TestCase):
+
+    def test_percentiles(self):
+        self.assertEqual({"p50": 50, "p90": 90, "p99": 99, "max": 99}, percentiles(list(reversed(range(100)))))
+        self.assertIsNone(percentiles([])["p50"])
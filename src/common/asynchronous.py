@@ -0,0 +1,91 @@
+from __future__ import absolute_import, annotations
+
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest
+from django.views import View
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """
+    Get the threads of the process running the blocking calls of the async views, at most `ASYNC_BLOCKING_THREADS` calls
+    run at the same time. The threads are created after the fork of the server processes.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.ASYNC_BLOCKING_THREADS, thread_name_prefix="blocking")
+    return _executor
+
+
+def reset_blocking_executor() -> None:
+    """
+    Forget the threads of the blocking executor inherited from the parent process, they do not survive the fork.
+    """
+    global _executor
+    _executor = None
+
+
+async def run_blocking(function: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking function, e.g., a call to the WeNet platform with the sync client, without blocking the event loop.
+
+    Unlike `sync_to_async`, the calls do not wait for each other: each one runs in a thread of the blocking executor.
+
+    :param function: The blocking function
+    :return: The result of the function
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_blocking_executor(), functools.partial(_run_closing_connections, function, *args, **kwargs))
+
+
+def _run_closing_connections(function: Callable[..., Any], *args, **kwargs) -> Any:
+    try:
+        return function(*args, **kwargs)
+    finally:
+        # the threads are not bound to a request, so their connections are closed here as at the end of a request
+        close_old_connections()
+
+
+class AsyncView(View):
+    """
+    A class based view whose handlers are coroutines, they run in the event loop under ASGI (and in a loop of their own
+    under WSGI). Django 3.2 recognizes only the async function views, the view function is wrapped in one.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        async def async_view(request: HttpRequest, *args, **kwargs):
+            # the view dispatches the request to a handler and returns the coroutine of the handler, the responses to the
+            # methods without a handler (e.g., `OPTIONS` and the ones not allowed) are returned right away
+            response = view(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+            return response
+
+        # the attributes of the view, e.g., `view_class` and `csrf_exempt`, are kept
+        functools.update_wrapper(async_view, view)
+        return async_view
+
+
+async def load_session(request: HttpRequest) -> None:
+    """
+    Read the session of the request from its store, it is read on its first access that is not allowed in the event
+    loop. The session is then read and updated in memory, the session middleware saves it.
+    """
+    await sync_to_async(request.session.items)()
@@ -0,0 +1,9 @@
+from __future__ import absolute_import, annotations
+
+from django.db.backends.postgresql import base
+
+from common.connections import MeteredConnection
+
+
+class DatabaseWrapper(MeteredConnection, base.DatabaseWrapper):
+    pass
@@ -1,61 +1,323 @@
 from __future__ import absolute_import, annotations
 
 import logging
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
 
+from django.conf import settings
+from django.core.cache import caches
 from django.db import transaction
+from django.utils import timezone
 from wenet.storage.cache import BaseCache
 
 from authentication.models import CachedCredentials
+from common.db import upsert
+from common.metrics import CREDENTIALS_CACHE_LOOKUPS
 
 
 logger = logging.getLogger("wenet-survey-web-app.ws.common.cache")
 
 
+class LocalCache:
+    """
+    Thread safe LRU cache of the process, each entry expires after its own time to live.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[str, Tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expiration, data = entry
+            if expiration <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(data)
+
+    def set(self, key: str, data: dict, ttl: float) -> None:
+        if ttl <= 0:
+            self.delete(key)
+            return
+        with self._lock:
+            self._set(key, data, ttl)
+
+    def add(self, key: str, data: dict, ttl: float) -> bool:
+        """
+        Set the entry only if the key has no entry yet, the fills of a read never overwrite the entry of a write.
+
+        :return: True if the entry is set
+        """
+        if ttl <= 0:
+            return False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return False
+            self._set(key, data, ttl)
+        return True
+
+    def _set(self, key: str, data: dict, ttl: float) -> None:
+        # the caller holds the lock
+        self._entries[key] = (time.monotonic() + ttl, dict(data))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class CacheStatistics:
+    """
+    Count the hits and the misses of each tier of a cache, in the process and in the `CREDENTIALS_CACHE_LOOKUPS` metric.
+    """
+
+    def __init__(self) -> None:
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, tier: str) -> None:
+        self._increment(tier, "hits")
+
+    def miss(self, tier: str) -> None:
+        self._increment(tier, "misses")
+
+    def _increment(self, tier: str, counter: str) -> None:
+        CREDENTIALS_CACHE_LOOKUPS.labels(tier=tier, outcome="hit" if counter == "hits" else "miss").inc()
+        with self._lock:
+            counters = self._counters.setdefault(tier, {"hits": 0, "misses": 0})
+            counters[counter] += 1
+
+    def to_repr(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                tier: {
+                    "hits": counters["hits"],
+                    "misses": counters["misses"],
+                    "hit_ratio": counters["hits"] / (counters["hits"] + counters["misses"]) if counters["hits"] + counters["misses"] > 0 else 0.0
+                } for tier, counters in self._counters.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+
 class DjangoCacheCredentials(BaseCache):
+    """
+    Credentials cache with three tiers:
+
+    * an LRU cache of the process, whose entries live at most `CREDENTIALS_LOCAL_CACHE_TTL` seconds;
+    * the optional `credentials` Django cache, shared between processes;
+    * the `CachedCredentials` table, that is the durable store.
+
+    Writes go through all the tiers and the process never keeps an entry past the expiration of its access token. A refresh
+    made by another process is visible after at most `CREDENTIALS_LOCAL_CACHE_TTL` seconds. A read fills the upper
+    tiers only where they have no entry: credentials loaded before a concurrent write never replace the written ones.
+    """
 
-    def cache(self, data: dict, key: Optional[str] = None, **kwargs) -> str:
+    LOCAL_TIER = "local"
+    SHARED_TIER = "shared"
+    DATABASE_TIER = "database"
+
+    SHARED_CACHE_ALIAS = "credentials"
+
+    _local_cache: Optional[LocalCache] = None
+    _touched_cache: Optional[LocalCache] = None
+    _local_cache_lock = threading.Lock()
+    statistics = CacheStatistics()
+
+    def __init__(self, touch: bool = True) -> None:
+        """
+        :param touch: False if the reads and the writes of the instance should not count as uses of the credentials (e.g., a background refresh)
+        """
+        super().__init__()
+        self._touch_enabled = touch
+
+    def cache(self, data: dict, key: Optional[str] = None, expires_in: Optional[int] = None, touch: Optional[bool] = None, **kwargs) -> str:
+        """
+        Cache the credentials.
+
+        :param data: The credentials
+        :param key: The key of the credentials, a new one is generated if not specified
+        :param expires_in: The seconds the access token is valid for, default to `CREDENTIALS_TOKEN_LIFETIME`
+        :param touch: False if the write should not count as a use of the credentials, default to the setting of the instance
+        :return: The key of the credentials
+        """
         if key is None:
             key = self._generate_id()
+        touch = touch if touch is not None else self._touch_enabled
 
-        try:
-            credentials = CachedCredentials.objects.get(
-                key=key,
-            )
-            credentials.data = data
-        except CachedCredentials.DoesNotExist:
-            credentials = CachedCredentials(key=key, data=data)
-
-        with transaction.atomic():
-            credentials.save()
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=expires_in if expires_in is not None else settings.CREDENTIALS_TOKEN_LIFETIME)
+        upsert(
+            CachedCredentials,
+            "key",
+            {"key": key, "data": data, "expires_at": expires_at, "created_at": now, "last_used_at": now},
+            update_fields=["data", "expires_at", "last_used_at"] if touch else ["data", "expires_at"]
+        )
+        if touch:
+            self._get_touched_cache().set(key, {}, settings.CREDENTIALS_TOUCH_INTERVAL)
+        # the upper tiers are filled only once the write is committed, so they never expose rolled back credentials
+        self.invalidate(key)
+        transaction.on_commit(lambda: self._fill(key, data, expires_at))
         return key
 
     def get(self, key: str) -> Optional[dict]:
-        try:
-            cached_credentials = CachedCredentials.objects.get(
-                key=key,
-            )
-            return cached_credentials.data
-        except CachedCredentials.DoesNotExist:
-            return None
+        self._touch(key)
+        data = self._get_local_cache().get(key)
+        if data is not None:
+            self.statistics.hit(self.LOCAL_TIER)
+            return data
+        self.statistics.miss(self.LOCAL_TIER)
+
+        data = self._get_shared(key)
+        if data is not None:
+            self._get_local_cache().add(key, data, settings.CREDENTIALS_LOCAL_CACHE_TTL)
+            return data
+
+        data, expires_at = self._get_database(key)
+        if data is not None:
+            self._fill(key, data, expires_at, overwrite=False)
+        return data
 
     def update_key(self, previous_key: str, updated_key: str) -> str:
-        cached_credentials = CachedCredentials.objects.get(
-            key=previous_key,
-        )
-        try:
-            user_credentials = CachedCredentials.objects.get(
-                key=updated_key,
-            )
-        except CachedCredentials.DoesNotExist:
-            user_credentials = None
+        if previous_key == updated_key:
+            if not CachedCredentials.objects.filter(key=previous_key).exists():
+                raise CachedCredentials.DoesNotExist(f"No cached credentials for the key [{previous_key}]")
+            return updated_key
 
         with transaction.atomic():
-            if user_credentials is not None:
-                user_credentials.data = cached_credentials.data
-                user_credentials.save()
-                cached_credentials.delete()
+            # the credentials of the previous key replace the ones already cached for the updated key, if any
+            CachedCredentials.objects.filter(key=updated_key).delete()
+            if CachedCredentials.objects.filter(key=previous_key).update(key=updated_key) == 0:
+                raise CachedCredentials.DoesNotExist(f"No cached credentials for the key [{previous_key}]")
+
+        for key in [previous_key, updated_key]:
+            self.invalidate(key)
+        return updated_key
+
+    def invalidate(self, key: str) -> None:
+        """
+        Remove the credentials from the local and the shared tiers, the next read will load them from the database.
+
+        :param key: The key of the credentials
+        """
+        self._get_local_cache().delete(key)
+        shared_cache = self._get_shared_cache()
+        if shared_cache is not None:
+            try:
+                shared_cache.delete(self._shared_key(key))
+            except Exception as e:
+                logger.warning(f"Unable to invalidate the shared cache for the key [{key}]", exc_info=e)
+
+    def _fill(self, key: str, data: dict, expires_at: Optional[datetime], overwrite: bool = True) -> None:
+        """
+        Fill the upper tiers with the credentials.
+
+        :param overwrite: False for the fills of a read, which may have loaded the credentials before a concurrent write
+        """
+        valid_for = int((expires_at - timezone.now()).total_seconds()) if expires_at is not None else settings.CREDENTIALS_TOKEN_LIFETIME
+        # credentials with an expired access token are still shared for a short time, the client refreshes them when needed
+        if not self._set_shared(key, data, max(valid_for, settings.CREDENTIALS_LOCAL_CACHE_TTL), overwrite=overwrite):
+            # the shared tier holds the credentials of a concurrent write, the next read of the process loads them
+            return
+        # the process never keeps the credentials past the expiration of their access token
+        local_ttl = min(settings.CREDENTIALS_LOCAL_CACHE_TTL, valid_for)
+        local_cache = self._get_local_cache()
+        if overwrite:
+            local_cache.set(key, data, local_ttl)
+        else:
+            local_cache.add(key, data, local_ttl)
+
+    def _touch(self, key: str) -> None:
+        if not self._touch_enabled:
+            return
+        # the last use is written at most once every `CREDENTIALS_TOUCH_INTERVAL` seconds by each process
+        touched_cache = self._get_touched_cache()
+        if touched_cache.get(key) is None:
+            touched_cache.set(key, {}, settings.CREDENTIALS_TOUCH_INTERVAL)
+            CachedCredentials.objects.filter(key=key).update(last_used_at=timezone.now())
+
+    @classmethod
+    def clear_local_cache(cls) -> None:
+        cls._get_local_cache().clear()
+        cls._get_touched_cache().clear()
+
+    @classmethod
+    def _get_local_cache(cls) -> LocalCache:
+        if cls._local_cache is None:
+            with cls._local_cache_lock:
+                if cls._local_cache is None:
+                    cls._local_cache = LocalCache(settings.CREDENTIALS_LOCAL_CACHE_SIZE)
+        return cls._local_cache
+
+    @classmethod
+    def _get_touched_cache(cls) -> LocalCache:
+        if cls._touched_cache is None:
+            with cls._local_cache_lock:
+                if cls._touched_cache is None:
+                    cls._touched_cache = LocalCache(settings.CREDENTIALS_LOCAL_CACHE_SIZE)
+        return cls._touched_cache
+
+    def _get_shared_cache(self):
+        if self.SHARED_CACHE_ALIAS in settings.CACHES:
+            return caches[self.SHARED_CACHE_ALIAS]
+        else:
+            return None
+
+    @staticmethod
+    def _shared_key(key: str) -> str:
+        return f"credentials:{key}"
+
+    def _get_shared(self, key: str) -> Optional[dict]:
+        shared_cache = self._get_shared_cache()
+        if shared_cache is None:
+            return None
+        try:
+            data = shared_cache.get(self._shared_key(key))
+        except Exception as e:
+            logger.warning(f"Unable to read the shared cache for the key [{key}]", exc_info=e)
+            data = None
+        if data is not None:
+            self.statistics.hit(self.SHARED_TIER)
+        else:
+            self.statistics.miss(self.SHARED_TIER)
+        return data
+
+    def _set_shared(self, key: str, data: dict, ttl: int, overwrite: bool = True) -> bool:
+        """
+        :return: False if the shared tier already has an entry that is not overwritten
+        """
+        shared_cache = self._get_shared_cache()
+        if shared_cache is None:
+            return True
+        try:
+            if overwrite:
+                shared_cache.set(self._shared_key(key), data, timeout=ttl)
             else:
-                cached_credentials.key = updated_key
-                cached_credentials.save()
-        return cached_credentials.key
+                return shared_cache.add(self._shared_key(key), data, timeout=ttl)
+        except Exception as e:
+            logger.warning(f"Unable to write the shared cache for the key [{key}]", exc_info=e)
+        return True
+
+    def _get_database(self, key: str) -> Tuple[Optional[dict], Optional[datetime]]:
+        for data, expires_at in CachedCredentials.objects.filter(key=key).values_list("data", "expires_at")[:1]:
+            self.statistics.hit(self.DATABASE_TIER)
+            return data, expires_at
+        self.statistics.miss(self.DATABASE_TIER)
+        return None, None
@@ -0,0 +1,76 @@
+from __future__ import absolute_import, annotations
+
+import logging
+import os
+import time
+from typing import Optional
+
+from celery.signals import task_prerun
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+
+from common.metrics import DB_CONNECTIONS_OPEN, DB_CONNECT_DURATION, DB_CONNECT_ERRORS, DB_HEALTH_CHECK_FAILURES
+
+
+logger = logging.getLogger("wenet-survey-web-app.common.connections")
+
+
+class MeteredConnection:
+    """
+    Measure the openings of the connections of a database backend and count the connections held open by the process.
+
+    Mixed into the `DatabaseWrapper` of the backends in `common.backends`.
+    """
+
+    _opened_by: Optional[int] = None
+
+    def connect(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().connect()
+        except Exception:
+            DB_CONNECT_ERRORS.labels(database=self.alias).inc()
+            raise
+        DB_CONNECT_DURATION.labels(database=self.alias).observe(time.perf_counter() - start)
+        DB_CONNECTIONS_OPEN.labels(database=self.alias).inc()
+        self._opened_by = os.getpid()
+
+    def close(self) -> None:
+        was_open = self.connection is not None
+        super().close()
+        # the connections inherited by the forked processes (e.g., by the celery pool) are counted by their parent
+        if was_open and self.connection is None and self._opened_by == os.getpid():
+            DB_CONNECTIONS_OPEN.labels(database=self.alias).dec()
+            self._opened_by = None
+
+
+def check_connections(**kwargs) -> None:
+    """
+    Close the persistent connections that no longer work (e.g., closed by the database, by pgbouncer or by a network
+    failure while idle), so that a new connection is opened instead of failing the next query.
+
+    Run at the start of each request and of each task, after the connections older than `CONN_MAX_AGE` are closed.
+    """
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if not connection.is_usable():
+            DB_HEALTH_CHECK_FAILURES.labels(database=connection.alias).inc()
+            logger.warning(f"Closing the broken connection to the database [{connection.alias}]")
+            connection.close()
+
+
+@request_started.connect
+def check_connections_before_request(**kwargs) -> None:
+    check_connections()
+
+
+@task_prerun.connect
+def check_connections_before_task(task=None, **kwargs) -> None:
+    # the eager tasks run within the request or the task that applied them
+    if task is not None and getattr(task.request, "is_eager", False):
+        return
+    check_connections()
@@ -0,0 +1,143 @@
+from __future__ import absolute_import, annotations
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from wenet.interface.client import Oauth2Client
+from wenet.interface.exceptions import RefreshTokenExpiredError
+
+from authentication.models import CachedCredentials
+from common.cache import DjangoCacheCredentials
+from common.db import delete_in_batches
+
+
+logger = logging.getLogger("wenet-survey-web-app.common.credentials")
+
+
+class CredentialsRefresher:
+    """
+    Refresh the cached credentials with the OAuth2 client of the platform before the access token expires.
+    """
+
+    def __init__(self, cache: Optional[DjangoCacheCredentials] = None) -> None:
+        # a background refresh is not a use of the credentials, the idle ones are still purged
+        self._cache = cache if cache is not None else DjangoCacheCredentials(touch=False)
+
+    def refresh(self, key: str) -> bool:
+        """
+        Refresh the credentials associated to the key.
+
+        The credentials are first claimed with a single statement, moving their next refresh
+        `CREDENTIALS_REFRESH_RETRY_DELAY` seconds ahead, so that a single worker refreshes them with the current refresh
+        token and the call to the platform holds neither a transaction nor a lock. The claim is released once they are
+        refreshed, a transient failure keeps it and postpones their next refresh. Credentials whose refresh token is
+        rejected by the platform are excluded from the following scans by removing their expiration, the client of the
+        user will fail as soon as it uses them.
+
+        :param key: The key of the credentials
+        :return: True if the credentials are refreshed
+        """
+        now = timezone.now()
+        if self._due(now).filter(key=key).update(next_refresh_at=now + timedelta(seconds=settings.CREDENTIALS_REFRESH_RETRY_DELAY)) == 0:
+            logger.debug(f"The credentials [{key}] are not due for a refresh or are being refreshed by another worker")
+            return False
+        data = CachedCredentials.objects.filter(key=key).values_list("data", flat=True).first()
+        if data is None:
+            logger.debug(f"The credentials [{key}] are deleted")
+            return False
+        if not data.get("refresh_token"):
+            logger.info(f"No refresh token for the credentials [{key}]")
+            self._disable(key)
+            return False
+
+        # the client reads the refresh token through the cache, the upper tiers could still hold a previous one
+        self._cache.invalidate(key)
+        client = Oauth2Client(
+            settings.WENET_APP_ID,
+            settings.WENET_APP_SECRET,
+            key,
+            self._cache,
+            token_endpoint_url=f"{settings.WENET_INSTANCE_URL}/api/oauth2/token"
+        )
+        try:
+            # the client writes the refreshed credentials through the cache, with a single upsert
+            client.refresh_access_token()
+        except RefreshTokenExpiredError:
+            # the platform answered `invalid_grant`
+            logger.info(f"The refresh token of the credentials [{key}] is expired")
+            self._disable(key)
+            return False
+        except Exception as e:
+            logger.warning(f"Unable to refresh the credentials [{key}], trying again in {settings.CREDENTIALS_REFRESH_RETRY_DELAY} seconds", exc_info=e)
+            return False
+
+        CachedCredentials.objects.filter(key=key).update(next_refresh_at=None)
+        logger.debug(f"Refreshed the credentials [{key}]")
+        return True
+
+    def expiring(self) -> QuerySet:
+        """
+        Get the credentials expiring within `CREDENTIALS_REFRESH_AHEAD` seconds, the first to expire first, without the
+        ones whose refresh is postponed and the ones not used for more than `CREDENTIALS_RETENTION_DAYS` days.
+        """
+        return self._due(timezone.now()).order_by("expires_at")
+
+    @staticmethod
+    def _due(now: datetime) -> QuerySet:
+        # the idle credentials are left to expire, the collector deletes them
+        return CachedCredentials.objects.filter(
+            Q(next_refresh_at__isnull=True) | Q(next_refresh_at__lte=now),
+            expires_at__lte=now + timedelta(seconds=settings.CREDENTIALS_REFRESH_AHEAD),
+            last_used_at__gte=now - timedelta(days=settings.CREDENTIALS_RETENTION_DAYS)
+        )
+
+    def _disable(self, key: str) -> None:
+        CachedCredentials.objects.filter(key=key).update(expires_at=None, next_refresh_at=None)
+        self._cache.invalidate(key)
+
+
+class CredentialsCollector:
+    """
+    Find and delete the cached credentials that will not be used anymore:
+
+    * orphaned credentials, cached with a temporary key by a login that never completed;
+    * idle credentials, not used for more than `CREDENTIALS_RETENTION_DAYS` days, the background refresh already left
+      them to expire. The credentials of a user with a failed or a dead-lettered profile update are kept, its recovery
+      or its replay needs them.
+    """
+
+    TEMPORARY_KEY_REGEX = r"^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$"  # keys generated with uuid4 during the login
+
+    def orphaned(self) -> QuerySet:
+        return CachedCredentials.objects.filter(
+            key__regex=self.TEMPORARY_KEY_REGEX,
+            created_at__lt=timezone.now() - timedelta(seconds=settings.CREDENTIALS_ORPHAN_TIMEOUT)
+        )
+
+    def idle(self) -> QuerySet:
+        from tasks.models import DeadLetterProfileUpdate, FailedProfileUpdateTask
+
+        return CachedCredentials.objects.filter(
+            last_used_at__lt=timezone.now() - timedelta(days=settings.CREDENTIALS_RETENTION_DAYS)
+        ).exclude(
+            key__in=FailedProfileUpdateTask.objects.values("wenet_id")
+        ).exclude(
+            key__in=DeadLetterProfileUpdate.objects.values("wenet_id")
+        )
+
+    def purge(self, batch_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Delete the orphaned and the idle credentials in bounded batches.
+
+        :param batch_size: The maximum number of rows deleted by each transaction, default to `CREDENTIALS_PURGE_BATCH_SIZE`
+        :return: The number of deleted rows for each kind of credentials
+        """
+        batch_size = batch_size if batch_size is not None else settings.CREDENTIALS_PURGE_BATCH_SIZE
+        return {
+            "orphaned": delete_in_batches(self.orphaned(), batch_size),
+            "idle": delete_in_batches(self.idle(), batch_size)
+        }
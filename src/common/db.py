@@ -0,0 +1,112 @@
+from __future__ import absolute_import, annotations
+
+import logging
+from typing import Any, Dict, List, Sequence, Type
+
+from django.db import connections, models, router, transaction
+from django.db.models import F
+
+
+logger = logging.getLogger("wenet-survey-web-app.common.db")
+
+
+def supports_upsert(connection) -> bool:
+    """
+    Check if the database behind the connection supports the `INSERT ... ON CONFLICT ... DO UPDATE` statement.
+
+    :param connection: The database connection
+    :return: True if the statement is supported
+    """
+    if connection.vendor == "postgresql":
+        return True
+    elif connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 24, 0)
+    else:
+        return False
+
+
+def upsert(model: Type[models.Model], conflict_field: str, values: Dict[str, Any], update_fields: List[str]) -> None:
+    """
+    Insert a row or update the existing one identified by a unique field with a single statement.
+
+    The `conflict_field` must be backed by a unique index. On databases without native support the upsert falls back
+    to `update_or_create` in a transaction.
+
+    :param model: The model of the row
+    :param conflict_field: The name of the unique field identifying the row
+    :param values: The values of the row by field name, they must include the conflict field
+    :param update_fields: The fields to overwrite when the row already exists
+    """
+    upsert_many(model, [conflict_field], [values], update_fields=update_fields)
+
+
+def upsert_many(model: Type[models.Model], conflict_fields: List[str], rows: List[Dict[str, Any]],
+                update_fields: Sequence[str] = (), increment_fields: Sequence[str] = ()) -> None:
+    """
+    Insert the rows or update the existing ones identified by a set of unique fields with a single statement.
+
+    The `conflict_fields` must be backed by a unique index or constraint and each row must identify a different
+    existing row. On databases without native support the rows are upserted one by one in a transaction.
+
+    :param model: The model of the rows
+    :param conflict_fields: The names of the fields identifying a row
+    :param rows: The values of each row by field name, all the rows must have the same fields
+    :param update_fields: The fields to overwrite when the row already exists
+    :param increment_fields: The numeric fields to add to the existing value when the row already exists
+    """
+    if not rows:
+        return
+
+    database = router.db_for_write(model)
+    connection = connections[database]
+    if not supports_upsert(connection):
+        with transaction.atomic(using=database):
+            for values in rows:
+                lookup = {field: values[field] for field in conflict_fields}
+                updated = model.objects.using(database).filter(**lookup).update(
+                    **{field: values[field] for field in update_fields},
+                    **{field: F(field) + values[field] for field in increment_fields}
+                )
+                if updated == 0 and not model.objects.using(database).filter(**lookup).exists():
+                    model.objects.using(database).create(**values)
+        return
+
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    fields = [model._meta.get_field(field_name) for field_name in rows[0]]
+    columns = ", ".join(quote_name(field.column) for field in fields)
+    placeholders = ", ".join(f"({', '.join(['%s'] * len(fields))})" for _ in rows)
+    assignments = [
+        f"{quote_name(column)} = EXCLUDED.{quote_name(column)}"
+        for column in (model._meta.get_field(field_name).column for field_name in update_fields)
+    ] + [
+        f"{quote_name(column)} = {table}.{quote_name(column)} + EXCLUDED.{quote_name(column)}"
+        for column in (model._meta.get_field(field_name).column for field_name in increment_fields)
+    ]
+    conflict_columns = ", ".join(quote_name(model._meta.get_field(field_name).column) for field_name in conflict_fields)
+    action = f"DO UPDATE SET {', '.join(assignments)}" if assignments else "DO NOTHING"
+    sql = f"INSERT INTO {table} ({columns}) VALUES {placeholders} ON CONFLICT ({conflict_columns}) {action}"
+    params = [field.get_db_prep_save(values[field.name], connection) for values in rows for field in fields]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def delete_in_batches(queryset: models.QuerySet, batch_size: int = 1000) -> int:
+    """
+    Delete the rows of a queryset with a sequence of short transactions, each one deleting at most `batch_size` rows.
+
+    :param queryset: The rows to delete
+    :param batch_size: The maximum number of rows deleted by each transaction
+    :return: The number of deleted rows
+    """
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic(using=queryset.db):
+            deleted += queryset.model.objects.using(queryset.db).filter(pk__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+    return deleted
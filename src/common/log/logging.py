@@ -1,15 +1,178 @@
 from __future__ import absolute_import, annotations
 
+import atexit
+import logging
 import os
+import queue
+import threading
+import time
+import weakref
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional, TextIO
 
 
 log_level = os.getenv("LOG_LEVEL", "INFO")
 log_level_libraries = os.getenv("LOG_LEVEL_LIBS", "DEBUG")
+log_async = os.getenv("LOG_ASYNC", "TRUE").upper() == "TRUE"
+log_queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# the maximum records per second of a logger (and of its children) below the warning level, e.g., `wenet-survey-web-app.common.profile:10`
+log_sampling = {
+    logger_rate.split(":")[0]: int(logger_rate.split(":")[1]) for logger_rate in os.getenv("LOG_SAMPLING").split(";")
+} if os.getenv("LOG_SAMPLING", None) else {}
 
 log_handlers = ["console"]
 if "LOG_TO_FILE" in os.environ:
     log_handlers.append("file")
 
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Let through at most the configured records per second of a logger and of its children, the records at the warning
+    level or above are never dropped. The number of records dropped is added to the next record let through.
+    """
+
+    def __init__(self, rates: Dict[str, int]) -> None:
+        super().__init__()
+        self._rates = rates
+        self._logger_prefixes: Dict[str, Optional[str]] = {}
+        self._windows: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        prefix = self._prefix(record.name)
+        if prefix is None:
+            return True
+        rate = self._rates[prefix]
+
+        with self._lock:
+            now = time.monotonic()
+            # the children of a configured logger share its window
+            window = self._windows.setdefault(prefix, [now, 0, 0])  # start, records and dropped records
+            if now - window[0] >= 1:
+                window[0] = now
+                window[1] = 0
+            window[1] += 1
+            if window[1] > rate:
+                window[2] += 1
+                return False
+            dropped = window[2]
+            window[2] = 0
+
+        if dropped > 0:
+            record.msg = f"{record.getMessage()} ({dropped} records dropped by sampling)"
+            record.args = None
+        return True
+
+    def _prefix(self, name: str) -> Optional[str]:
+        if name not in self._logger_prefixes:
+            # the rate of the closest configured ancestor applies
+            prefixes = [prefix for prefix in self._rates if name == prefix or name.startswith(f"{prefix}.")]
+            self._logger_prefixes[name] = max(prefixes, key=len) if prefixes else None
+        return self._logger_prefixes[name]
+
+
+class AsyncHandler(QueueHandler):
+    """
+    Hand the records to a background thread that formats and writes them, to the console and optionally to a rotating
+    file, so the logging thread never waits for the output. The message of each record is rendered before it is
+    queued, since its arguments may change afterwards.
+
+    Records are dropped when more than `queue_size` are waiting. The background thread is started again in the child
+    processes forked by uwsgi and by the celery prefork pool, and the queued records are flushed at exit, then the
+    records are written right away.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, filename: Optional[str] = None, max_bytes: int = 10485760,
+                 backup_count: int = 3, log_format: str = LOG_FORMAT, queue_size: int = 10000) -> None:
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.targets: List[logging.Handler] = []
+        if stream is not None:
+            self.targets.append(logging.StreamHandler(stream))
+        if filename is not None:
+            self.targets.append(RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count))
+        for target in self.targets:
+            target.setFormatter(logging.Formatter(log_format))
+
+        self._listener: Optional[QueueListener] = None
+        self._start()
+        _async_handlers.add(self)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # the traceback is rendered now, so the frames it references are not kept alive by the queue
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self._listener is None:
+            # stopped, e.g., while the process exits, the record is written right away
+            for target in self.targets:
+                if record.levelno >= target.level:
+                    target.handle(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        for target in self.targets:
+            target.flush()
+
+    def close(self) -> None:
+        # e.g., when the logging is configured again
+        self.stop()
+        _async_handlers.discard(self)
+        for target in self.targets:
+            target.close()
+        super().close()
+
+    def _start(self) -> None:
+        self._listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self._listener.start()
+
+    def _restart(self) -> None:
+        # the thread of the listener does not survive the fork, the records queued by the parent are discarded
+        if self._listener is not None:
+            self.queue = queue.Queue(self.queue_size)
+            self._start()
+
+
+# the handlers are stopped at exit and started again after a fork by callbacks registered once, not by each handler
+_async_handlers: weakref.WeakSet[AsyncHandler] = weakref.WeakSet()
+
+
+def stop_async_handlers() -> None:
+    """
+    Stop the background threads of the handlers writing the records still queued, e.g., when a process exits without
+    running the `atexit` callbacks as the processes of the celery prefork pool do.
+    """
+    for handler in list(_async_handlers):
+        handler.stop()
+
+
+def _restart_async_handlers() -> None:
+    for handler in list(_async_handlers):
+        handler._restart()
+
+
+atexit.register(stop_async_handlers)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_async_handlers)
+
 
 def get_logging_configuration(service_name: str):
     """
@@ -19,46 +182,67 @@ def get_logging_configuration(service_name: str):
     :return: The logging configuration
     """
     file_name = f"{service_name}.log"
+    file_path = os.path.join(os.getenv("LOGS_DIR", ""), file_name)
+
+    handlers = ["async"] if log_async else log_handlers
+    filters = ["sampling"] if log_sampling else []
 
     log_config = {
         "version": 1,
         "formatters": {
             "simple": {
-                "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                "format": LOG_FORMAT,
                 "datefmt": ""
             }
         },
+        "filters": {
+            "sampling": {
+                "()": "common.log.logging.SamplingFilter",
+                "rates": log_sampling
+            }
+        },
         "handlers": {
             "console": {
                 "class": "logging.StreamHandler",
                 "formatter": "simple",
                 "level": "DEBUG",
                 "stream": "ext://sys.stdout",
+                "filters": filters
             },
             "file": {
                 "class": "logging.handlers.RotatingFileHandler",
                 "formatter": "simple",
-                "filename": os.path.join(os.getenv("LOGS_DIR", ""), file_name),
+                "filename": file_path,
                 "maxBytes": 10485760,
-                "backupCount": 3
+                "backupCount": 3,
+                "filters": filters
             }
         },
         "root": {
             "level": log_level,
-            "handlers": log_handlers,
+            "handlers": handlers,
         },
         "loggers": {
             "werkzeug": {
                 "level": log_level_libraries,
-                "handlers": log_handlers,
+                "handlers": handlers,
                 "propagate": 0
             },
             "uhopper": {
                 "level": log_level,
-                "handlers": log_handlers,
+                "handlers": handlers,
                 "propagate": 0
             }
         }
     }
 
+    if log_async:
+        log_config["handlers"]["async"] = {
+            "()": "common.log.logging.AsyncHandler",
+            "stream": "ext://sys.stdout",
+            "filename": file_path if "file" in log_handlers else None,
+            "queue_size": log_queue_size,
+            "filters": filters
+        }
+
     return log_config
@@ -0,0 +1,67 @@
+from __future__ import absolute_import, annotations
+
+import os
+from dataclasses import dataclass
+from typing import List
+
+
+@dataclass
+class ProcessMemory:
+    """
+    The memory of a process in KiB, as accounted by linux in `/proc/<pid>/smaps_rollup`.
+
+    * `rss`: the resident memory of the process;
+    * `pss`: the resident memory with each shared page divided among the processes sharing it;
+    * `shared`: the resident pages shared with other processes, e.g., the pages of the parent not written since the fork;
+    * `private`: the resident pages used only by the process.
+    """
+
+    pid: int
+    rss: int
+    pss: int
+    shared: int
+    private: int
+
+    @classmethod
+    def parse(cls, pid: int, smaps_rollup: str) -> ProcessMemory:
+        fields = {}
+        for line in smaps_rollup.splitlines():
+            columns = line.split()
+            if len(columns) == 3 and columns[2] == "kB":
+                fields[columns[0].rstrip(":")] = int(columns[1])
+        return cls(
+            pid,
+            fields.get("Rss", 0),
+            fields.get("Pss", 0),
+            fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+            fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+        )
+
+
+def read_process_memory(pid: int) -> ProcessMemory:
+    """
+    Read the memory of a process, it requires linux 4.14 or later.
+
+    :raise OSError: If the process does not exist or its memory can not be read
+    """
+    with open(f"/proc/{pid}/smaps_rollup") as smaps_rollup:
+        return ProcessMemory.parse(pid, smaps_rollup.read())
+
+
+def child_pids(pid: int) -> List[int]:
+    """
+    Get the processes forked by a process, e.g., the processes of uwsgi forked by its master.
+    """
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                # the name of the process in the second field may contain spaces, it is enclosed in parentheses
+                parent = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue  # the process exited in the meantime
+        if parent == pid:
+            children.append(int(entry))
+    return sorted(children)
@@ -0,0 +1,185 @@
+from __future__ import absolute_import, annotations
+
+import functools
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+
+
+WEBHOOK_REQUEST_DURATION = Histogram(
+    "survey_webhook_request_duration_seconds",
+    "Duration of the requests to the survey event webhook",
+    ["outcome"]
+)
+WEBHOOK_REJECTIONS = Counter(
+    "survey_webhook_rejections_total",
+    "Survey submissions rejected by the webhook since the profile updates do not keep up",
+    ["signal"]
+)
+TASK_DURATION = Histogram(
+    "survey_task_duration_seconds",
+    "Duration of the celery tasks",
+    ["task"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, float("inf"))
+)
+TASK_OUTCOMES = Counter(
+    "survey_task_outcomes_total",
+    "Outcomes of the celery tasks",
+    ["task", "outcome"]
+)
+QUEUE_WAIT = Histogram(
+    "survey_queue_wait_seconds",
+    "Time the celery tasks waited in their queue before being started",
+    ["queue"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600, float("inf"))
+)
+PLATFORM_REQUEST_DURATION = Histogram(
+    "survey_platform_request_duration_seconds",
+    "Duration of the calls to the service API of the WeNet platform",
+    ["endpoint"]
+)
+PLATFORM_REQUEST_ERRORS = Counter(
+    "survey_platform_request_errors_total",
+    "Failed calls to the service API of the WeNet platform",
+    ["endpoint", "status"]
+)
+RULE_DURATION = Histogram(
+    "survey_rule_duration_seconds",
+    "Duration of the application of all the rules to a profile",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, float("inf"))
+)
+
+DB_CONNECT_DURATION = Histogram(
+    "survey_db_connect_duration_seconds",
+    "Duration of the opening of the connections to the database",
+    ["database"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, float("inf"))
+)
+DB_CONNECT_ERRORS = Counter(
+    "survey_db_connect_errors_total",
+    "Failed openings of connections to the database",
+    ["database"]
+)
+DB_CONNECTIONS_OPEN = Gauge(
+    "survey_db_connections_open",
+    "Connections to the database held open by the processes",
+    ["database"],
+    multiprocess_mode="livesum"
+)
+DB_HEALTH_CHECK_FAILURES = Counter(
+    "survey_db_health_check_failures_total",
+    "Persistent connections to the database found broken before being reused",
+    ["database"]
+)
+
+WARMUP_DURATION = Histogram(
+    "survey_warmup_duration_seconds",
+    "Duration of the steps of the warm-up of the new processes",
+    ["step"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, float("inf"))
+)
+WARMUP_FAILURES = Counter(
+    "survey_warmup_failures_total",
+    "Steps of the warm-up of the new processes that failed",
+    ["step"]
+)
+WARM_PROCESSES = Gauge(
+    "survey_warm_processes",
+    "Processes that completed their warm-up",
+    multiprocess_mode="livesum"
+)
+
+CREDENTIALS_CACHE_LOOKUPS = Counter(
+    "survey_credentials_cache_lookups_total",
+    "Lookups of the cached credentials in each tier of their cache, by outcome (hit or miss)",
+    ["tier", "outcome"]
+)
+
+PROFILE_SECTION_READS = Counter(
+    "survey_profile_section_reads_total",
+    "Sections of the profiles read before an update, from their shadow or from the platform",
+    ["section", "source"]
+)
+PROFILE_SHADOW_DRIFT = Counter(
+    "survey_profile_shadow_drift_total",
+    "Sections of the profiles read from the platform after their shadow expired that differ from it",
+    ["section"]
+)
+PROFILE_SECTION_WRITES = Counter(
+    "survey_profile_section_writes_total",
+    "Sections of the profiles handled by an update: written, resumed from a previous attempt, rejected or failed",
+    ["section", "outcome"]
+)
+
+
+def is_multiprocess() -> bool:
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ or "prometheus_multiproc_dir" in os.environ
+
+
+def mark_process_dead(pid: Optional[int] = None) -> None:
+    """
+    Remove the files of the live gauges of an exiting process from the `PROMETHEUS_MULTIPROC_DIR` directory, the
+    gauges summing the values of the live processes would otherwise keep counting the last values of a process recycled
+    by uwsgi or by the celery pool.
+
+    :param pid: The id of the exiting process, the current one by default
+    """
+    if is_multiprocess():
+        multiprocess.mark_process_dead(pid if pid is not None else os.getpid())
+
+
+def process_registry() -> CollectorRegistry:
+    """
+    Build the registry of the metrics collected by the processes of the service.
+
+    Under uwsgi and the celery prefork pool each process writes its metrics in the `PROMETHEUS_MULTIPROC_DIR` directory
+    and the registry aggregates them when it is collected, otherwise it is the registry of the current process.
+    """
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def exposition(*registries: CollectorRegistry) -> bytes:
+    """
+    Generate the metrics of the registries in the Prometheus text format, the registries must not share metric names.
+    """
+    return b"".join(generate_latest(registry) for registry in registries)
+
+
+@contextmanager
+def observe_platform_call(endpoint: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        status = getattr(e, "http_status_code", None)
+        PLATFORM_REQUEST_ERRORS.labels(endpoint=endpoint, status=str(status) if status is not None else type(e).__name__).inc()
+        raise
+    finally:
+        PLATFORM_REQUEST_DURATION.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+
+
+class MeteredInterface:
+    """
+    Wrap an interface of the WeNet platform measuring the duration and the errors of each call, by method name.
+    """
+
+    def __init__(self, interface) -> None:
+        self._interface = interface
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._interface, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def call(*args, **kwargs):
+            with observe_platform_call(name):
+                return attribute(*args, **kwargs)
+        return call
@@ -0,0 +1,132 @@
+from __future__ import absolute_import, annotations
+
+import atexit
+import gc
+import logging
+import os
+import time
+
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_ready, worker_shutdown
+from django.conf import settings
+from django.core.cache import close_caches
+from django.db import connections
+
+from common.log.logging import stop_async_handlers
+from common.metrics import mark_process_dead
+from common.warmup import is_ready, reset_warm_up, warm_up
+
+
+logger = logging.getLogger("wenet-survey-web-app.common.preload")
+
+
+def preload(rules: bool = False) -> None:
+    """
+    Load the modules and the static data in the process that forks the processes serving the requests or running the
+    tasks, then move them out of the reach of the garbage collector. The forked processes share their memory pages with
+    the parent, the garbage collector would otherwise copy them by updating the headers of the objects it visits.
+
+    :param rules: Whether to build the rules mapping the answers of the survey to the profile, with their mappings
+    """
+    from django.urls import get_resolver
+    from django.utils.translation import trans_real
+
+    start = time.perf_counter()
+    get_resolver().url_patterns
+    for language, _ in settings.LANGUAGES:
+        trans_real.translation(language)
+    if rules:
+        from tasks.tasks import ProfileHandler
+        ProfileHandler.get_rule_manager()
+
+    # the forked processes must not share the connections of the parent
+    connections.close_all()
+    close_caches()
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Preloaded the app in {(time.perf_counter() - start) * 1000:.0f} ms, {gc.get_freeze_count()} objects frozen")
+
+
+def reset_after_fork() -> None:
+    """
+    Reset in a forked process the connections and the pools inherited from its parent.
+    """
+    from common.asynchronous import reset_blocking_executor
+    from tasks.backpressure import backpressure
+
+    for connection in connections.all():
+        if connection.connection is not None:
+            # closing the connection would end the session of the parent as well, only the descriptor is released
+            try:
+                os.close(connection.connection.fileno())
+            except (AttributeError, OSError):
+                pass
+            connection.connection = None
+    close_caches()
+    reset_blocking_executor()
+    backpressure.reset()
+    reset_warm_up()
+
+
+def register_uwsgi_hooks() -> bool:
+    """
+    Reset and warm up the processes forked by the uwsgi master, their live gauges are removed when they exit.
+
+    :return: False outside uwsgi, where there is nothing to register
+    """
+    try:
+        from uwsgidecorators import postfork
+    except ImportError:
+        return False
+
+    @postfork
+    def start_uwsgi_process() -> None:
+        reset_after_fork()
+        atexit.register(mark_process_dead)
+        warm_up()
+    return True
+
+
+@worker_init.connect
+def preload_worker(**kwargs) -> None:
+    # run by the main process of the worker before it starts the processes of the pool
+    if settings.PRELOAD_APP:
+        preload(rules=True)
+
+
+@worker_process_init.connect
+def start_worker_process(**kwargs) -> None:
+    # the pool sends no task to the process until this returns, within `CELERY_WORKER_PROC_ALIVE_TIMEOUT` seconds
+    reset_after_fork()
+    warm_up(rules=True)
+
+
+@worker_ready.connect
+def write_worker_ready_file(sender=None, **kwargs) -> None:
+    from celery.concurrency.prefork import TaskPool
+
+    # the processes of the prefork pool warm up on their own, the other pools run the tasks in the main process
+    if not isinstance(getattr(sender, "pool", None), TaskPool) and not is_ready():
+        warm_up(rules=True)
+    if settings.WORKER_READY_FILE:
+        with open(settings.WORKER_READY_FILE, "w") as ready_file:
+            ready_file.write(str(os.getpid()))
+
+
+@worker_init.connect
+@worker_shutdown.connect
+def remove_worker_ready_file(**kwargs) -> None:
+    if settings.WORKER_READY_FILE and os.path.exists(settings.WORKER_READY_FILE):
+        os.remove(settings.WORKER_READY_FILE)
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def remove_worker_live_gauges(**kwargs) -> None:
+    # the pool replaces the processes that exit, their live gauges must not be summed with the ones of the new processes
+    mark_process_dead()
+
+
+@worker_process_shutdown.connect
+def stop_worker_process_logging(**kwargs) -> None:
+    # the processes of the prefork pool exit without running the `atexit` callbacks, the queued records would be lost
+    stop_async_handlers()
@@ -0,0 +1,26 @@
+from __future__ import absolute_import, annotations
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread safe limiter spacing the operations so that at most `rate` operations start each second.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self._interval = 1 / rate if rate > 0 else 0
+        self._next_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Wait until the next operation is allowed to start.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next_start, now)
+            self._next_start = start + self._interval
+        if start > now:
+            time.sleep(start - now)
@@ -1,6 +1,7 @@
 from __future__ import absolute_import, annotations
 
 import logging
+import time
 from abc import abstractmethod, ABC
 from datetime import date
 from datetime import datetime
@@ -11,6 +12,7 @@ from wenet.model.user.common import Date
 from wenet.model.user.profile import WeNetUserProfile
 
 from common.enumerator import AnswerOrder
+from common.metrics import RULE_DURATION
 from ws.models.survey import SurveyAnswer
 
 logger = logging.getLogger("wenet-survey-web-app.common.profile")
@@ -25,11 +27,13 @@ class RuleManager:
         self.rules.append(rule)
 
     def update_user_profile(self, user_profile: WeNetUserProfile, survey_answer: SurveyAnswer) -> WeNetUserProfile:
+        start = time.perf_counter()
         for rule in self.rules:
             try:
                 user_profile = rule.apply(user_profile, survey_answer)
             except Exception as e:
                 logger.exception(f"An error occurred while executing a {type(rule)}", exc_info=e)
+        RULE_DURATION.observe(time.perf_counter() - start)
         return user_profile
 
 
@@ -58,7 +62,7 @@ class DateRule(Rule):
                     date_result = Date(year=answer_date.year, month=answer_date.month, day=answer_date.day)
                     setattr(user_profile, self.profile_attribute, date_result)
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -87,7 +91,7 @@ class NumberToDateRule(Rule):
                     date_result = Date(year=date_year, month=date_month, day=date_day)
                     setattr(user_profile, self.profile_attribute, date_result)
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -107,7 +111,7 @@ class MappingRule(Rule):
                     mapping_result = self.answer_mapping[survey_answer.answers[self.question_code].answer]
                     setattr(user_profile, self.profile_attribute, mapping_result)
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -126,7 +130,7 @@ class NumberRule(Rule):
                 if isinstance(answer_number, Number):
                     setattr(user_profile, self.profile_attribute, answer_number)
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -159,13 +163,13 @@ class LanguageRule(Rule):
                                         break
                                 if add_to_profile:
                                     user_profile.competences.append(competence_value)
-                                    logger.debug(f"updated competence with: {competence_value}")
+                                    logger.debug("updated competence with: %s", competence_value)
                             else:
                                 logger.warning(f"{language_score_code} is not in the score mapping")
                         else:
                             logger.warning(f"{language_code} is not in the language mapping")
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -210,11 +214,11 @@ class CompetenceMeaningNumberRule(Rule):
                             logger.warning(f"{self.profile_attribute} field is not supported in the user profile")
                         if profile_entry is not None and add_to_profile:
                             getattr(user_profile, self.profile_attribute).append(profile_entry)
-                            logger.debug(f"updated {self.profile_attribute} with {getattr(user_profile, self.profile_attribute)}")
+                            logger.debug("updated %s with %s", self.profile_attribute, getattr(user_profile, self.profile_attribute))
                     else:
-                        logger.debug(f"ceiling value is too low to build {self.variable_name} attribute of the user {user_profile.profile_id}")
+                        logger.debug("ceiling value is too low to build %s attribute of the user %s", self.variable_name, user_profile.profile_id)
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -256,9 +260,9 @@ class CompetenceMeaningMappingRule(Rule):
                         logger.warning(f"{self.profile_attribute} field is not supported in the user profile")
                     if profile_entry is not None and add_to_profile:
                         getattr(user_profile, self.profile_attribute).append(profile_entry)
-                        logger.debug(f"updated {self.profile_attribute} with {getattr(user_profile, self.profile_attribute)}")
+                        logger.debug("updated %s with %s", self.profile_attribute, getattr(user_profile, self.profile_attribute))
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -286,9 +290,9 @@ class MaterialsMappingRule(Rule):
                             break
                     if add_to_profile:
                         user_profile.materials.append(profile_entry)
-                        logger.debug(f"updated materials with: {profile_entry}")
+                        logger.debug("updated materials with: %s", profile_entry)
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -316,11 +320,11 @@ class MaterialsFieldRule(Rule):
                                 break
                         if add_to_profile:
                             user_profile.materials.append(profile_entry)
-                            logger.debug(f"updated materials with: {profile_entry}")
+                            logger.debug("updated materials with: %s", profile_entry)
                     else:
                         logger.warning(f"field type {type(survey_answer.answers[self.question_code].answer)} is not supported")
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -350,11 +354,11 @@ class MaterialsQuantityRule(Rule):
                                 break
                         if add_to_profile:
                             user_profile.materials.append(profile_entry)
-                            logger.debug(f"updated materials with: {profile_entry}")
+                            logger.debug("updated materials with: %s", profile_entry)
                     else:
                         logger.warning(f"field type {type(survey_answer.answers[self.question_code].answer)} is not supported")
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -410,11 +414,11 @@ class CompetenceMeaningBuilderRule(Rule):
                             logger.warning(f"{self.profile_attribute} field is not supported in the user profile")
                         if profile_entry is not None and add_to_profile:
                             getattr(user_profile, self.profile_attribute).append(profile_entry)
-                            logger.debug(f"updated {self.profile_attribute} with {getattr(user_profile, self.profile_attribute)}")
+                            logger.debug("updated %s with %s", self.profile_attribute, getattr(user_profile, self.profile_attribute))
                     else:
-                        logger.debug(f"ceiling value is too low to build {self.variable_name} attribute of the user {user_profile.profile_id}")
+                        logger.debug("ceiling value is too low to build %s attribute of the user %s", self.variable_name, user_profile.profile_id)
                 else:
-                    logger.debug(f"No answer is selected to build {self.variable_name} attribute of the user {user_profile.profile_id}")
+                    logger.debug("No answer is selected to build %s attribute of the user %s", self.variable_name, user_profile.profile_id)
         else:
             logger.warning(
                 f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
@@ -452,11 +456,11 @@ class UniversityMappingRule(Rule):
                                 break
                         if add_to_profile:
                             user_profile.materials.append(profile_entry)
-                            logger.debug(f"updated materials with: {profile_entry}")
+                            logger.debug("updated materials with: %s", profile_entry)
                     else:
-                        logger.debug(f"{self.variable_name} not selected for the user {user_profile.profile_id}")
+                        logger.debug("%s not selected for the user %s", self.variable_name, user_profile.profile_id)
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -502,11 +506,11 @@ class UniversityFromDepartmentRule(Rule):
                                 break
                         if add_to_profile:
                             user_profile.materials.append(profile_entry)
-                            logger.debug(f"updated materials with: {profile_entry}")
+                            logger.debug("updated materials with: %s", profile_entry)
                     except ValueError as e:
                         logger.warning(f"Unable to find an university from the answer [{answer_code}]", exc_info=e)
             else:
-                logger.debug(f"Trying to apply rule but question code [{self.question_code}] is not selected by user")
+                logger.debug("Trying to apply rule but question code [%s] is not selected by user", self.question_code)
         else:
             logger.warning(f"Trying to apply rule but the user ID [{user_profile.profile_id}] does not match the user ID in the survey [{survey_answer.wenet_id}]")
         return user_profile
@@ -0,0 +1,84 @@
+from __future__ import absolute_import, annotations
+
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from django.conf import settings
+
+
+# the code run by each kind of process before it can serve its first request or task, measured before the warm-up
+# that connects to the database
+STARTUP_TARGETS = {
+    "manage": "import django; django.setup()",
+    "web": "from django.core.wsgi import get_wsgi_application; application = get_wsgi_application(); from django.urls import get_resolver; get_resolver().url_patterns",
+    "worker": "import django; django.setup(); from wenet_survey.celery import app; app.loader.import_default_modules()",
+}
+
+
+@dataclass
+class ImportTime:
+
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+@dataclass
+class StartupProfile:
+
+    target: str
+    duration: float
+    imports: List[ImportTime] = field(default_factory=list)
+
+    def slowest(self, count: int, sort: str = "cumulative") -> List[ImportTime]:
+        key = (lambda import_time: import_time.cumulative_us) if sort == "cumulative" else (lambda import_time: import_time.self_us)
+        return sorted(self.imports, key=key, reverse=True)[:count]
+
+
+def parse_import_times(output: str) -> List[ImportTime]:
+    """
+    Parse the lines written by `python -X importtime`, e.g., `import time:       412 |       1024 |   common.rules`.
+
+    The modules loaded with `importlib.import_module` (e.g., the settings, the apps and the urls loaded by django) are
+    not listed, only the modules they import are.
+    """
+    import_times = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        columns = line[len("import time:"):].split("|")
+        if len(columns) != 3 or not columns[0].strip().isdigit():
+            continue  # the header of the table
+        import_times.append(ImportTime(columns[2].strip(), int(columns[0]), int(columns[1])))
+    return import_times
+
+
+def measure_startup(target: str, profile_imports: bool = False, timeout: Optional[float] = 60) -> StartupProfile:
+    """
+    Start a new interpreter running the startup of a kind of process and measure its wall time, the cache of the
+    compiled modules is left as it is, the time is measured as soon as the modules are loaded.
+
+    :param target: The kind of process, one of `STARTUP_TARGETS`
+    :param profile_imports: Whether to collect the time spent importing each module, it slows down the startup
+    :param timeout: The maximum number of seconds the startup can take
+    :return: The profile of the startup
+    :raise RuntimeError: If the startup fails
+    """
+    command = [sys.executable]
+    if profile_imports:
+        command += ["-X", "importtime"]
+    command += ["-c", STARTUP_TARGETS[target]]
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "wenet_survey.settings")
+
+    start = time.perf_counter()
+    process = subprocess.run(command, cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout, universal_newlines=True)
+    duration = time.perf_counter() - start
+    if process.returncode != 0:
+        error = [line for line in process.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"The startup of [{target}] failed: {' '.join(error[-3:])}")
+    return StartupProfile(target, duration, parse_import_times(process.stderr) if profile_imports else [])
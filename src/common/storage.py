@@ -0,0 +1,82 @@
+from __future__ import absolute_import, annotations
+
+import gzip
+import os
+import re
+from typing import Iterator, Optional, Tuple
+
+import brotli
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+
+# the names given by the manifest storage, e.g., `css/style.1d5c2f0a4b3e.css`
+HASHED_NAME_PATTERN = re.compile(r"\.[0-9a-f]{12}\.[^/.]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# the encodings of the compressed variants of a file with their suffixes, by preference
+VARIANT_ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Store the static files under names with the hash of their content, along with their brotli and gzip variants. The
+    hashed names are listed in the `staticfiles.json` manifest that the `static` template tag reads.
+
+    Until `collectstatic` writes the manifest (e.g., in development and in the tests) the files keep their names.
+    """
+
+    # the formats that are already compressed
+    uncompressed_extensions = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".woff", ".woff2", ".gz", ".br", ".zip")
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+        if not dry_run:
+            # the files referencing other files are hashed again by each pass, only their last name is kept
+            for name in sorted(set(paths) | set(self.hashed_files.values())):
+                for variant in self._compress(name):
+                    yield name, variant, True
+
+    def stored_name(self, name: str) -> str:
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def _compress(self, name: str) -> Iterator[str]:
+        if name.lower().endswith(self.uncompressed_extensions):
+            return
+        with self.open(name) as file:
+            content = file.read()
+
+        for encoding, suffix in VARIANT_ENCODINGS:
+            compressed = brotli.compress(content, quality=11) if encoding == "br" else gzip.compress(content, compresslevel=9, mtime=0)
+            if len(compressed) >= len(content):
+                continue  # e.g., the small files
+            variant = f"{name}{suffix}"
+            if self.exists(variant):
+                self.delete(variant)
+            self._save(variant, ContentFile(compressed))
+            yield variant
+
+
+def select_variant(root: str, name: str, accept_encoding: str) -> Tuple[str, Optional[str]]:
+    """
+    Select the compressed variant of a collected static file accepted by the client, if any.
+
+    :param root: The directory of the collected static files
+    :param name: The name of the file
+    :param accept_encoding: The `Accept-Encoding` header of the request
+    :return: The name of the file to serve and its encoding, None if it is not compressed
+    """
+    accepted = {encoding.split(";")[0].strip() for encoding in accept_encoding.split(",")}
+    for encoding, suffix in VARIANT_ENCODINGS:
+        if encoding in accepted and os.path.isfile(os.path.join(root, f"{name}{suffix}")):
+            return f"{name}{suffix}", encoding
+    return name, None
+
+
+def is_immutable(name: str) -> bool:
+    """
+    Check if a static file has the hash of its content in its name, so its content never changes.
+    """
+    return HASHED_NAME_PATTERN.search(name) is not None
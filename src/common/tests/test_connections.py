@@ -0,0 +1,68 @@
+from __future__ import absolute_import, annotations
+
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from prometheus_client import REGISTRY
+
+from common.backends.sqlite3.base import DatabaseWrapper
+from common.connections import check_connections
+
+
+class TestMeteredConnection(SimpleTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.wrapper = DatabaseWrapper({**connection.settings_dict, "NAME": os.path.join(directory.name, "db.sqlite3")}, alias="metered")
+        self.addCleanup(self.wrapper.close)
+
+    @staticmethod
+    def _sample(name: str) -> float:
+        return REGISTRY.get_sample_value(name, {"database": "metered"}) or 0
+
+    def test_connect(self):
+        connects = self._sample("survey_db_connect_duration_seconds_count")
+        open_connections = self._sample("survey_db_connections_open")
+
+        self.wrapper.ensure_connection()
+        self.wrapper.ensure_connection()
+        self.assertEqual(connects + 1, self._sample("survey_db_connect_duration_seconds_count"))
+        self.assertEqual(open_connections + 1, self._sample("survey_db_connections_open"))
+
+        self.wrapper.close()
+        self.assertEqual(open_connections, self._sample("survey_db_connections_open"))
+
+    def test_connect_error(self):
+        errors = self._sample("survey_db_connect_errors_total")
+        self.wrapper.settings_dict["NAME"] = os.path.join(self.wrapper.settings_dict["NAME"], "missing", "db.sqlite3")
+
+        with self.assertRaises(Exception):
+            self.wrapper.ensure_connection()
+        self.assertEqual(errors + 1, self._sample("survey_db_connect_errors_total"))
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=True)
+    def test_check_broken_connection(self):
+        failures = self._sample("survey_db_health_check_failures_total")
+        self.wrapper.ensure_connection()
+
+        with patch("common.connections.connections.all", return_value=[self.wrapper]):
+            check_connections()
+            self.assertIsNotNone(self.wrapper.connection)
+
+            with patch.object(self.wrapper, "is_usable", return_value=False):
+                check_connections()
+            self.assertIsNone(self.wrapper.connection)
+        self.assertEqual(failures + 1, self._sample("survey_db_health_check_failures_total"))
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=False)
+    def test_check_disabled(self):
+        self.wrapper.ensure_connection()
+
+        with patch("common.connections.connections.all", return_value=[self.wrapper]), patch.object(self.wrapper, "is_usable", return_value=False):
+            check_connections()
+        self.assertIsNotNone(self.wrapper.connection)
@@ -0,0 +1,121 @@
+from __future__ import absolute_import, annotations
+
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+from wenet.interface.exceptions import RefreshTokenExpiredError
+
+from authentication.models import CachedCredentials
+from common.cache import DjangoCacheCredentials
+from common.credentials import CredentialsRefresher, CredentialsCollector
+from tasks.models import DeadLetterProfileUpdate, FailedProfileUpdateTask
+
+
+class TestCredentialsRefresher(TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        DjangoCacheCredentials.clear_local_cache()
+
+    def test_refresh(self):
+        def build_client(client_id, client_secret, resource_id, cache, **kwargs):
+            # the client writes the refreshed credentials through the cache it is given
+            client = Mock()
+            client.refresh_access_token.side_effect = lambda: cache.cache({"token": "newToken", "refresh_token": "newRefreshToken"}, key=resource_id)
+            return client
+
+        with patch("common.credentials.Oauth2Client", side_effect=build_client) as mock_client:
+            DjangoCacheCredentials().cache({"token": "token", "refresh_token": "refreshToken"}, key="wenetId", expires_in=0)
+            CachedCredentials.objects.filter(key="wenetId").update(last_used_at=timezone.now() - timedelta(days=1), next_refresh_at=timezone.now() - timedelta(minutes=1))
+
+            self.assertTrue(CredentialsRefresher().refresh("wenetId"))
+            self.assertEqual("wenetId", mock_client.call_args[0][2])
+            credentials = CachedCredentials.objects.get(key="wenetId")
+            self.assertEqual({"token": "newToken", "refresh_token": "newRefreshToken"}, credentials.data)
+            self.assertGreater(credentials.expires_at, timezone.now() + timedelta(seconds=settings.CREDENTIALS_REFRESH_AHEAD))
+            self.assertIsNone(credentials.next_refresh_at)
+            # the background refresh is not a use of the credentials
+            self.assertLess(credentials.last_used_at, timezone.now() - timedelta(hours=12))
+
+    def test_refresh_already_refreshed(self):
+        with patch("common.credentials.Oauth2Client") as mock_client:
+            DjangoCacheCredentials().cache({"token": "token", "refresh_token": "refreshToken"}, key="wenetId", expires_in=settings.CREDENTIALS_REFRESH_AHEAD * 2)
+
+            self.assertFalse(CredentialsRefresher().refresh("wenetId"))
+            mock_client.assert_not_called()
+
+    def test_refresh_idle(self):
+        with patch("common.credentials.Oauth2Client") as mock_client:
+            DjangoCacheCredentials().cache({"token": "token", "refresh_token": "refreshToken"}, key="wenetId", expires_in=0)
+            CachedCredentials.objects.filter(key="wenetId").update(last_used_at=timezone.now() - timedelta(days=settings.CREDENTIALS_RETENTION_DAYS + 1))
+
+            refresher = CredentialsRefresher()
+            self.assertEqual([], list(refresher.expiring()))
+            self.assertFalse(refresher.refresh("wenetId"))
+            mock_client.assert_not_called()
+
+    def test_refresh_claimed(self):
+        def refresh_access_token():
+            # the row is claimed while the platform is called, another worker skips it
+            self.assertGreater(CachedCredentials.objects.get(key="wenetId").next_refresh_at, timezone.now())
+            self.assertFalse(CredentialsRefresher().refresh("wenetId"))
+
+        with patch("common.credentials.Oauth2Client") as mock_client:
+            mock_client.return_value.refresh_access_token.side_effect = refresh_access_token
+            DjangoCacheCredentials().cache({"token": "token", "refresh_token": "refreshToken"}, key="wenetId", expires_in=0)
+
+            self.assertTrue(CredentialsRefresher().refresh("wenetId"))
+            mock_client.assert_called_once()
+            self.assertIsNone(CachedCredentials.objects.get(key="wenetId").next_refresh_at)
+
+    def test_refresh_expired_refresh_token(self):
+        with patch("common.credentials.Oauth2Client") as mock_client:
+            mock_client.return_value.refresh_access_token.side_effect = RefreshTokenExpiredError()
+            DjangoCacheCredentials().cache({"token": "token", "refresh_token": "refreshToken"}, key="wenetId", expires_in=0)
+
+            self.assertFalse(CredentialsRefresher().refresh("wenetId"))
+            credentials = CachedCredentials.objects.get(key="wenetId")
+            self.assertEqual({"token": "token", "refresh_token": "refreshToken"}, credentials.data)
+            self.assertIsNone(credentials.expires_at)
+
+    def test_refresh_transient_error(self):
+        with patch("common.credentials.Oauth2Client") as mock_client:
+            mock_client.return_value.refresh_access_token.side_effect = ConnectionError()
+            DjangoCacheCredentials().cache({"token": "token", "refresh_token": "refreshToken"}, key="wenetId", expires_in=0)
+            DjangoCacheCredentials().cache({"token": "token", "refresh_token": "refreshToken"}, key="otherWenetId", expires_in=60)
+
+            refresher = CredentialsRefresher()
+            self.assertFalse(refresher.refresh("wenetId"))
+            credentials = CachedCredentials.objects.get(key="wenetId")
+            self.assertIsNotNone(credentials.expires_at)
+            self.assertGreater(credentials.next_refresh_at, timezone.now())
+            # the credentials that keep failing do not hold the first places of the next scans
+            self.assertEqual(["otherWenetId"], list(refresher.expiring().values_list("key", flat=True)))
+
+
+class TestCredentialsCollector(TestCase):
+
+    def test_purge(self):
+        now = timezone.now()
+        CachedCredentials.objects.create(key="0b2e4a38-3a51-4b53-9d7b-5b9d3e0f1c2a", data={}, created_at=now - timedelta(days=1))
+        CachedCredentials.objects.create(key="5c8f2d1e-7a6b-4c3d-8e9f-0a1b2c3d4e5f", data={}, created_at=now)
+        CachedCredentials.objects.create(key="idle", data={}, last_used_at=now - timedelta(days=settings.CREDENTIALS_RETENTION_DAYS + 1), expires_at=None)
+        CachedCredentials.objects.create(key="wenetId", data={}, created_at=now - timedelta(days=1))
+
+        self.assertEqual({"orphaned": 1, "idle": 1}, CredentialsCollector().purge(batch_size=1))
+        self.assertEqual(["5c8f2d1e-7a6b-4c3d-8e9f-0a1b2c3d4e5f", "wenetId"], sorted(CachedCredentials.objects.values_list("key", flat=True)))
+
+    def test_purge_idle(self):
+        idle = timezone.now() - timedelta(days=settings.CREDENTIALS_RETENTION_DAYS + 1)
+        CachedCredentials.objects.create(key="refreshable", data={}, last_used_at=idle, expires_at=timezone.now() + timedelta(hours=1))
+        CachedCredentials.objects.create(key="used", data={}, last_used_at=timezone.now() - timedelta(days=1), expires_at=None)
+        CachedCredentials.objects.create(key="failed", data={}, last_used_at=idle, expires_at=None)
+        CachedCredentials.objects.create(key="deadLetter", data={}, last_used_at=idle, expires_at=None)
+        FailedProfileUpdateTask.register("failed", {"wenet_id": "failed", "answers": {}}, timezone.now())
+        DeadLetterProfileUpdate.objects.create(wenet_id="deadLetter", raw_survey_answer={"wenet_id": "deadLetter", "answers": {}}, failure_datetime=idle, dead_datetime=idle)
+
+        self.assertEqual({"orphaned": 0, "idle": 1}, CredentialsCollector().purge())
+        self.assertEqual(["deadLetter", "failed", "used"], sorted(CachedCredentials.objects.values_list("key", flat=True)))
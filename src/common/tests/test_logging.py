@@ -0,0 +1,92 @@
+from __future__ import absolute_import, annotations
+
+import io
+import logging
+import sys
+
+from django.test import TestCase
+
+from common.log.logging import AsyncHandler, SamplingFilter, _async_handlers
+
+
+class TestSamplingFilter(TestCase):
+
+    @staticmethod
+    def _record(name: str, level: int = logging.INFO) -> logging.LogRecord:
+        return logging.LogRecord(name, level, __file__, 0, "message", None, None)
+
+    def test_filter(self):
+        sampling_filter = SamplingFilter({"wenet-survey-web-app.common": 2})
+        self.assertEqual([True, True, False, False], [sampling_filter.filter(self._record("wenet-survey-web-app.common.profile")) for _ in range(4)])
+        self.assertTrue(sampling_filter.filter(self._record("wenet-survey-web-app.common.profile", logging.WARNING)))
+        self.assertTrue(sampling_filter.filter(self._record("wenet-survey-web-app.tasks.tasks")))
+
+    def test_filter_children(self):
+        sampling_filter = SamplingFilter({"wenet-survey-web-app": 2})
+        # the children of the configured logger share its budget
+        self.assertEqual([True, True, False, False], [
+            sampling_filter.filter(self._record(name)) for name in ["wenet-survey-web-app.common", "wenet-survey-web-app.tasks", "wenet-survey-web-app.common", "wenet-survey-web-app.ws"]
+        ])
+
+    def test_dropped_count(self):
+        sampling_filter = SamplingFilter({"wenet-survey-web-app": 1})
+        sampling_filter.filter(self._record("wenet-survey-web-app"))
+        sampling_filter.filter(self._record("wenet-survey-web-app"))
+        sampling_filter._windows["wenet-survey-web-app"][0] -= 1
+
+        record = self._record("wenet-survey-web-app")
+        self.assertTrue(sampling_filter.filter(record))
+        self.assertEqual("message (1 records dropped by sampling)", record.getMessage())
+
+
+class TestAsyncHandler(TestCase):
+
+    def test_emit(self):
+        stream = io.StringIO()
+        handler = AsyncHandler(stream=stream, log_format="%(levelname)s %(message)s")
+        logger = logging.getLogger("wenet-survey-web-app.tests.async")
+        logger.addHandler(handler)
+        logger.propagate = False
+        try:
+            values = ["first"]
+            logger.warning("Values %s", values)
+            values.append("second")
+            try:
+                raise ValueError("error")
+            except ValueError:
+                logger.exception("Failed")
+            handler.stop()
+        finally:
+            logger.removeHandler(handler)
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual("WARNING Values ['first']", lines[0])
+        self.assertEqual("ERROR Failed", lines[1])
+        self.assertIn("ValueError: error", lines[-1])
+
+    def test_full_queue(self):
+        handler = AsyncHandler(stream=sys.stdout, queue_size=1)
+        # the thread stops consuming the queue
+        handler._listener.stop()
+        handler.enqueue(logging.makeLogRecord({}))
+        handler.enqueue(logging.makeLogRecord({}))
+        self.assertEqual(1, handler.dropped)
+        handler._listener = None
+
+    def test_emit_after_stop(self):
+        stream = io.StringIO()
+        handler = AsyncHandler(stream=stream, log_format="%(message)s")
+        handler.stop()
+
+        handler.handle(logging.makeLogRecord({"msg": "Exiting %s", "args": ("worker",), "levelno": logging.INFO}))
+        self.assertEqual("Exiting worker\n", stream.getvalue())
+        self.assertEqual(0, handler.queue.qsize())
+        handler.close()
+
+    def test_close(self):
+        handler = AsyncHandler(stream=sys.stdout)
+        self.assertIn(handler, _async_handlers)
+
+        handler.close()
+        self.assertNotIn(handler, _async_handlers)
+        self.assertIsNone(handler._listener)
@@ -0,0 +1,36 @@
+from __future__ import absolute_import, annotations
+
+import os
+import subprocess
+import sys
+
+from django.test import SimpleTestCase
+
+from common.memory import ProcessMemory, child_pids, read_process_memory
+
+
+class TestProcessMemory(SimpleTestCase):
+
+    def test_parse(self):
+        smaps_rollup = "\n".join([
+            "55d0c0a00000-7ffd1b5fe000 ---p 00000000 00:00 0                          [rollup]",
+            "Rss:               51200 kB",
+            "Pss:               20480 kB",
+            "Shared_Clean:      30720 kB",
+            "Shared_Dirty:       4096 kB",
+            "Private_Clean:      1024 kB",
+            "Private_Dirty:     15360 kB",
+        ])
+
+        memory = ProcessMemory.parse(1, smaps_rollup)
+        self.assertEqual(ProcessMemory(1, 51200, 20480, 34816, 16384), memory)
+
+    def test_children(self):
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(10)"])
+        self.addCleanup(child.wait)
+        self.addCleanup(child.kill)
+
+        self.assertIn(child.pid, child_pids(os.getpid()))
+        memory = read_process_memory(child.pid)
+        self.assertGreater(memory.rss, 0)
+        self.assertEqual(memory.rss, memory.shared + memory.private)
@@ -0,0 +1,75 @@
+from __future__ import absolute_import, annotations
+
+import os
+import subprocess
+import sys
+import tempfile
+from unittest.mock import Mock, patch
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from prometheus_client import CollectorRegistry, REGISTRY, multiprocess
+
+from common.metrics import MeteredInterface, mark_process_dead
+
+
+class PlatformError(Exception):
+
+    def __init__(self, http_status_code: int) -> None:
+        super().__init__(f"Server reply with {http_status_code}")
+        self.http_status_code = http_status_code
+
+
+class TestMeteredInterface(TestCase):
+
+    @staticmethod
+    def _sample(name: str, **labels) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_call(self):
+        count = self._sample("survey_platform_request_duration_seconds_count", endpoint="get_user_profile")
+        interface = MeteredInterface(Mock(get_user_profile=Mock(return_value="profile"), platform_url="url"))
+
+        self.assertEqual("profile", interface.get_user_profile("1"))
+        self.assertEqual("url", interface.platform_url)
+        self.assertEqual(count + 1, self._sample("survey_platform_request_duration_seconds_count", endpoint="get_user_profile"))
+
+    def test_error(self):
+        errors = self._sample("survey_platform_request_errors_total", endpoint="update_user_materials", status="503")
+        interface = MeteredInterface(Mock(update_user_materials=Mock(side_effect=PlatformError(503))))
+
+        with self.assertRaises(PlatformError):
+            interface.update_user_materials("1", [])
+        self.assertEqual(errors + 1, self._sample("survey_platform_request_errors_total", endpoint="update_user_materials", status="503"))
+
+
+class TestMarkProcessDead(SimpleTestCase):
+
+    def test_mark_process_dead(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ["gauge_livesum_10.db", "gauge_livesum_11.db", "counter_10.db"]:
+                open(os.path.join(directory, name), "wb").close()
+
+            with patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory}):
+                mark_process_dead(10)
+
+            self.assertEqual(["counter_10.db", "gauge_livesum_11.db"], sorted(os.listdir(directory)))
+
+    def test_warm_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            environment = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory)
+            for exiting in [True, False]:
+                # a process warmed up, the first one then exits as the processes recycled by uwsgi do
+                script = "from common.metrics import WARM_PROCESSES, mark_process_dead; WARM_PROCESSES.inc()"
+                if exiting:
+                    script += "; mark_process_dead()"
+                subprocess.run([sys.executable, "-c", script], cwd=settings.BASE_DIR, env=environment, check=True)
+
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry, path=directory)
+            self.assertEqual(1, registry.get_sample_value("survey_warm_processes"))
+
+    def test_single_process(self):
+        with patch.dict(os.environ, clear=True), patch("common.metrics.multiprocess.mark_process_dead") as mock_mark_process_dead:
+            mark_process_dead()
+        mock_mark_process_dead.assert_not_called()
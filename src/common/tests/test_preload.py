@@ -0,0 +1,38 @@
+from __future__ import absolute_import, annotations
+
+import gc
+import os
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase
+
+from common.asynchronous import get_blocking_executor
+from common.preload import preload, reset_after_fork
+from tasks.tasks import ProfileHandler
+
+
+class TestPreload(SimpleTestCase):
+
+    def test_preload(self):
+        self.addCleanup(gc.unfreeze)
+        with patch("common.preload.connections.close_all") as mock_close_all:
+            preload(rules=True)
+
+        mock_close_all.assert_called_once()
+        self.assertGreater(gc.get_freeze_count(), 0)
+        self.assertIsNotNone(ProfileHandler._rule_manager)
+
+    def test_reset_after_fork(self):
+        executor = get_blocking_executor()
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, write_fd)
+        inherited = Mock(connection=Mock(fileno=Mock(return_value=read_fd)))
+
+        with patch("common.preload.connections.all", return_value=[inherited]):
+            reset_after_fork()
+
+        self.assertIsNone(inherited.connection)
+        with self.assertRaises(OSError):
+            os.fstat(read_fd)
+        self.assertIsNot(executor, get_blocking_executor())
+        executor.shutdown()
@@ -0,0 +1,39 @@
+from __future__ import absolute_import, annotations
+
+import os
+import unittest
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from common.startup import STARTUP_TARGETS, measure_startup, parse_import_times
+
+
+class TestStartup(SimpleTestCase):
+
+    def test_parse_import_times(self):
+        output = "import time: self [us] | cumulative | imported package\n" \
+                 "import time:       120 |        120 |     common.enumerator\n" \
+                 "import time:      2048 |       4096 |   common.rules\n" \
+                 "Traceback (most recent call last):\n"
+        import_times = parse_import_times(output)
+
+        self.assertEqual(["common.enumerator", "common.rules"], [import_time.module for import_time in import_times])
+        self.assertEqual(2048, import_times[1].self_us)
+        self.assertEqual(4096, import_times[1].cumulative_us)
+
+    @unittest.skipUnless(os.getenv("STARTUP_TESTS", "FALSE").upper() == "TRUE", "starts several interpreters, enabled by STARTUP_TESTS=TRUE")
+    def test_startup_budget(self):
+        for target in STARTUP_TARGETS:
+            with self.subTest(target=target):
+                measure_startup(target)  # warms up the cache of the compiled modules
+                self.assertLess(measure_startup(target).duration, settings.STARTUP_BUDGET_SECONDS)
+
+    @unittest.skipUnless(os.getenv("STARTUP_TESTS", "FALSE").upper() == "TRUE", "starts an interpreter, enabled by STARTUP_TESTS=TRUE")
+    def test_profile_imports(self):
+        profile = measure_startup("worker", profile_imports=True)
+        modules = [import_time.module for import_time in profile.imports]
+
+        self.assertIn("common.log.logging", modules)
+        self.assertNotIn("survey.mappings.num", modules)  # loaded by the first profile update
+        self.assertEqual(3, len(profile.slowest(3)))
@@ -0,0 +1,65 @@
+from __future__ import absolute_import, annotations
+
+import gzip
+import json
+import os
+import tempfile
+
+import brotli
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from common.storage import is_immutable, select_variant
+
+
+class TestCompressedManifestStaticFilesStorage(SimpleTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.static_root.cleanup)
+
+    def _collect_static(self) -> None:
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def test_collect_static(self):
+        with override_settings(DEBUG=False, STATIC_ROOT=self.static_root.name, STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"]):
+            self._collect_static()
+
+            with open(os.path.join(self.static_root.name, "staticfiles.json")) as file:
+                manifest = json.load(file)["paths"]
+            hashed_name = manifest["css/style.css"]
+            self.assertTrue(is_immutable(hashed_name))
+            self.assertEqual(f"{settings.STATIC_URL}{hashed_name}", staticfiles_storage.url("css/style.css"))
+
+            with open(os.path.join(self.static_root.name, hashed_name), "rb") as file:
+                content = file.read()
+            with open(os.path.join(self.static_root.name, f"{hashed_name}.gz"), "rb") as file:
+                self.assertEqual(content, gzip.decompress(file.read()))
+            with open(os.path.join(self.static_root.name, f"{hashed_name}.br"), "rb") as file:
+                self.assertEqual(content, brotli.decompress(file.read()))
+            # the references to the other files use their hashed names
+            self.assertIn(manifest["images/WeNet_background.jpg"].split("/")[-1], content.decode())
+
+            self.assertFalse(os.path.exists(os.path.join(self.static_root.name, f"{manifest['images/WeNet_logo.png']}.gz")))
+
+    def test_collect_static_again(self):
+        with override_settings(STATIC_ROOT=self.static_root.name, STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"]):
+            self._collect_static()
+            self._collect_static()
+
+            self.assertEqual([], [name for name in os.listdir(os.path.join(self.static_root.name, "css")) if name.count(".") > 3])
+
+    def test_url_without_manifest(self):
+        with override_settings(DEBUG=False, STATIC_ROOT=self.static_root.name):
+            self.assertEqual(f"{settings.STATIC_URL}css/style.css", staticfiles_storage.url("css/style.css"))
+
+    def test_select_variant(self):
+        with open(os.path.join(self.static_root.name, "style.css.gz"), "wb") as file:
+            file.write(b"")
+
+        self.assertEqual(("style.css.gz", "gzip"), select_variant(self.static_root.name, "style.css", "gzip, deflate, br"))
+        self.assertEqual(("style.css", None), select_variant(self.static_root.name, "style.css", "identity"))
+        self.assertEqual(("logo.png", None), select_variant(self.static_root.name, "logo.png", "gzip"))
@@ -0,0 +1,39 @@
+from __future__ import absolute_import, annotations
+
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from prometheus_client import REGISTRY
+
+from common.warmup import is_ready, reset_warm_up, warm_up
+from tasks.tasks import ProfileHandler
+
+
+class TestWarmUp(TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        reset_warm_up()
+        self.addCleanup(reset_warm_up)
+
+    @staticmethod
+    def _sample(name: str, **labels) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_warm_up(self):
+        self.assertFalse(is_ready())
+
+        warm_up(rules=True)
+        self.assertTrue(is_ready())
+        self.assertIsNotNone(ProfileHandler._rule_manager)
+        self.assertIsNotNone(connection.connection)
+
+    def test_failed_step(self):
+        failures = self._sample("survey_warmup_failures_total", step="database")
+
+        with patch("common.warmup.connections") as mock_connections:
+            mock_connections.__getitem__.return_value.ensure_connection.side_effect = ConnectionError()
+            warm_up()
+        self.assertTrue(is_ready())
+        self.assertEqual(failures + 1, self._sample("survey_warmup_failures_total", step="database"))
@@ -0,0 +1,74 @@
+from __future__ import absolute_import, annotations
+
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from common.metrics import WARM_PROCESSES, WARMUP_DURATION, WARMUP_FAILURES
+
+
+logger = logging.getLogger("wenet-survey-web-app.common.warmup")
+
+_warm_up_seconds: Optional[float] = None
+
+
+def build_rules() -> None:
+    from tasks.tasks import ProfileHandler
+    ProfileHandler.get_rule_manager()
+
+
+def connect_database() -> None:
+    connections[DEFAULT_DB_ALIAS].ensure_connection()
+
+
+def warm_up(rules: bool = False, database: bool = True) -> None:
+    """
+    Get a new process ready to serve its first request or task at full speed: build the rules with their mappings (when
+    not preloaded) and open the connection to the database.
+
+    A step that fails is logged and skipped, the process is then served as usual and the step happens on the first
+    request or task. The process is ready once the warm-up is done.
+
+    :param rules: Whether to build the rules mapping the answers of the survey to the profile, with their mappings
+    :param database: Whether to open the connection to the database, it belongs to the thread running the warm-up
+    """
+    global _warm_up_seconds
+    steps: Dict[str, Callable[[], None]] = {}
+    if rules:
+        steps["rules"] = build_rules
+    if database:
+        steps["database"] = connect_database
+
+    warm_up_start = time.perf_counter()
+    for step, function in steps.items():
+        start = time.perf_counter()
+        try:
+            function()
+        except Exception as e:
+            WARMUP_FAILURES.labels(step=step).inc()
+            logger.warning(f"Unable to warm up the {step} of the process", exc_info=e)
+        WARMUP_DURATION.labels(step=step).observe(time.perf_counter() - start)
+
+    if _warm_up_seconds is None:
+        WARM_PROCESSES.inc()
+    _warm_up_seconds = time.perf_counter() - warm_up_start
+    logger.info(f"Warmed up the process in {_warm_up_seconds * 1000:.0f} ms")
+
+
+def is_ready() -> bool:
+    return _warm_up_seconds is not None
+
+
+def warm_up_seconds() -> Optional[float]:
+    return _warm_up_seconds
+
+
+def reset_warm_up() -> None:
+    """
+    Forget the warm-up of the parent process, a forked process warms up on its own.
+    """
+    global _warm_up_seconds
+    _warm_up_seconds = None
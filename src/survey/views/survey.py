@@ -4,36 +4,29 @@ import logging
 import re
 
 from django.conf import settings
+from django.http import HttpRequest
 from django.shortcuts import redirect, render
 from django.utils import translation
-from rest_framework.request import Request
-from rest_framework.views import APIView
 from wenet.interface.client import Oauth2Client
 from wenet.interface.exceptions import RefreshTokenExpiredError
 from wenet.interface.service_api import ServiceApiInterface
+from wenet.model.user.profile import WeNetUserProfile
 
+from common.asynchronous import AsyncView, load_session, run_blocking
 from common.cache import DjangoCacheCredentials
 from wenet_survey.mixin import ActivateTranslationMixin
 
 logger = logging.getLogger("wenet-survey-web-app.survey.views.survey")
 
 
-class SurveyView(ActivateTranslationMixin, APIView):
+class SurveyView(ActivateTranslationMixin, AsyncView):
 
-    def get(self, request: Request):
+    async def get(self, request: HttpRequest):
         super().initialize_translations()
+        await load_session(request)
         if request.session.get("has_logged", False):
-            client = Oauth2Client(
-                settings.WENET_APP_ID,
-                settings.WENET_APP_SECRET,
-                request.session["resource_id"],
-                DjangoCacheCredentials(),
-                token_endpoint_url=f"{settings.WENET_INSTANCE_URL}/api/oauth2/token"
-            )
-            service_api_interface = ServiceApiInterface(client, platform_url=settings.WENET_INSTANCE_URL)
             try:
-                token_details = service_api_interface.get_token_details()
-                user_profile = service_api_interface.get_user_profile(token_details.profile_id)
+                user_profile = await run_blocking(self._get_user_profile, request.session["resource_id"])
 
                 locale = user_profile.locale if user_profile.locale else "en"
 
@@ -81,3 +74,16 @@ class SurveyView(ActivateTranslationMixin, APIView):
                 return render(request, "error.html", context=context)
         else:
             return redirect(f"/{settings.BASE_URL}")
+
+    @staticmethod
+    def _get_user_profile(resource_id: str) -> WeNetUserProfile:
+        client = Oauth2Client(
+            settings.WENET_APP_ID,
+            settings.WENET_APP_SECRET,
+            resource_id,
+            DjangoCacheCredentials(),
+            token_endpoint_url=f"{settings.WENET_INSTANCE_URL}/api/oauth2/token"
+        )
+        service_api_interface = ServiceApiInterface(client, platform_url=settings.WENET_INSTANCE_URL)
+        token_details = service_api_interface.get_token_details()
+        return service_api_interface.get_user_profile(token_details.profile_id)
@@ -1,6 +1,51 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
-from tasks.models import FailedProfileUpdateTask, LastUserProfileUpdate
+from tasks.models import FailedProfileUpdateTask, LastUserProfileUpdate, DeadLetterProfileUpdate, TaskOutcome, SubmissionTimeline, \
+    ProfileSectionShadow, ProfileUpdateCheckpoint
 
 admin.site.register(FailedProfileUpdateTask)
 admin.site.register(LastUserProfileUpdate)
+admin.site.register(ProfileSectionShadow)
+
+
+@admin.register(DeadLetterProfileUpdate)
+class DeadLetterProfileUpdateAdmin(admin.ModelAdmin):
+
+    list_display = ["wenet_id", "failure_datetime", "dead_datetime", "retry_count", "last_error_type"]
+    list_filter = ["last_error_type", "failure_datetime"]
+    search_fields = ["wenet_id"]
+    actions = ["requeue"]
+
+    @admin.action(description="Requeue the selected dead letters for recovery")
+    def requeue(self, request, queryset):
+        requeued = 0
+        superseded = 0
+        for dead_letter in queryset.iterator():
+            if dead_letter.requeue():
+                requeued += 1
+            else:
+                superseded += 1
+        self.message_user(request, f"Requeued {requeued} dead letters, {superseded} were superseded by a more recent survey answer", messages.SUCCESS)
+
+
+@admin.register(TaskOutcome)
+class TaskOutcomeAdmin(admin.ModelAdmin):
+
+    list_display = ["minute", "task", "outcome", "count"]
+    list_filter = ["task", "outcome"]
+    date_hierarchy = "minute"
+
+
+@admin.register(SubmissionTimeline)
+class SubmissionTimelineAdmin(admin.ModelAdmin):
+
+    list_display = ["trace_id", "wenet_id", "received_at", "completed_at", "attempts"]
+    search_fields = ["trace_id", "wenet_id"]
+    date_hierarchy = "received_at"
+
+
+@admin.register(ProfileUpdateCheckpoint)
+class ProfileUpdateCheckpointAdmin(admin.ModelAdmin):
+
+    list_display = ["wenet_id", "sections", "attempts", "updated_at"]
+    search_fields = ["wenet_id"]
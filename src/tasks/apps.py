@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks'
+
+    def ready(self):
+        # connect the signal handlers measuring how long the tasks wait in their queue and run, consuming the shard
+        # queues, exposing the metrics of the worker, checking the database connections before they are reused and
+        # preloading the worker before it forks the processes of its pool
+        from common import connections, preload  # noqa: F401
+        from tasks import freshness, metrics, routing  # noqa: F401
@@ -0,0 +1,206 @@
+from __future__ import absolute_import, annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+from prometheus_client.core import GaugeMetricFamily
+
+from tasks.models import FailedProfileUpdateTask, TaskOutcome
+from tasks.routing import shard_queue
+from tasks.tasks import update_user_profile
+from wenet_survey.celery import app
+
+
+logger = logging.getLogger("wenet-survey-web-app.tasks.backpressure")
+
+
+@dataclass
+class Health:
+    """
+    The signals of the health of the profile updates, None when a signal could not be measured.
+    """
+
+    queue_depth: Optional[int] = None
+    failed_backlog: Optional[int] = None
+    recovery_delay: Optional[float] = None
+    failure_ratio: Optional[float] = None
+
+    @staticmethod
+    def thresholds() -> dict:
+        """
+        The values of the signals above which the webhook rejects the submissions, 0 disables a signal.
+        """
+        return {
+            "queue_depth": settings.WEBHOOK_MAX_QUEUE_DEPTH,
+            "failed_backlog": settings.WEBHOOK_MAX_FAILED_BACKLOG,
+            "recovery_delay": settings.WEBHOOK_MAX_RECOVERY_DELAY,
+            "failure_ratio": settings.WEBHOOK_MAX_FAILURE_RATIO
+        }
+
+    def exceeded(self) -> Optional[str]:
+        """
+        Get the first signal above its threshold, if any.
+        """
+        for signal, threshold in self.thresholds().items():
+            value = getattr(self, signal)
+            if threshold > 0 and value is not None and value > threshold:
+                return signal
+        return None
+
+
+def profile_update_queues() -> List[str]:
+    if settings.PROFILE_UPDATE_SHARDS > 0:
+        return [shard_queue(settings.PROFILE_UPDATE_QUEUE, shard) for shard in range(settings.PROFILE_UPDATE_SHARDS)]
+    return [settings.PROFILE_UPDATE_QUEUE]
+
+
+def _is_not_found(error: Exception) -> bool:
+    # amqp raises NotFound with the code 404, the virtual transports a ChannelError starting with NOT_FOUND
+    return getattr(error, "code", None) == 404 or str(error).startswith("NOT_FOUND")
+
+
+def measure_queue_depth() -> int:
+    """
+    Count the messages waiting in the queues of the profile updates on the broker.
+
+    A queue not declared yet, such as the one of a shard no worker consumes, holds no messages. Since the broker closes
+    the channel of a passive declaration of a missing queue, each queue is declared on its own channel.
+    """
+    depth = 0
+    # the request measuring the health waits for the broker, an unreachable broker must not hold it for long
+    with app.connection_for_read(connect_timeout=2) as connection:
+        connection.ensure_connection(max_retries=1)
+        for queue in profile_update_queues():
+            try:
+                with connection.channel() as channel:
+                    depth += channel.queue_declare(queue=queue, passive=True).message_count
+            except connection.channel_errors as e:
+                if not _is_not_found(e):
+                    raise
+                logger.debug(f"The queue [{queue}] is not declared yet")
+    return depth
+
+
+def measure_health() -> Health:
+    """
+    Measure the signals of the health of the profile updates, each one with a single query.
+
+    * `queue_depth`: the profile updates waiting on the broker;
+    * `failed_backlog`: the failed profile updates waiting for a recovery;
+    * `recovery_delay`: the seconds since the oldest due recovery should have run;
+    * `failure_ratio`: the ratio of the profile updates that failed in the last `WEBHOOK_FAILURE_WINDOW` seconds, when
+      at least `WEBHOOK_FAILURE_MIN_RUNS` ran, since a platform failing every call is the one of an incident.
+    """
+    health = Health()
+    now = timezone.now()
+    if settings.WEBHOOK_MAX_QUEUE_DEPTH > 0:
+        try:
+            health.queue_depth = measure_queue_depth()
+        except Exception as e:
+            logger.warning("Unable to measure the depth of the profile update queues", exc_info=e)
+
+    try:
+        backlog = FailedProfileUpdateTask.objects.aggregate(
+            failed=Count("id"),
+            oldest_due=Min("next_attempt_at", filter=Q(next_attempt_at__lte=now))
+        )
+        health.failed_backlog = backlog["failed"]
+        health.recovery_delay = (now - backlog["oldest_due"]).total_seconds() if backlog["oldest_due"] is not None else 0.0
+
+        runs = TaskOutcome.objects.filter(
+            task=update_user_profile.name,
+            minute__gte=now - timedelta(seconds=settings.WEBHOOK_FAILURE_WINDOW),
+            outcome__in=[TaskOutcome.SUCCESS, TaskOutcome.FAILED]
+        ).aggregate(
+            runs=Sum("count"),
+            failed=Sum("count", filter=Q(outcome=TaskOutcome.FAILED))
+        )
+        if runs["runs"] and runs["runs"] >= settings.WEBHOOK_FAILURE_MIN_RUNS:
+            health.failure_ratio = (runs["failed"] or 0) / runs["runs"]
+        else:
+            health.failure_ratio = 0.0
+    except Exception as e:
+        logger.warning("Unable to measure the backlog of the profile updates", exc_info=e)
+    return health
+
+
+class Backpressure:
+    """
+    Decide if the webhook rejects the submissions because the profile updates do not keep up, the submissions are
+    then retried by Tally.
+
+    The health is measured again by each process at most once every `WEBHOOK_HEALTH_TTL` seconds, by the request that
+    finds it expired while the other requests use the previous one. The submissions are accepted when the health can
+    not be measured.
+    """
+
+    def __init__(self) -> None:
+        self._health = Health()
+        self._measured_at: Optional[float] = None
+        self._rejecting: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def health(self) -> Health:
+        now = time.monotonic()
+        if self._measured_at is None or now - self._measured_at >= settings.WEBHOOK_HEALTH_TTL:
+            if self._lock.acquire(blocking=self._measured_at is None):
+                try:
+                    if self._measured_at is None or now - self._measured_at >= settings.WEBHOOK_HEALTH_TTL:
+                        self._health = measure_health()
+                        self._measured_at = time.monotonic()
+                        self._log_transition(self._health.exceeded())
+                finally:
+                    self._lock.release()
+        return self._health
+
+    def rejection_reason(self) -> Optional[str]:
+        """
+        Get the signal above its threshold that makes the webhook reject the submissions, None if they are accepted.
+        """
+        return self.health().exceeded()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._health = Health()
+            self._measured_at = None
+            self._rejecting = None
+
+    def _log_transition(self, reason: Optional[str]) -> None:
+        if reason != self._rejecting:
+            if reason is not None:
+                logger.warning(f"Rejecting the survey submissions, the {reason} is {getattr(self._health, reason)} above the threshold of {Health.thresholds()[reason]}")
+            else:
+                logger.info("Accepting the survey submissions again")
+            self._rejecting = reason
+
+
+backpressure = Backpressure()
+
+
+class BackpressureCollector:
+    """
+    Expose the signals of the backpressure last measured by the process together with their thresholds, and which
+    enabled signals could not be measured and are then ignored by the webhook.
+    """
+
+    def collect(self):
+        health = backpressure.health()
+        signals = GaugeMetricFamily("survey_webhook_backpressure_signal", "Signals of the health of the profile updates checked by the webhook", labels=["signal"])
+        thresholds = GaugeMetricFamily("survey_webhook_backpressure_threshold", "Values of the signals above which the webhook rejects the submissions, 0 when disabled", labels=["signal"])
+        unmeasured = GaugeMetricFamily("survey_webhook_backpressure_unmeasured", "Enabled signals that could not be measured, 1 when the webhook ignores them", labels=["signal"])
+        for signal, threshold in Health.thresholds().items():
+            value = getattr(health, signal)
+            if value is not None:
+                signals.add_metric([signal], value)
+            thresholds.add_metric([signal], threshold)
+            unmeasured.add_metric([signal], 1 if threshold > 0 and value is None else 0)
+        yield signals
+        yield thresholds
+        yield unmeasured
@@ -0,0 +1,87 @@
+from __future__ import absolute_import, annotations
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from django.db import connections
+from django.db.models import QuerySet
+
+from common.ratelimit import RateLimiter
+from tasks.models import DeadLetterProfileUpdate, FailedProfileUpdateTask, LastUserProfileUpdate
+from tasks.tasks import ProfileHandler
+from ws.models.survey import SurveyAnswer
+
+
+logger = logging.getLogger("wenet-survey-web-app.tasks.dead_letters")
+
+
+class DeadLetterReplayer:
+    """
+    Replay the dead letter profile updates against the platform with at most `concurrency` updates in progress and at
+    most `rate` updates started each second.
+
+    Replayed updates are removed from the dead letters, the ones failing again keep their latest error. Dead letters
+    superseded by a more recent survey answer of the user are removed without being replayed.
+    """
+
+    REPLAYED = "replayed"
+    FAILED = "failed"
+    SUPERSEDED = "superseded"
+
+    def __init__(self, concurrency: int = 4, rate: float = 5) -> None:
+        self._concurrency = concurrency
+        self._rate_limiter = RateLimiter(rate)
+
+    def replay(self, dead_letters: QuerySet, progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+        """
+        Replay the dead letters.
+
+        :param dead_letters: The dead letters to replay
+        :param progress: Called with the outcomes counted so far each time a dead letter is processed
+        :return: The number of dead letters for each outcome
+        """
+        outcomes = {self.REPLAYED: 0, self.FAILED: 0, self.SUPERSEDED: 0}
+        lock = threading.Lock()
+        # the submissions are bounded, so only the ids of the updates in progress are held in memory
+        slots = threading.BoundedSemaphore(self._concurrency * 2)
+
+        def process(dead_letter_id: int) -> None:
+            try:
+                outcome = self._replay(dead_letter_id)
+            except Exception as e:
+                logger.exception(f"Unexpected error while replaying the dead letter [{dead_letter_id}]", exc_info=e)
+                outcome = self.FAILED
+            finally:
+                slots.release()
+                connections.close_all()
+            with lock:
+                outcomes[outcome] += 1
+                if progress is not None:
+                    progress(dict(outcomes))
+
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            for dead_letter_id in dead_letters.values_list("id", flat=True).iterator():
+                slots.acquire()
+                executor.submit(process, dead_letter_id)
+        return outcomes
+
+    def _replay(self, dead_letter_id: int) -> str:
+        dead_letter: Optional[DeadLetterProfileUpdate] = DeadLetterProfileUpdate.objects.filter(id=dead_letter_id).first()
+        if dead_letter is None or dead_letter.is_superseded():
+            DeadLetterProfileUpdate.objects.filter(id=dead_letter_id).delete()
+            return self.SUPERSEDED
+
+        self._rate_limiter.acquire()
+        survey_answer = SurveyAnswer.from_repr(dead_letter.raw_survey_answer)
+        try:
+            ProfileHandler(survey_answer.wenet_id).update_profile(survey_answer)
+        except Exception as e:
+            logger.warning(f"Unable to replay the dead letter profile update of {dead_letter.wenet_id}", exc_info=e)
+            DeadLetterProfileUpdate.objects.filter(id=dead_letter_id).update(**FailedProfileUpdateTask.error_fields(e))
+            return self.FAILED
+
+        LastUserProfileUpdate.register(survey_answer.wenet_id)
+        DeadLetterProfileUpdate.objects.filter(id=dead_letter_id, failure_datetime=dead_letter.failure_datetime).delete()
+        return self.REPLAYED
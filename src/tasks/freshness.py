@@ -0,0 +1,105 @@
+from __future__ import absolute_import, annotations
+
+import logging
+import random
+import threading
+import time
+from typing import Dict, List
+
+from celery.signals import before_task_publish, task_prerun
+from django.conf import settings
+
+from common.metrics import QUEUE_WAIT
+
+
+logger = logging.getLogger("wenet-survey-web-app.tasks.freshness")
+
+
+PUBLISHED_AT_HEADER = "published_at"
+
+
+class QueueFreshness:
+    """
+    Collect, for each queue, how long the tasks waited in the queue before a worker started them.
+
+    The wait is measured from the publication time stamped in the message headers, so the clocks of the publishers
+    and of the workers are assumed to be synchronized.
+    """
+
+    def __init__(self, max_samples: int = 1000) -> None:
+        self.max_samples = max_samples
+        self._samples: Dict[str, List[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._maximums: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, queue: str, wait: float) -> None:
+        with self._lock:
+            samples = self._samples.setdefault(queue, [])
+            count = self._counts.get(queue, 0) + 1
+            self._counts[queue] = count
+            self._maximums[queue] = max(self._maximums.get(queue, 0.0), wait)
+            # reservoir sampling keeps the percentiles unbiased when more than `max_samples` tasks are started
+            if len(samples) < self.max_samples:
+                samples.append(wait)
+            else:
+                index = random.randrange(count)
+                if index < self.max_samples:
+                    samples[index] = wait
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            summary = {}
+            for queue, samples in self._samples.items():
+                ordered = sorted(samples)
+                summary[queue] = {
+                    "count": self._counts[queue],
+                    "median": ordered[len(ordered) // 2],
+                    "p95": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+                    "max": self._maximums[queue]
+                }
+            return summary
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._maximums.clear()
+
+
+freshness = QueueFreshness()
+_last_report = time.monotonic()
+_report_lock = threading.Lock()
+
+
+@before_task_publish.connect
+def stamp_publication(headers=None, **kwargs) -> None:
+    if headers is not None:
+        headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+
+@task_prerun.connect
+def record_wait(task=None, **kwargs) -> None:
+    published_at = getattr(task.request, PUBLISHED_AT_HEADER, None) if task is not None else None
+    if published_at is None:
+        return
+
+    delivery_info = task.request.delivery_info or {}
+    queue = delivery_info.get("routing_key") or "unknown"
+    wait = max(time.time() - published_at, 0.0)
+    freshness.record(queue, wait)
+    QUEUE_WAIT.labels(queue=queue).observe(wait)
+    _report()
+
+
+def _report() -> None:
+    global _last_report
+    with _report_lock:
+        if time.monotonic() - _last_report < settings.TASK_FRESHNESS_LOG_INTERVAL:
+            return
+        _last_report = time.monotonic()
+        summary = freshness.summary()
+        freshness.reset()
+
+    for queue, statistics in sorted(summary.items()):
+        logger.info(f"Queue [{queue}] started {statistics['count']} tasks, waited median {statistics['median']:.2f}s, p95 {statistics['p95']:.2f}s, max {statistics['max']:.2f}s")
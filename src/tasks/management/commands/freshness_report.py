@@ -0,0 +1,42 @@
+from __future__ import absolute_import, annotations
+
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from tasks.models import SubmissionTimeline
+from tasks.timeline import FreshnessReport
+
+
+class Command(BaseCommand):
+
+    help = "Report how long after a submission the profile of the user is updated, and the slowest stages of the processing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=self._datetime, default=None, help="Report the submissions received since this ISO 8601 datetime (default 24 hours ago)")
+        parser.add_argument("--until", type=self._datetime, default=None, help="Report the submissions received before this ISO 8601 datetime")
+
+    def handle(self, *args, **options):
+        since = options["since"] if options["since"] is not None else timezone.now() - timedelta(days=1)
+        timelines = SubmissionTimeline.objects.filter(received_at__gte=since)
+        if options["until"] is not None:
+            timelines = timelines.filter(received_at__lt=options["until"])
+
+        report = FreshnessReport(timelines).build()
+        self.stdout.write(f"Submissions: {report['submissions']}, completed: {report['completed']}, retried: {report['retried']}")
+        self.stdout.write(f"Freshness: {self._format(report['freshness'])}")
+        self.stdout.write(f"{'stage':>20} {'count':>8} {'median s':>10} {'p95 s':>10} {'p99 s':>10} {'max s':>10}")
+        for statistics in report["stages"]:
+            self.stdout.write(f"{statistics['stage']:>20} {statistics['count']:>8} {statistics['median']:>10.3f} {statistics['p95']:>10.3f} {statistics['p99']:>10.3f} {statistics['max']:>10.3f}")
+
+    @staticmethod
+    def _format(percentiles: dict) -> str:
+        return ", ".join(f"{name} {value:.3f}s" if value is not None else f"{name} -" for name, value in percentiles.items())
+
+    @staticmethod
+    def _datetime(value: str) -> datetime:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f"Invalid datetime [{value}]")
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
@@ -0,0 +1,57 @@
+from __future__ import absolute_import, annotations
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from tasks.dead_letters import DeadLetterReplayer
+from tasks.models import DeadLetterProfileUpdate
+
+
+class Command(BaseCommand):
+
+    help = "Replay the dead letter profile updates against the platform"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=self._datetime, default=None, help="Replay only the updates failed since this ISO 8601 datetime")
+        parser.add_argument("--until", type=self._datetime, default=None, help="Replay only the updates failed before this ISO 8601 datetime")
+        parser.add_argument("--error-type", action="append", default=None, help="Replay only the updates failed with this error type (e.g., ApiException), can be repeated")
+        parser.add_argument("--concurrency", type=int, default=4, help="The maximum number of updates in progress (default 4)")
+        parser.add_argument("--rate", type=float, default=5, help="The maximum number of updates started each second (default 5)")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the dead letters that would be replayed")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("The concurrency must be at least 1")
+
+        dead_letters = DeadLetterProfileUpdate.objects.order_by("failure_datetime")
+        if options["since"] is not None:
+            dead_letters = dead_letters.filter(failure_datetime__gte=options["since"])
+        if options["until"] is not None:
+            dead_letters = dead_letters.filter(failure_datetime__lt=options["until"])
+        if options["error_type"]:
+            dead_letters = dead_letters.filter(last_error_type__in=options["error_type"])
+
+        total = dead_letters.count()
+        self.stdout.write(f"Dead letters to replay: {total}")
+        if options["dry_run"] or total == 0:
+            return
+
+        step = max(total // 20, 1)
+
+        def progress(outcomes: dict) -> None:
+            processed = sum(outcomes.values())
+            if processed % step == 0 or processed == total:
+                self.stdout.write(f"  {processed}/{total} ({outcomes[DeadLetterReplayer.REPLAYED]} replayed, {outcomes[DeadLetterReplayer.FAILED]} failed, {outcomes[DeadLetterReplayer.SUPERSEDED]} superseded)")
+
+        outcomes = DeadLetterReplayer(options["concurrency"], options["rate"]).replay(dead_letters, progress)
+        self.stdout.write(f"Replayed {outcomes[DeadLetterReplayer.REPLAYED]} dead letters, {outcomes[DeadLetterReplayer.FAILED]} failed again and {outcomes[DeadLetterReplayer.SUPERSEDED]} were superseded")
+
+    @staticmethod
+    def _datetime(value: str) -> datetime:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f"Invalid datetime [{value}]")
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
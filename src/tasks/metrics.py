@@ -0,0 +1,55 @@
+from __future__ import absolute_import, annotations
+
+import logging
+import time
+from typing import Dict
+
+from celery.signals import task_postrun, task_prerun, worker_init
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+from prometheus_client import start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+from common.metrics import TASK_DURATION, process_registry
+from tasks.models import DeadLetterProfileUpdate, FailedProfileUpdateTask
+
+
+logger = logging.getLogger("wenet-survey-web-app.tasks.metrics")
+
+
+class BacklogCollector:
+    """
+    Expose the backlog of the failed profile updates, it is read from the database only when the metrics are scraped.
+    """
+
+    def collect(self):
+        now = timezone.now()
+        failed = FailedProfileUpdateTask.objects.aggregate(oldest=Min("failure_datetime"))["oldest"]
+        yield GaugeMetricFamily("survey_failed_profile_updates", "Failed profile updates waiting for a recovery", value=FailedProfileUpdateTask.objects.count())
+        yield GaugeMetricFamily("survey_failed_profile_updates_due", "Failed profile updates whose next attempt is due", value=FailedProfileUpdateTask.objects.filter(next_attempt_at__lte=now).count())
+        yield GaugeMetricFamily("survey_failed_profile_updates_oldest_age_seconds", "Age of the oldest failed profile update", value=(now - failed).total_seconds() if failed is not None else 0)
+        yield GaugeMetricFamily("survey_dead_letter_profile_updates", "Profile updates that exhausted their retries", value=DeadLetterProfileUpdate.objects.count())
+
+
+_started: Dict[str, float] = {}
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **kwargs) -> None:
+    _started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def observe_task_duration(task_id=None, task=None, **kwargs) -> None:
+    start = _started.pop(task_id, None)
+    if start is not None and task is not None:
+        TASK_DURATION.labels(task=task.name).observe(time.perf_counter() - start)
+
+
+@worker_init.connect
+def expose_worker_metrics(**kwargs) -> None:
+    # started by the main process of the worker, it aggregates the metrics written by the processes of the pool
+    if settings.WORKER_METRICS_PORT > 0:
+        start_http_server(settings.WORKER_METRICS_PORT, registry=process_registry())
+        logger.info(f"Exposing the metrics of the worker on port {settings.WORKER_METRICS_PORT}")
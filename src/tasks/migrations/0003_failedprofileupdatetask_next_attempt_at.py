@@ -0,0 +1,19 @@
+# Generated by Django 3.2.6 on 2026-10-19 12:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_failedprofileupdatetask_retry_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failedprofileupdatetask',
+            name='next_attempt_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.6 on 2026-10-19 13:41
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicated_users(apps, schema_editor):
+    # keep only the most recent row of each user, otherwise the unique indexes can not be created
+    for model_name, datetime_field in [("FailedProfileUpdateTask", "failure_datetime"), ("LastUserProfileUpdate", "last_update")]:
+        model = apps.get_model("tasks", model_name)
+        duplicated_users = model.objects.values("wenet_id").annotate(count=Count("id")).filter(count__gt=1)
+        for duplicated_user in duplicated_users.iterator():
+            rows = model.objects.filter(wenet_id=duplicated_user["wenet_id"])
+            last_id = rows.order_by(f"-{datetime_field}", "-id").values_list("id", flat=True)[0]
+            rows.exclude(id=last_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_failedprofileupdatetask_next_attempt_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicated_users, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='failedprofileupdatetask',
+            name='wenet_id',
+            field=models.CharField(max_length=1024, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='lastuserprofileupdate',
+            name='wenet_id',
+            field=models.CharField(max_length=1024, unique=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.6 on 2026-10-19 13:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_unique_wenet_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeadLetterProfileUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('failure_datetime', models.DateTimeField(db_index=True)),
+                ('dead_datetime', models.DateTimeField(default=django.utils.timezone.now)),
+                ('wenet_id', models.CharField(max_length=1024, unique=True)),
+                ('raw_survey_answer', models.JSONField()),
+                ('retry_count', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('last_error_type', models.CharField(blank=True, db_index=True, max_length=256, null=True)),
+            ],
+            options={
+                'verbose_name': 'Dead letter profile update',
+                'verbose_name_plural': 'Dead letter profile updates',
+            },
+        ),
+        migrations.AddField(
+            model_name='failedprofileupdatetask',
+            name='last_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='failedprofileupdatetask',
+            name='last_error_type',
+            field=models.CharField(blank=True, max_length=256, null=True),
+        ),
+    ]
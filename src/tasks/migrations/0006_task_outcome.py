@@ -0,0 +1,31 @@
+# Generated by Django 3.2.6 on 2026-10-19 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_dead_letters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskOutcome',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=256)),
+                ('minute', models.DateTimeField(db_index=True)),
+                ('outcome', models.CharField(choices=[('success', 'Success'), ('noop', 'No-op'), ('failed', 'Failed'), ('dead_lettered', 'Dead-lettered')], max_length=32)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Task outcome',
+                'verbose_name_plural': 'Task outcomes',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='taskoutcome',
+            constraint=models.UniqueConstraint(fields=('task', 'minute', 'outcome'), name='unique_task_outcome_minute'),
+        ),
+    ]
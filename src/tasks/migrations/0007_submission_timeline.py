@@ -0,0 +1,41 @@
+# Generated by Django 3.2.6 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_outcome'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionTimeline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trace_id', models.CharField(max_length=32, unique=True)),
+                ('wenet_id', models.CharField(max_length=1024)),
+                ('attempts', models.IntegerField(default=0)),
+                ('received_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('enqueued_at', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('rules_applied_at', models.DateTimeField(blank=True, null=True)),
+                ('profile_written_at', models.DateTimeField(blank=True, null=True)),
+                ('competences_written_at', models.DateTimeField(blank=True, null=True)),
+                ('meanings_written_at', models.DateTimeField(blank=True, null=True)),
+                ('materials_written_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Submission timeline',
+                'verbose_name_plural': 'Submission timelines',
+            },
+        ),
+        migrations.AddField(
+            model_name='failedprofileupdatetask',
+            name='trace_id',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.6 on 2026-10-19 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_submission_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileSectionShadow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wenet_id', models.CharField(max_length=1024)),
+                ('section', models.CharField(max_length=32)),
+                ('content', models.JSONField()),
+                ('digest', models.CharField(max_length=64)),
+                ('written_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Profile section shadow',
+                'verbose_name_plural': 'Profile section shadows',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='profilesectionshadow',
+            constraint=models.UniqueConstraint(fields=('wenet_id', 'section'), name='unique_profile_section_shadow'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.6 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_profile_section_shadow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileUpdateCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wenet_id', models.CharField(max_length=1024, unique=True)),
+                ('answer_digest', models.CharField(max_length=64)),
+                ('sections', models.JSONField(default=list)),
+                ('attempts', models.IntegerField(default=1)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Profile update checkpoint',
+                'verbose_name_plural': 'Profile update checkpoints',
+            },
+        ),
+    ]
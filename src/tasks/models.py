@@ -1,27 +1,380 @@
 from __future__ import absolute_import, annotations
 
-from django.db import models
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from common.db import upsert, upsert_many
 
 
 class FailedProfileUpdateTask(models.Model):
 
     failure_datetime = models.DateTimeField()
-    wenet_id = models.CharField(max_length=1024)
+    wenet_id = models.CharField(max_length=1024, unique=True)
     raw_survey_answer = models.JSONField()
     retry_count = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(null=True, blank=True)
+    last_error_type = models.CharField(max_length=256, null=True, blank=True)
+    trace_id = models.CharField(max_length=32, null=True, blank=True)
 
     class Meta:
 
         verbose_name = "Failed profile update task"
         verbose_name_plural = "Failed profile update tasks"
 
+    @staticmethod
+    def register(wenet_id: str, raw_survey_answer: dict, next_attempt_at: datetime, error: Optional[Exception] = None, trace_id: Optional[str] = None) -> None:
+        """
+        Create or update, with a single statement, the failed update of the user. The failures already counted for the
+        user are kept.
+        """
+        upsert(
+            FailedProfileUpdateTask,
+            "wenet_id",
+            {
+                "wenet_id": wenet_id,
+                "raw_survey_answer": raw_survey_answer,
+                "failure_datetime": timezone.now(),
+                "retry_count": 0,
+                "next_attempt_at": next_attempt_at,
+                "trace_id": trace_id,
+                **FailedProfileUpdateTask.error_fields(error)
+            },
+            update_fields=["raw_survey_answer", "failure_datetime", "next_attempt_at", "last_error", "last_error_type", "trace_id"]
+        )
+
+    @staticmethod
+    def error_fields(error: Optional[Exception]) -> dict:
+        return {
+            "last_error": repr(error) if error is not None else None,
+            "last_error_type": type(error).__name__ if error is not None else None
+        }
+
 
 class LastUserProfileUpdate(models.Model):
 
     last_update = models.DateTimeField()
-    wenet_id = models.CharField(max_length=1024)
+    wenet_id = models.CharField(max_length=1024, unique=True)
 
     class Meta:
 
         verbose_name = "Last user profile update"
         verbose_name_plural = "Last user profile updates"
+
+    @staticmethod
+    def register(wenet_id: str) -> None:
+        """
+        Create or update, with a single statement, the last update of the user profile to the current time.
+        """
+        upsert(LastUserProfileUpdate, "wenet_id", {"wenet_id": wenet_id, "last_update": timezone.now()}, update_fields=["last_update"])
+
+
+class DeadLetterProfileUpdate(models.Model):
+    """
+    A profile update that failed more than `MAX_RETRY_PROFILE_UPDATE` times, it is kept until it is replayed.
+    """
+
+    failure_datetime = models.DateTimeField(db_index=True)
+    dead_datetime = models.DateTimeField(default=timezone.now)
+    wenet_id = models.CharField(max_length=1024, unique=True)
+    raw_survey_answer = models.JSONField()
+    retry_count = models.IntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    last_error_type = models.CharField(max_length=256, null=True, blank=True, db_index=True)
+
+    class Meta:
+
+        verbose_name = "Dead letter profile update"
+        verbose_name_plural = "Dead letter profile updates"
+
+    @staticmethod
+    def bury(failed_profile_update_task: FailedProfileUpdateTask) -> None:
+        """
+        Move the failed update to the dead letters, replacing the previous dead letter of the user if any.
+        """
+        with transaction.atomic():
+            upsert(
+                DeadLetterProfileUpdate,
+                "wenet_id",
+                {
+                    "wenet_id": failed_profile_update_task.wenet_id,
+                    "raw_survey_answer": failed_profile_update_task.raw_survey_answer,
+                    "failure_datetime": failed_profile_update_task.failure_datetime,
+                    "dead_datetime": timezone.now(),
+                    "retry_count": failed_profile_update_task.retry_count,
+                    "last_error": failed_profile_update_task.last_error,
+                    "last_error_type": failed_profile_update_task.last_error_type
+                },
+                update_fields=["raw_survey_answer", "failure_datetime", "dead_datetime", "retry_count", "last_error", "last_error_type"]
+            )
+            failed_profile_update_task.delete()
+
+    def is_superseded(self) -> bool:
+        """
+        Check if a more recent survey answer of the user updated its profile or is waiting to be recovered.
+        """
+        return LastUserProfileUpdate.objects.filter(wenet_id=self.wenet_id, last_update__gt=self.failure_datetime).exists() or \
+            FailedProfileUpdateTask.objects.filter(wenet_id=self.wenet_id).exists()
+
+    def requeue(self) -> bool:
+        """
+        Move the dead letter back to the failed updates, it is recovered by the next sweep.
+
+        :return: False if the dead letter is superseded by a more recent survey answer, it is deleted without being requeued
+        """
+        with transaction.atomic():
+            superseded = self.is_superseded()
+            if not superseded:
+                # the original failure time is kept, so the recovery skips the update if the profile changed meanwhile
+                FailedProfileUpdateTask.objects.create(
+                    wenet_id=self.wenet_id,
+                    raw_survey_answer=self.raw_survey_answer,
+                    failure_datetime=self.failure_datetime,
+                    last_error=self.last_error,
+                    last_error_type=self.last_error_type
+                )
+            self.delete()
+        return not superseded
+
+
+class TaskOutcome(models.Model):
+    """
+    The number of runs of a task that ended with an outcome during a minute.
+    """
+
+    SUCCESS = "success"
+    NOOP = "noop"
+    FAILED = "failed"
+    DEAD_LETTERED = "dead_lettered"
+
+    OUTCOMES = [
+        (SUCCESS, "Success"),
+        (NOOP, "No-op"),
+        (FAILED, "Failed"),
+        (DEAD_LETTERED, "Dead-lettered"),
+    ]
+
+    task = models.CharField(max_length=256)
+    minute = models.DateTimeField(db_index=True)
+    outcome = models.CharField(max_length=32, choices=OUTCOMES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+
+        verbose_name = "Task outcome"
+        verbose_name_plural = "Task outcomes"
+        constraints = [
+            models.UniqueConstraint(fields=["task", "minute", "outcome"], name="unique_task_outcome_minute")
+        ]
+
+
+class SubmissionTimeline(models.Model):
+    """
+    The time a survey submission reached each stage of its processing, from the webhook to the last section of the
+    profile written on the platform. The stages of a recovered submission are the ones of its last attempt.
+    """
+
+    STAGES = [
+        "received",
+        "enqueued",
+        "started",
+        "fetched",
+        "rules_applied",
+        "profile_written",
+        "competences_written",
+        "meanings_written",
+        "materials_written",
+        "completed"
+    ]
+
+    trace_id = models.CharField(max_length=32, unique=True)
+    wenet_id = models.CharField(max_length=1024)
+    attempts = models.IntegerField(default=0)
+    received_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    enqueued_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    fetched_at = models.DateTimeField(null=True, blank=True)
+    rules_applied_at = models.DateTimeField(null=True, blank=True)
+    profile_written_at = models.DateTimeField(null=True, blank=True)
+    competences_written_at = models.DateTimeField(null=True, blank=True)
+    meanings_written_at = models.DateTimeField(null=True, blank=True)
+    materials_written_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+
+        verbose_name = "Submission timeline"
+        verbose_name_plural = "Submission timelines"
+
+    @staticmethod
+    def record(trace_id: str, wenet_id: str, stages: Dict[str, datetime], attempt: bool = False) -> None:
+        """
+        Create or update, with a single statement, the timeline of the submission with the time of the given stages.
+
+        :param trace_id: The trace id of the submission
+        :param wenet_id: The id of the user
+        :param stages: The time each stage was reached, by stage name
+        :param attempt: True if the stages were reached by an attempt of updating the profile
+        """
+        upsert_many(
+            SubmissionTimeline,
+            ["trace_id"],
+            [{"trace_id": trace_id, "wenet_id": wenet_id, "attempts": 1 if attempt else 0, **{f"{stage}_at": reached_at for stage, reached_at in stages.items()}}],
+            update_fields=[f"{stage}_at" for stage in stages],
+            increment_fields=["attempts"]
+        )
+
+
+class ProfileSectionShadow(models.Model):
+    """
+    The content of a section of the profile of a user (its competences, meanings or materials) as read from the
+    platform after the last update of the app, with its digest. The next update starts from it instead of reading the
+    section again, the app being the only writer of the entries of the survey.
+    """
+
+    COMPETENCES = "competences"
+    MEANINGS = "meanings"
+    MATERIALS = "materials"
+
+    SECTIONS = [COMPETENCES, MEANINGS, MATERIALS]
+
+    wenet_id = models.CharField(max_length=1024)
+    section = models.CharField(max_length=32)
+    content = models.JSONField()
+    digest = models.CharField(max_length=64)
+    written_at = models.DateTimeField()
+
+    class Meta:
+
+        verbose_name = "Profile section shadow"
+        verbose_name_plural = "Profile section shadows"
+        constraints = [
+            models.UniqueConstraint(fields=["wenet_id", "section"], name="unique_profile_section_shadow")
+        ]
+
+    @staticmethod
+    def compute_digest(content: list) -> str:
+        return hashlib.sha256(json.dumps(content, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def load(wenet_id: str) -> Dict[str, ProfileSectionShadow]:
+        """
+        Get the shadows of the sections of the profile of the user with a single query, by section.
+        """
+        return {shadow.section: shadow for shadow in ProfileSectionShadow.objects.filter(wenet_id=wenet_id)}
+
+    @staticmethod
+    def store(wenet_id: str, sections: Dict[str, list]) -> None:
+        """
+        Create or update, with a single statement, the shadows of the sections of the profile of the user.
+        """
+        now = timezone.now()
+        upsert_many(
+            ProfileSectionShadow,
+            ["wenet_id", "section"],
+            [{"wenet_id": wenet_id, "section": section, "content": content, "digest": ProfileSectionShadow.compute_digest(content), "written_at": now} for section, content in sections.items()],
+            update_fields=["content", "digest", "written_at"]
+        )
+
+    @staticmethod
+    def discard(wenet_id: str, sections: List[str]) -> None:
+        ProfileSectionShadow.objects.filter(wenet_id=wenet_id, section__in=sections).delete()
+
+    def is_fresh(self) -> bool:
+        return timezone.now() - self.written_at < timedelta(seconds=settings.PROFILE_SHADOW_TTL)
+
+
+class ProfileUpdateCheckpoint(models.Model):
+    """
+    The sections of the profile already written on the platform by the update of a survey answer of a user, recorded
+    after each write. A retry of the update, or its recovery, writes only the remaining sections, a newer answer starts
+    again from the first section.
+
+    The attempts count the attempts started with the answer that did not end: the running one and the ones that lost
+    their worker. An attempt failing with an error ends, it is no longer counted.
+    """
+
+    PROFILE = "profile"
+    COMPETENCES = "competences"
+    MEANINGS = "meanings"
+    MATERIALS = "materials"
+
+    SECTIONS = [PROFILE, COMPETENCES, MEANINGS, MATERIALS]
+
+    wenet_id = models.CharField(max_length=1024, unique=True)
+    answer_digest = models.CharField(max_length=64)
+    sections = models.JSONField(default=list)
+    attempts = models.IntegerField(default=1)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+
+        verbose_name = "Profile update checkpoint"
+        verbose_name_plural = "Profile update checkpoints"
+
+    @staticmethod
+    def compute_digest(raw_survey_answer: dict) -> str:
+        return hashlib.sha256(json.dumps(raw_survey_answer, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def start(wenet_id: str, raw_survey_answer: dict) -> ProfileUpdateCheckpoint:
+        """
+        Start an attempt to update the profile of the user with a survey answer, resuming from the sections written by
+        the previous attempts with the same answer.
+        """
+        answer_digest = ProfileUpdateCheckpoint.compute_digest(raw_survey_answer)
+        checkpoint = ProfileUpdateCheckpoint.objects.filter(wenet_id=wenet_id).first()
+        if checkpoint is not None and checkpoint.answer_digest == answer_digest:
+            checkpoint.attempts += 1
+            checkpoint.updated_at = timezone.now()
+            ProfileUpdateCheckpoint.objects.filter(id=checkpoint.id).update(attempts=models.F("attempts") + 1, updated_at=checkpoint.updated_at)
+            return checkpoint
+
+        checkpoint = ProfileUpdateCheckpoint(wenet_id=wenet_id, answer_digest=answer_digest, sections=[], attempts=1, updated_at=timezone.now())
+        upsert(
+            ProfileUpdateCheckpoint,
+            "wenet_id",
+            {"wenet_id": wenet_id, "answer_digest": answer_digest, "sections": [], "attempts": 1, "updated_at": checkpoint.updated_at},
+            update_fields=["answer_digest", "sections", "attempts", "updated_at"]
+        )
+        return checkpoint
+
+    @staticmethod
+    def attempts_of(wenet_id: str, raw_survey_answer: dict) -> int:
+        """
+        Get the attempts started to update the profile of the user with the survey answer that did not end, 0 if none.
+        """
+        attempts = ProfileUpdateCheckpoint.objects.filter(
+            wenet_id=wenet_id,
+            answer_digest=ProfileUpdateCheckpoint.compute_digest(raw_survey_answer)
+        ).values_list("attempts", flat=True).first()
+        return attempts or 0
+
+    def is_written(self, section: str) -> bool:
+        return section in self.sections
+
+    def record(self, section: str) -> None:
+        """
+        Record that the section is written, the statement is committed right away to survive a crash of the worker.
+        """
+        self.sections = self.sections + [section]
+        self.updated_at = timezone.now()
+        ProfileUpdateCheckpoint.objects.filter(wenet_id=self.wenet_id, answer_digest=self.answer_digest).update(sections=self.sections, updated_at=self.updated_at)
+
+    def end(self) -> None:
+        """
+        Record that the attempt ended with an error, the written sections are kept for the next attempt.
+        """
+        self.attempts -= 1
+        self.updated_at = timezone.now()
+        ProfileUpdateCheckpoint.objects.filter(wenet_id=self.wenet_id, answer_digest=self.answer_digest).update(attempts=models.F("attempts") - 1, updated_at=self.updated_at)
+
+    @staticmethod
+    def clear(wenet_id: str) -> None:
+        ProfileUpdateCheckpoint.objects.filter(wenet_id=wenet_id).delete()
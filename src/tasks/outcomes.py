@@ -0,0 +1,114 @@
+from __future__ import absolute_import, annotations
+
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Optional, Tuple
+
+from celery.signals import worker_process_init, worker_process_shutdown, worker_ready, worker_shutdown
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from common.db import upsert_many
+from common.metrics import TASK_OUTCOMES
+from tasks.models import TaskOutcome
+
+
+logger = logging.getLogger("wenet-survey-web-app.tasks.outcomes")
+
+
+class OutcomeLedger:
+    """
+    Count the outcomes of the tasks by minute in memory and add them to the `TaskOutcome` table with a single statement
+    at most once every `TASK_OUTCOME_FLUSH_INTERVAL` seconds. Once started, a background thread flushes them as well,
+    so that an idle process does not keep the outcomes of its last tasks.
+    """
+
+    def __init__(self) -> None:
+        self._counters: Counter[Tuple[str, object, str]] = Counter()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def record(self, task: str, outcome: str) -> None:
+        TASK_OUTCOMES.labels(task=task, outcome=outcome).inc()
+        minute = timezone.now().replace(second=0, microsecond=0)
+        with self._lock:
+            self._counters[(task, minute, outcome)] += 1
+            due = time.monotonic() - self._last_flush >= settings.TASK_OUTCOME_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            counters = self._counters
+            self._counters = Counter()
+            self._last_flush = time.monotonic()
+        if not counters:
+            return
+
+        try:
+            upsert_many(
+                TaskOutcome,
+                ["task", "minute", "outcome"],
+                [{"task": task, "minute": minute, "outcome": outcome, "count": count} for (task, minute, outcome), count in counters.items()],
+                increment_fields=["count"]
+            )
+        except Exception as e:
+            logger.warning(f"Unable to flush the outcomes of the tasks, they will be flushed again later", exc_info=e)
+            with self._lock:
+                self._counters.update(counters)
+
+    def start(self) -> None:
+        """
+        Start the thread flushing the outcomes every `TASK_OUTCOME_FLUSH_INTERVAL` seconds, if not running yet (a
+        thread of the parent does not survive the fork).
+        """
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._stopped = threading.Event()
+            self._flusher = threading.Thread(target=self._run, args=(self._stopped,), name="outcome-flusher", daemon=True)
+            self._flusher.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=5)
+        self._flusher = None
+
+    def _run(self, stopped: threading.Event) -> None:
+        while not stopped.wait(settings.TASK_OUTCOME_FLUSH_INTERVAL):
+            with self._lock:
+                due = bool(self._counters) and time.monotonic() - self._last_flush >= settings.TASK_OUTCOME_FLUSH_INTERVAL
+            if due:
+                self.flush()
+                # the connection of the thread is not closed by the end of a task or of a request
+                connection.close()
+
+
+outcomes = OutcomeLedger()
+
+
+@worker_process_init.connect
+def start_outcomes_flusher(**kwargs) -> None:
+    outcomes.start()
+
+
+@worker_ready.connect
+def start_main_outcomes_flusher(sender=None, **kwargs) -> None:
+    from celery.concurrency.prefork import TaskPool
+
+    # the other pools run the tasks in the main process
+    if not isinstance(getattr(sender, "pool", None), TaskPool):
+        outcomes.start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_outcomes(**kwargs) -> None:
+    outcomes.stop()
+    outcomes.flush()
@@ -0,0 +1,82 @@
+from __future__ import absolute_import, annotations
+
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from tasks.models import FailedProfileUpdateTask
+
+
+logger = logging.getLogger("wenet-survey-web-app.tasks.queue")
+
+
+class FailedProfileUpdateQueue:
+    """
+    Queue of the failed profile updates, each one is retried once its next attempt is due.
+
+    Sweeps claim the due updates by moving their next attempt `PROFILE_UPDATE_CLAIM_TIMEOUT` seconds ahead, so several
+    sweeps can drain the queue at the same time without retrying the same update twice. An update whose recovery is
+    lost (e.g., the worker crashes) becomes due again once the claim expires. A recovery extends the claim when it
+    starts, and gives up if a later sweep claimed the update again while the recovery waited on the broker.
+    """
+
+    @staticmethod
+    def next_attempt_at(retry_count: int) -> datetime:
+        """
+        Compute the time of the next attempt of an update with exponential backoff and jitter.
+
+        :param retry_count: The number of attempts already failed during the recovery
+        :return: The time of the next attempt
+        """
+        delay = min(settings.PROFILE_UPDATE_RETRY_DELAY * 2 ** retry_count, settings.PROFILE_UPDATE_RETRY_MAX_DELAY)
+        return timezone.now() + timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+    @staticmethod
+    def next_attempt_of(wenet_id: str) -> datetime:
+        """
+        Compute the time of the next attempt of a new failure of the user, with the backoff of the attempts already
+        failed for the user.
+        """
+        retry_count = FailedProfileUpdateTask.objects.filter(wenet_id=wenet_id).values_list("retry_count", flat=True).first()
+        return FailedProfileUpdateQueue.next_attempt_at(retry_count or 0)
+
+    def claim(self, batch_size: int) -> List[int]:
+        """
+        Claim the due updates, the ones that are due since longer are claimed first.
+
+        :param batch_size: The maximum number of claimed updates
+        :return: The ids of the claimed updates
+        """
+        now = timezone.now()
+        claim_expiration = now + timedelta(seconds=settings.PROFILE_UPDATE_CLAIM_TIMEOUT)
+        due_tasks = FailedProfileUpdateTask.objects.filter(next_attempt_at__lte=now).order_by("next_attempt_at")
+
+        database = router.db_for_write(FailedProfileUpdateTask)
+        if connections[database].features.has_select_for_update_skip_locked:
+            with transaction.atomic(using=database):
+                ids = list(due_tasks.select_for_update(skip_locked=True).values_list("id", flat=True)[:batch_size])
+                FailedProfileUpdateTask.objects.filter(id__in=ids).update(next_attempt_at=claim_expiration)
+        else:
+            # without row locks (e.g., sqlite) a sweep claims an update only if no other sweep moved its next attempt
+            ids = []
+            for task_id, next_attempt_at in due_tasks.values_list("id", "next_attempt_at")[:batch_size].iterator():
+                if FailedProfileUpdateTask.objects.filter(id=task_id, next_attempt_at=next_attempt_at).update(next_attempt_at=claim_expiration) == 1:
+                    ids.append(task_id)
+        return ids
+
+    def extend_claim(self, task_id: int, claimed_until: datetime) -> bool:
+        """
+        Extend the claim of an update by `PROFILE_UPDATE_CLAIM_TIMEOUT` seconds when its recovery starts.
+
+        :param task_id: The id of the claimed update
+        :param claimed_until: The expiration of the claim, as set by the sweep that claimed the update
+        :return: False if the update was claimed again, or failed again, since the claim
+        """
+        return FailedProfileUpdateTask.objects.filter(id=task_id, next_attempt_at=claimed_until).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=settings.PROFILE_UPDATE_CLAIM_TIMEOUT)
+        ) == 1
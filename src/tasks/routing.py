@@ -0,0 +1,117 @@
+from __future__ import absolute_import, annotations
+
+import hashlib
+import logging
+from typing import List, Optional
+
+from celery.exceptions import WorkerTerminate
+from celery.signals import celeryd_after_setup, worker_init
+from django.conf import settings
+
+
+logger = logging.getLogger("wenet-survey-web-app.tasks.routing")
+
+
+SHARDED_TASKS = {
+    "tasks.tasks.update_user_profile": settings.PROFILE_UPDATE_QUEUE,
+    "tasks.tasks.recover_profile_update_error": settings.RECOVERY_QUEUE,
+}
+
+
+def _hash(value: str) -> int:
+    # the builtin hash of the strings changes at each run of the interpreter, the shards must be stable across processes
+    return int.from_bytes(hashlib.sha1(value.encode("utf-8")).digest()[:8], "big")
+
+
+def shard_for_user(wenet_id: str, shards: int) -> int:
+    """
+    Map the user to a shard with the jump consistent hash, when the number of shards grows from n to n + 1 only 1/(n + 1)
+    of the users move to the new shard.
+
+    :param wenet_id: The identifier of the user
+    :param shards: The number of shards
+    :return: The index of the shard of the user
+    """
+    key = _hash(wenet_id)
+    bucket, jump = -1, 0
+    while jump < shards:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def worker_for_shard(shard: int, workers: List[str]) -> str:
+    """
+    Assign the shard to a worker with the rendezvous hash, when a worker joins or leaves only the shards it gains or
+    loses change owner.
+
+    :param shard: The index of the shard
+    :param workers: The names of all the shard workers
+    :return: The name of the worker consuming the shard
+    """
+    return max(workers, key=lambda worker: (_hash(f"{worker}:{shard}"), worker))
+
+
+def shards_for_worker(worker: str, workers: List[str], shards: int) -> List[int]:
+    return [shard for shard in range(shards) if worker_for_shard(shard, workers) == worker]
+
+
+def shard_queue(queue: str, shard: int) -> str:
+    return f"{queue}.{shard}"
+
+
+def route_by_user(name: str, args, kwargs, options, task=None, **kw) -> Optional[dict]:
+    """
+    Celery router sending the profile updates and the recoveries of the same user to the queues of the same shard, so
+    they are run one after the other by the single consumer of the shard.
+    """
+    if settings.PROFILE_UPDATE_SHARDS <= 0 or name not in SHARDED_TASKS:
+        return None
+
+    wenet_id = (kwargs or {}).get("wenet_id")
+    if wenet_id is None and args and isinstance(args[0], dict):
+        wenet_id = args[0].get("wenetId")
+    if wenet_id is None:
+        return None
+    return {"queue": shard_queue(SHARDED_TASKS[name], shard_for_user(wenet_id, settings.PROFILE_UPDATE_SHARDS))}
+
+
+def check_shard_worker(worker: str, workers: List[str]) -> None:
+    """
+    Check that the worker can own shards: the owner of each shard is computed by every worker from its own list of the
+    shard workers, a worker missing from the list, or listed twice, would leave shards without a consumer or with two.
+
+    :raise ValueError: If the worker is not listed once among the shard workers
+    """
+    if len(set(workers)) != len(workers):
+        raise ValueError(f"The shard workers {workers} are not unique")
+    if worker not in workers:
+        raise ValueError(f"The worker [{worker}] is not one of the shard workers {workers}")
+
+
+@worker_init.connect
+def setup_shard_worker(sender=None, **kwargs) -> None:
+    # sent once the worker read its options and before it creates its pool, the concurrency set here is the one of the pool
+    if settings.PROFILE_UPDATE_SHARDS <= 0 or settings.WORKER_NAME is None:
+        return
+    try:
+        check_shard_worker(settings.WORKER_NAME, settings.SHARD_WORKERS)
+    except ValueError as e:
+        raise WorkerTerminate(f"Refusing to start the shard worker: {e}")
+
+    if sender.concurrency != 1:
+        logger.warning(f"The shard worker [{settings.WORKER_NAME}] runs with a concurrency of 1 instead of {sender.concurrency}, so the updates of each user run in order")
+        sender.concurrency = 1
+
+
+@celeryd_after_setup.connect
+def consume_assigned_shards(sender, instance, **kwargs) -> None:
+    if settings.PROFILE_UPDATE_SHARDS <= 0 or settings.WORKER_NAME is None:
+        return
+
+    shards = shards_for_worker(settings.WORKER_NAME, settings.SHARD_WORKERS, settings.PROFILE_UPDATE_SHARDS)
+    for shard in shards:
+        for queue in SHARDED_TASKS.values():
+            instance.app.amqp.queues.select_add(shard_queue(queue, shard))
+    logger.info(f"The worker [{settings.WORKER_NAME}] consumes the shards {shards}")
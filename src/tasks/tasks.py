@@ -2,11 +2,15 @@ from __future__ import absolute_import, annotations
 
 import logging
 import time
-from datetime import datetime
-from typing import Optional
+from datetime import timedelta
+from typing import Dict, List, Optional, Union
 
+from celery.exceptions import WorkerLostError
 from django.conf import settings
-from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_celery_results.models import TaskResult
 from wenet.interface.client import Oauth2Client
 from wenet.interface.exceptions import RefreshTokenExpiredError, AuthenticationException
 from wenet.interface.service_api import ServiceApiInterface
@@ -14,16 +18,16 @@ from wenet.model.user.common import Gender
 from wenet.model.user.profile import WeNetUserProfile
 
 from common.cache import DjangoCacheCredentials
+from common.credentials import CredentialsRefresher, CredentialsCollector
+from common.db import delete_in_batches
 from common.enumerator import AnswerOrder
-from common.rules import RuleManager, MappingRule, CompetenceMeaningNumberRule, \
-    MaterialsMappingRule, CompetenceMeaningBuilderRule, NumberToDateRule, UniversityFromDepartmentRule, \
-    MaterialsQuantityRule
-from survey.mappings.nationality_mappings import NATIONALITY_MAPPINGS
-from survey.mappings.num import ENROLLED_FROM_MAPPING, DISTRICT_MAPPINGS, SCHOOL_MAPPING, LIVE_MAPPINGS, \
-    ACCOMODATION_MAPPINGS, ETHNIC_GROUP, FATHER_EDUCATION, FATHER_OCCUPATION, MOTHER_EDUCATION, MOTHER_OCCUPATION, \
-    STUDY_PROGRAM, NUM_ONTOLOGY
-from survey.mappings.university_mappings import get_all_department_mapping, get_all_degree_mapping
-from tasks.models import FailedProfileUpdateTask, LastUserProfileUpdate
+from common.metrics import PROFILE_SECTION_READS, PROFILE_SECTION_WRITES, PROFILE_SHADOW_DRIFT, MeteredInterface
+from common.rules import RuleManager
+from tasks.models import FailedProfileUpdateTask, LastUserProfileUpdate, DeadLetterProfileUpdate, TaskOutcome, SubmissionTimeline, \
+    ProfileSectionShadow, ProfileUpdateCheckpoint
+from tasks.outcomes import outcomes
+from tasks.queue import FailedProfileUpdateQueue
+from tasks.timeline import Timeline
 from wenet_survey.celery import app
 from ws.models.survey import SurveyAnswer
 
@@ -32,8 +36,11 @@ logger = logging.getLogger("wenet-survey-web-app.tasks.tasks")
 
 class ProfileHandler:
 
+    _rule_manager: Optional[RuleManager] = None
+
     def __init__(self, profile_id: str):
         self._profile_id = profile_id
+        self._checkpoint: Optional[ProfileUpdateCheckpoint] = None
         client = Oauth2Client(
             settings.WENET_APP_ID,
             settings.WENET_APP_SECRET,
@@ -41,11 +48,93 @@ class ProfileHandler:
             DjangoCacheCredentials(),
             token_endpoint_url=f"{settings.WENET_INSTANCE_URL}/api/oauth2/token"
         )
-        self._service_api_interface = ServiceApiInterface(client, platform_url=settings.WENET_INSTANCE_URL)
+        self._service_api_interface = MeteredInterface(ServiceApiInterface(client, platform_url=settings.WENET_INSTANCE_URL))
 
-    def update_profile(self, survey_answer: SurveyAnswer) -> WeNetUserProfile:
+    def update_profile(self, survey_answer: SurveyAnswer, timeline: Optional[Timeline] = None) -> WeNetUserProfile:
+        timeline = timeline if timeline is not None else Timeline(None, self._profile_id)
+        try:
+            return self._update_profile(survey_answer, timeline)
+        except Exception:
+            # the sections may be partially written, the next update reads them again
+            self._discard_shadows(ProfileSectionShadow.SECTIONS)
+            self._end_checkpoint()
+            raise
+
+    def _update_profile(self, survey_answer: SurveyAnswer, timeline: Timeline) -> WeNetUserProfile:
+        shadows = ProfileSectionShadow.load(self._profile_id) if settings.PROFILE_SHADOW_TTL > 0 else {}
+        user_profile = self._get_user_profile_from_service_api(shadows)
+        timeline.mark("fetched")
+        logger.debug("Original profile: %s", user_profile)
+
+        rule_manager = self.get_rule_manager()
+        user_profile = rule_manager.update_user_profile(user_profile, survey_answer)
+        timeline.mark("rules_applied")
+        logger.debug("Before update profile: %s", user_profile)
+        # TODO we should avoid to arrive there without the write feed data permission
+        writers = {
+            ProfileUpdateCheckpoint.PROFILE: lambda: self._service_api_interface.update_user_profile(user_profile.profile_id, user_profile),
+            ProfileUpdateCheckpoint.COMPETENCES: lambda: self._service_api_interface.update_user_competences(user_profile.profile_id, user_profile.competences),
+            ProfileUpdateCheckpoint.MEANINGS: lambda: self._service_api_interface.update_user_meanings(user_profile.profile_id, user_profile.meanings),
+            ProfileUpdateCheckpoint.MATERIALS: lambda: self._service_api_interface.update_user_materials(user_profile.profile_id, user_profile.materials)
+        }
+        checkpoint = self._start_checkpoint(survey_answer)
+        rejected = []
+        for section, write in writers.items():
+            if checkpoint is not None and checkpoint.is_written(section):
+                # written by a previous attempt with the same answer, e.g., before the failure of the next section, the
+                # stage is reached again by this attempt so the timeline does not keep the time of the previous one
+                PROFILE_SECTION_WRITES.labels(section=section, outcome="resumed").inc()
+                timeline.mark(f"{section}_written")
+                continue
+
+            try:
+                write()
+            except AuthenticationException as e:
+                if section == ProfileUpdateCheckpoint.PROFILE:
+                    PROFILE_SECTION_WRITES.labels(section=section, outcome="failed").inc()
+                    raise
+                rejected.append(section)
+                PROFILE_SECTION_WRITES.labels(section=section, outcome="rejected").inc()
+                logger.warning(f"Could not update the user {user_profile.profile_id}, server reply with {e.http_status_code}")
+            except Exception:
+                PROFILE_SECTION_WRITES.labels(section=section, outcome="failed").inc()
+                raise
+            else:
+                PROFILE_SECTION_WRITES.labels(section=section, outcome="written").inc()
+                timeline.mark(f"{section}_written")
+                self._record_checkpoint(checkpoint, section)
+            time.sleep(1)
         user_profile = self._get_user_profile_from_service_api()
-        logger.debug(f"Original profile: {user_profile}")
+        self._store_shadows(user_profile, rejected)
+        self._clear_checkpoint()
+        logger.debug("Updated profile: %s", user_profile)
+        logger.info(f"Completed update for profile: {user_profile.profile_id}")
+        return user_profile
+
+    @classmethod
+    def get_rule_manager(cls) -> RuleManager:
+        """
+        Get the rules mapping the answers of the survey to the profile of the user, they are built by each process when
+        it updates its first profile and shared by the following updates since they do not hold any state.
+        """
+        if cls._rule_manager is None:
+            cls._rule_manager = cls.build_rule_manager()
+        return cls._rule_manager
+
+    @staticmethod
+    def build_rule_manager() -> RuleManager:
+        """
+        Build the rules mapping the answers of the survey to the profile of the user.
+        """
+        # the mappings are imported here so the processes that never update a profile (e.g., the web app enqueuing the
+        # updates) do not load them
+        from common.rules import MappingRule, CompetenceMeaningNumberRule, MaterialsMappingRule, \
+            CompetenceMeaningBuilderRule, NumberToDateRule, UniversityFromDepartmentRule, MaterialsQuantityRule
+        from survey.mappings.nationality_mappings import NATIONALITY_MAPPINGS
+        from survey.mappings.num import ENROLLED_FROM_MAPPING, DISTRICT_MAPPINGS, SCHOOL_MAPPING, LIVE_MAPPINGS, \
+            ACCOMODATION_MAPPINGS, ETHNIC_GROUP, FATHER_EDUCATION, FATHER_OCCUPATION, MOTHER_EDUCATION, \
+            MOTHER_OCCUPATION, STUDY_PROGRAM, NUM_ONTOLOGY
+        from survey.mappings.university_mappings import get_all_department_mapping, get_all_degree_mapping
 
         gender_mapping = {
             "01": Gender.MALE,
@@ -238,142 +327,262 @@ class ProfileHandler:
         rule_manager.add_rule(CompetenceMeaningNumberRule(question_code="Q27", variable_name="course_oop", ceiling_value=100, category_name=NUM_ONTOLOGY, profile_attribute="competences", floor_value=0))
 
         rule_manager.add_rule(MaterialsMappingRule("Q28", "program_study", STUDY_PROGRAM, NUM_ONTOLOGY))
+        return rule_manager
 
-        user_profile = rule_manager.update_user_profile(user_profile, survey_answer)
-        logger.debug(f"Before update profile: {user_profile}")
-        self._service_api_interface.update_user_profile(user_profile.profile_id, user_profile)  # TODO we should avoid to arrive there without the write feed data permission
-        time.sleep(1)
+    def _get_user_profile_from_service_api(self, shadows: Optional[Dict[str, ProfileSectionShadow]] = None) -> WeNetUserProfile:
+        """
+        Read the profile of the user from the platform, with its competences, meanings and materials.
+
+        :param shadows: The shadows of the sections by section, the fresh ones are used instead of reading the section
+        :return: The profile of the user
+        """
+        shadows = shadows if shadows is not None else {}
+        user_profile = self._service_api_interface.get_user_profile(self._profile_id)
+        readers = {
+            ProfileSectionShadow.COMPETENCES: self._service_api_interface.get_user_competences,
+            ProfileSectionShadow.MEANINGS: self._service_api_interface.get_user_meanings,
+            ProfileSectionShadow.MATERIALS: self._service_api_interface.get_user_materials
+        }
+        for section, read in readers.items():
+            shadow = shadows.get(section)
+            if shadow is not None and shadow.is_fresh():
+                setattr(user_profile, section, shadow.content)
+                PROFILE_SECTION_READS.labels(section=section, source="shadow").inc()
+                continue
+
+            content = read(self._profile_id)
+            if shadow is not None and shadow.digest != ProfileSectionShadow.compute_digest(content):
+                # another app changed the section, or the platform rewrote it
+                PROFILE_SHADOW_DRIFT.labels(section=section).inc()
+            setattr(user_profile, section, content)
+            PROFILE_SECTION_READS.labels(section=section, source="platform").inc()
+
+        return user_profile
+
+    def _store_shadows(self, user_profile: WeNetUserProfile, rejected: List[str]) -> None:
+        if settings.PROFILE_SHADOW_TTL <= 0:
+            return
         try:
-            self._service_api_interface.update_user_competences(user_profile.profile_id, user_profile.competences)
-        except AuthenticationException as e:
-            logger.warning(f"Could not update the user {user_profile.profile_id}, server reply with {e.http_status_code}")
-        time.sleep(1)
+            ProfileSectionShadow.store(self._profile_id, {section: getattr(user_profile, section) for section in ProfileSectionShadow.SECTIONS if section not in rejected})
+        except Exception as e:
+            logger.warning(f"Unable to store the shadows of the profile of {self._profile_id}", exc_info=e)
+            rejected = ProfileSectionShadow.SECTIONS
+        if rejected:
+            # the platform rejected the writes, the next update reads the sections again
+            self._discard_shadows(rejected)
+
+    def _start_checkpoint(self, survey_answer: SurveyAnswer) -> Optional[ProfileUpdateCheckpoint]:
         try:
-            self._service_api_interface.update_user_meanings(user_profile.profile_id, user_profile.meanings)
-        except AuthenticationException as e:
-            logger.warning(f"Could not update the user {user_profile.profile_id}, server reply with {e.http_status_code}")
-        time.sleep(1)
+            checkpoint = ProfileUpdateCheckpoint.start(self._profile_id, survey_answer.to_repr())
+        except Exception as e:
+            logger.warning(f"Unable to load the checkpoint of the update of {self._profile_id}, writing all the sections", exc_info=e)
+            return None
+        if checkpoint.sections:
+            logger.info(f"Resuming the update of {self._profile_id}, already written: {', '.join(checkpoint.sections)}")
+        self._checkpoint = checkpoint
+        return checkpoint
+
+    def _record_checkpoint(self, checkpoint: Optional[ProfileUpdateCheckpoint], section: str) -> None:
+        if checkpoint is None:
+            return
         try:
-            self._service_api_interface.update_user_materials(user_profile.profile_id, user_profile.materials)
-        except AuthenticationException as e:
-            logger.warning(f"Could not update the user {user_profile.profile_id}, server reply with {e.http_status_code}")
-        time.sleep(1)
-        user_profile = self._get_user_profile_from_service_api()
-        logger.debug(f"Updated profile: {user_profile}")
-        logger.info(f"Completed update for profile: {user_profile.profile_id}")
-        return user_profile
+            checkpoint.record(section)
+        except Exception as e:
+            # the next attempt writes the section again
+            logger.warning(f"Unable to record the {section} of {self._profile_id} as written", exc_info=e)
 
-    def _get_user_profile_from_service_api(self) -> WeNetUserProfile:
-        user_profile = self._service_api_interface.get_user_profile(self._profile_id)
-        user_profile.competences = self._service_api_interface.get_user_competences(self._profile_id)
-        user_profile.meanings = self._service_api_interface.get_user_meanings(self._profile_id)
-        user_profile.materials = self._service_api_interface.get_user_materials(self._profile_id)
+    def _end_checkpoint(self) -> None:
+        if self._checkpoint is None:
+            return
+        try:
+            self._checkpoint.end()
+        except Exception as e:
+            # the attempt is counted as interrupted
+            logger.warning(f"Unable to record the end of the update of {self._profile_id}", exc_info=e)
 
-        return user_profile
+    def _clear_checkpoint(self) -> None:
+        try:
+            ProfileUpdateCheckpoint.clear(self._profile_id)
+        except Exception as e:
+            logger.warning(f"Unable to clear the checkpoint of the update of {self._profile_id}", exc_info=e)
+
+    def _discard_shadows(self, sections: List[str]) -> None:
+        try:
+            ProfileSectionShadow.discard(self._profile_id, sections)
+        except Exception as e:
+            logger.warning(f"Unable to discard the shadows of the profile of {self._profile_id}", exc_info=e)
 
 
 class CeleryTask:
 
     @staticmethod
-    def update_user_profile(survey_answer: SurveyAnswer) -> None:
-        update_user_profile.delay(survey_answer.to_repr())
+    def update_user_profile(survey_answer: SurveyAnswer, trace_id: Optional[str] = None) -> None:
+        update_user_profile.delay(survey_answer.to_repr(), trace_id=trace_id)
 
 
-@app.task()
-def update_user_profile(raw_survey_answer: dict) -> None:
-    survey_answer = SurveyAnswer.from_repr(raw_survey_answer)
+def profile_update_time_limits() -> Dict[str, Optional[int]]:
+    if settings.PROFILE_UPDATE_SOFT_TIME_LIMIT <= 0:
+        return {"soft_time_limit": None, "time_limit": None}
+    return {"soft_time_limit": settings.PROFILE_UPDATE_SOFT_TIME_LIMIT, "time_limit": settings.PROFILE_UPDATE_SOFT_TIME_LIMIT + 30}
+
+
+def interrupted_attempts(wenet_id: str, raw_survey_answer: dict) -> Optional[WorkerLostError]:
+    """
+    Check if the attempts to update the profile of the user with the survey answer lost their worker too many times,
+    the attempts started that did not end before this one were interrupted.
+
+    :return: The error to record when the update must not be attempted again, None otherwise
+    """
+    if settings.PROFILE_UPDATE_MAX_INTERRUPTED_ATTEMPTS <= 0:
+        return None
     try:
-        ProfileHandler(survey_answer.wenet_id).update_profile(survey_answer)
+        interrupted = ProfileUpdateCheckpoint.attempts_of(wenet_id, raw_survey_answer)
+    except Exception as e:
+        logger.warning(f"Unable to load the checkpoint of the update of {wenet_id}", exc_info=e)
+        return None
+    if interrupted >= settings.PROFILE_UPDATE_MAX_INTERRUPTED_ATTEMPTS:
+        return WorkerLostError(f"The update of the profile lost its worker {interrupted} times")
+    return None
 
-        # create or update LastUserProfileUpdate
-        try:
-            last_user_profile_update = LastUserProfileUpdate.objects.get(
-                wenet_id=survey_answer.wenet_id,
-            )
-        except LastUserProfileUpdate.DoesNotExist:
-            last_user_profile_update = None
 
-        with transaction.atomic():
-            if last_user_profile_update is None:
-                last_user_profile_update = LastUserProfileUpdate(wenet_id=survey_answer.wenet_id, last_update=datetime.now())
-            else:
-                last_user_profile_update.last_update = datetime.now()
-            last_user_profile_update.save()
+# the updates are acknowledged once done, the broker delivers again the update of a worker killed in the middle of it,
+# the sections already written are then skipped, up to `PROFILE_UPDATE_MAX_INTERRUPTED_ATTEMPTS` times
+@app.task(ignore_result=True, acks_late=True, reject_on_worker_lost=True, **profile_update_time_limits())
+def update_user_profile(raw_survey_answer: dict, trace_id: Optional[str] = None) -> None:
+    survey_answer = SurveyAnswer.from_repr(raw_survey_answer)
+    interrupted = interrupted_attempts(survey_answer.wenet_id, raw_survey_answer)
+    if interrupted is not None:
+        # the update may be the one killing the worker, its recovery moves it to the dead letters
+        logger.error(f"The profile update of {survey_answer.wenet_id} is not attempted again: {interrupted}")
+        outcomes.record(update_user_profile.name, TaskOutcome.FAILED)
+        FailedProfileUpdateTask.register(survey_answer.wenet_id, raw_survey_answer, FailedProfileUpdateQueue.next_attempt_of(survey_answer.wenet_id), error=interrupted, trace_id=trace_id)
+        return
+
+    timeline = Timeline(trace_id, survey_answer.wenet_id)
+    timeline.mark("started")
+    try:
+        ProfileHandler(survey_answer.wenet_id).update_profile(survey_answer, timeline)
+        LastUserProfileUpdate.register(survey_answer.wenet_id)
+        timeline.mark("completed")
+        outcomes.record(update_user_profile.name, TaskOutcome.SUCCESS)
     except Exception as e:
+        outcomes.record(update_user_profile.name, TaskOutcome.FAILED)
         if isinstance(e, RefreshTokenExpiredError):
             logger.warning("Token expired", exc_info=e)
         else:
             logger.exception("Unexpected error occurs", exc_info=e)
 
-        # create or update FailedProfileUpdateTask
-        try:
-            failed_profile_update_task = FailedProfileUpdateTask.objects.get(
-                wenet_id=survey_answer.wenet_id,
-            )
-        except FailedProfileUpdateTask.DoesNotExist:
-            failed_profile_update_task = None
-
-        with transaction.atomic():
-            if failed_profile_update_task is None:
-                failed_profile_update_task = FailedProfileUpdateTask(wenet_id=survey_answer.wenet_id, raw_survey_answer=raw_survey_answer, failure_datetime=datetime.now())
-            else:
-                failed_profile_update_task.raw_survey_answer = raw_survey_answer
-                failed_profile_update_task.failure_datetime = datetime.now()
-            failed_profile_update_task.save()   # TODO say to the user that its profile will be updated soon if an error occurs?
-
-
-@app.task()
-def recover_profile_update_error(raw_survey_answer: dict) -> None:
-    survey_answer = SurveyAnswer.from_repr(raw_survey_answer)
-    try:
-        last_user_profile_update = LastUserProfileUpdate.objects.get(
-            wenet_id=survey_answer.wenet_id,
-        )
-    except LastUserProfileUpdate.DoesNotExist:
-        last_user_profile_update = None
-
-    try:
-        failed_profile_update_task: Optional[FailedProfileUpdateTask] = FailedProfileUpdateTask.objects.get(
-            wenet_id=survey_answer.wenet_id,
-        )
-    except FailedProfileUpdateTask.DoesNotExist:
-        failed_profile_update_task = None
-
-    if last_user_profile_update is not None and failed_profile_update_task is not None and last_user_profile_update.last_update > failed_profile_update_task.failure_datetime:
+        FailedProfileUpdateTask.register(survey_answer.wenet_id, raw_survey_answer, FailedProfileUpdateQueue.next_attempt_of(survey_answer.wenet_id), error=e, trace_id=trace_id)  # TODO say to the user that its profile will be updated soon if an error occurs?
+    finally:
+        timeline.save()
+
+
+@app.task(ignore_result=True, acks_late=True, reject_on_worker_lost=True, **profile_update_time_limits())
+def recover_profile_update_error(failed_profile_update_task_id: Union[int, dict], wenet_id: Optional[str] = None, claimed_until: Optional[str] = None) -> None:
+    if isinstance(failed_profile_update_task_id, dict):
+        # recoveries published before the sweep switched to ids carry the whole survey answer
+        failed_profile_update_tasks = FailedProfileUpdateTask.objects.filter(wenet_id=SurveyAnswer.from_repr(failed_profile_update_task_id).wenet_id)
+    else:
+        failed_profile_update_tasks = FailedProfileUpdateTask.objects.filter(id=failed_profile_update_task_id)
+    failed_profile_update_task: Optional[FailedProfileUpdateTask] = failed_profile_update_tasks.first()
+
+    if failed_profile_update_task is None:
+        logger.info(f"The failed profile update task is already recovered")
+        outcomes.record(recover_profile_update_error.name, TaskOutcome.NOOP)
+        return
+    if claimed_until is not None and not FailedProfileUpdateQueue().extend_claim(failed_profile_update_task.id, parse_datetime(claimed_until)):
+        # the claim expired while the recovery waited on the broker, a later sweep claimed the update again
+        logger.info(f"The failed profile update task of {failed_profile_update_task.wenet_id} is claimed by another recovery")
+        outcomes.record(recover_profile_update_error.name, TaskOutcome.NOOP)
+        return
+
+    last_user_profile_update: Optional[LastUserProfileUpdate] = LastUserProfileUpdate.objects.filter(wenet_id=failed_profile_update_task.wenet_id).first()
+    if last_user_profile_update is not None and last_user_profile_update.last_update > failed_profile_update_task.failure_datetime:
         logger.info(f"Last profile update is more recent than the failure of the task")
-        with transaction.atomic():
-            failed_profile_update_task.delete()
-    elif failed_profile_update_task is not None and failed_profile_update_task.retry_count >= settings.MAX_RETRY_PROFILE_UPDATE:
-        logger.error(f"Profile update task failed {failed_profile_update_task.retry_count} times for {survey_answer.wenet_id}")
-        with transaction.atomic():
-            failed_profile_update_task.delete()
-    elif failed_profile_update_task is not None:
+        failed_profile_update_task.delete()
+        outcomes.record(recover_profile_update_error.name, TaskOutcome.NOOP)
+    elif failed_profile_update_task.retry_count >= settings.MAX_RETRY_PROFILE_UPDATE:
+        logger.error(f"Profile update task failed {failed_profile_update_task.retry_count} times for {failed_profile_update_task.wenet_id}, moving it to the dead letters")
+        DeadLetterProfileUpdate.bury(failed_profile_update_task)
+        ProfileUpdateCheckpoint.clear(failed_profile_update_task.wenet_id)
+        outcomes.record(recover_profile_update_error.name, TaskOutcome.DEAD_LETTERED)
+    else:
+        interrupted = interrupted_attempts(failed_profile_update_task.wenet_id, failed_profile_update_task.raw_survey_answer)
+        if interrupted is not None:
+            logger.error(f"The profile update of {failed_profile_update_task.wenet_id} is moved to the dead letters: {interrupted}")
+            for field, value in FailedProfileUpdateTask.error_fields(interrupted).items():
+                setattr(failed_profile_update_task, field, value)
+            DeadLetterProfileUpdate.bury(failed_profile_update_task)
+            ProfileUpdateCheckpoint.clear(failed_profile_update_task.wenet_id)
+            outcomes.record(recover_profile_update_error.name, TaskOutcome.DEAD_LETTERED)
+            return
+
+        survey_answer = SurveyAnswer.from_repr(failed_profile_update_task.raw_survey_answer)
+        timeline = Timeline(failed_profile_update_task.trace_id, survey_answer.wenet_id)
+        timeline.mark("started")
         try:
-            ProfileHandler(survey_answer.wenet_id).update_profile(survey_answer)
-
-            # create or update LastUserProfileUpdate
-            with transaction.atomic():
-                if last_user_profile_update is None:
-                    last_user_profile_update = LastUserProfileUpdate(wenet_id=survey_answer.wenet_id, last_update=datetime.now())
-                else:
-                    last_user_profile_update.last_update = datetime.now()
-                last_user_profile_update.save()
-
-            # delete FailedProfileUpdateTask if present
-            with transaction.atomic():
-                failed_profile_update_task.delete()
+            ProfileHandler(survey_answer.wenet_id).update_profile(survey_answer, timeline)
+            LastUserProfileUpdate.register(survey_answer.wenet_id)
+            timeline.mark("completed")
+            # a failure of a newer survey answer registered in the meantime is kept
+            FailedProfileUpdateTask.objects.filter(id=failed_profile_update_task.id, failure_datetime=failed_profile_update_task.failure_datetime).delete()
+            outcomes.record(recover_profile_update_error.name, TaskOutcome.SUCCESS)
         except Exception as e:
-            failed_profile_update_task.retry_count += 1
-            with transaction.atomic():
-                failed_profile_update_task.save()
+            outcomes.record(recover_profile_update_error.name, TaskOutcome.FAILED)
+            FailedProfileUpdateTask.objects.filter(id=failed_profile_update_task.id).update(
+                retry_count=F("retry_count") + 1,
+                next_attempt_at=FailedProfileUpdateQueue.next_attempt_at(failed_profile_update_task.retry_count + 1),
+                **FailedProfileUpdateTask.error_fields(e)
+            )
             if isinstance(e, RefreshTokenExpiredError):
                 logger.warning("Token expired", exc_info=e)
             else:
                 logger.exception("Unexpected error occurs", exc_info=e)
+        finally:
+            timeline.save()
 
 
-@app.task()
+@app.task(ignore_result=True)
 def recover_profile_update_errors() -> None:
-    failed_tasks = FailedProfileUpdateTask.objects.order_by("failure_datetime")
-    for failed_task in failed_tasks:
-        recover_profile_update_error.delay(failed_task.raw_survey_answer)
+    queue = FailedProfileUpdateQueue()
+    recovered = 0
+    while recovered < settings.PROFILE_UPDATE_RECOVERY_LIMIT:
+        ids = queue.claim(min(settings.PROFILE_UPDATE_RECOVERY_BATCH_SIZE, settings.PROFILE_UPDATE_RECOVERY_LIMIT - recovered))
+        # only the ids go through the broker, each batch is published over a single connection, the user routes the
+        # recovery to the shard of its profile updates
+        with app.producer_or_acquire() as producer:
+            for failed_profile_update_task_id, wenet_id, claimed_until in FailedProfileUpdateTask.objects.filter(id__in=ids).values_list("id", "wenet_id", "next_attempt_at"):
+                recover_profile_update_error.apply_async((failed_profile_update_task_id,), {"wenet_id": wenet_id, "claimed_until": claimed_until.isoformat()}, producer=producer)
+        recovered += len(ids)
+        if len(ids) < settings.PROFILE_UPDATE_RECOVERY_BATCH_SIZE:
+            break
+    if recovered > 0:
+        logger.info(f"Recovering {recovered} failed profile updates")
+
+
+@app.task(ignore_result=True)
+def refresh_expiring_credentials() -> None:
+    refresher = CredentialsRefresher()
+    keys = list(refresher.expiring().values_list("key", flat=True)[:settings.CREDENTIALS_REFRESH_BATCH_SIZE])
+    refreshed = 0
+    for key in keys:
+        if refresher.refresh(key):
+            refreshed += 1
+        time.sleep(1 / settings.CREDENTIALS_REFRESH_RATE)
+    if keys:
+        logger.info(f"Refreshed {refreshed} of {len(keys)} expiring credentials")
+
+
+@app.task(ignore_result=True)
+def purge_credentials() -> None:
+    deleted = CredentialsCollector().purge()
+    logger.info(f"Purged {deleted['orphaned']} orphaned and {deleted['idle']} idle cached credentials")
+
+
+@app.task(ignore_result=True)
+def purge_task_results() -> None:
+    now = timezone.now()
+    deleted_results = delete_in_batches(TaskResult.objects.filter(date_done__lt=now - timedelta(days=settings.TASK_RESULT_RETENTION_DAYS)), settings.TASK_RESULT_PURGE_BATCH_SIZE)
+    deleted_outcomes = delete_in_batches(TaskOutcome.objects.filter(minute__lt=now - timedelta(days=settings.TASK_OUTCOME_RETENTION_DAYS)), settings.TASK_RESULT_PURGE_BATCH_SIZE)
+    deleted_timelines = delete_in_batches(SubmissionTimeline.objects.filter(received_at__lt=now - timedelta(days=settings.SUBMISSION_TIMELINE_RETENTION_DAYS)), settings.TASK_RESULT_PURGE_BATCH_SIZE)
+    logger.info(f"Purged {deleted_results} task results, {deleted_outcomes} task outcomes and {deleted_timelines} submission timelines")
@@ -0,0 +1,123 @@
+from __future__ import absolute_import, annotations
+
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from kombu.exceptions import ChannelError
+
+from tasks.backpressure import Backpressure, BackpressureCollector, Health, measure_health, measure_queue_depth
+from tasks.models import FailedProfileUpdateTask, TaskOutcome
+from tasks.tasks import update_user_profile
+
+
+@override_settings(WEBHOOK_MAX_QUEUE_DEPTH=0)
+class TestMeasureHealth(TestCase):
+
+    def test_failed_backlog(self):
+        for wenet_id in ["1", "2"]:
+            FailedProfileUpdateTask.register(wenet_id, {}, next_attempt_at=timezone.now() + timedelta(minutes=1))
+
+        with override_settings(WEBHOOK_MAX_FAILED_BACKLOG=1):
+            health = measure_health()
+            self.assertEqual(2, health.failed_backlog)
+            self.assertEqual(0, health.recovery_delay)
+            self.assertEqual("failed_backlog", health.exceeded())
+
+    def test_recovery_delay(self):
+        FailedProfileUpdateTask.register("1", {}, next_attempt_at=timezone.now() - timedelta(hours=1))
+        FailedProfileUpdateTask.register("2", {}, next_attempt_at=timezone.now() + timedelta(hours=1))
+
+        with override_settings(WEBHOOK_MAX_RECOVERY_DELAY=1800):
+            health = measure_health()
+            self.assertAlmostEqual(3600, health.recovery_delay, delta=60)
+            self.assertEqual("recovery_delay", health.exceeded())
+
+    @override_settings(WEBHOOK_FAILURE_MIN_RUNS=20, WEBHOOK_MAX_FAILURE_RATIO=0.5)
+    def test_failure_ratio(self):
+        minute = timezone.now().replace(second=0, microsecond=0)
+        TaskOutcome.objects.create(task=update_user_profile.name, minute=minute, outcome=TaskOutcome.FAILED, count=15)
+        TaskOutcome.objects.create(task=update_user_profile.name, minute=minute, outcome=TaskOutcome.SUCCESS, count=5)
+        TaskOutcome.objects.create(task=update_user_profile.name, minute=minute - timedelta(hours=1), outcome=TaskOutcome.SUCCESS, count=100)
+
+        health = measure_health()
+        self.assertEqual(0.75, health.failure_ratio)
+        self.assertEqual("failure_ratio", health.exceeded())
+
+    @override_settings(WEBHOOK_FAILURE_MIN_RUNS=20)
+    def test_failure_ratio_few_runs(self):
+        TaskOutcome.objects.create(task=update_user_profile.name, minute=timezone.now().replace(second=0, microsecond=0), outcome=TaskOutcome.FAILED, count=3)
+
+        health = measure_health()
+        self.assertEqual(0, health.failure_ratio)
+        self.assertIsNone(health.exceeded())
+
+    @override_settings(WEBHOOK_MAX_QUEUE_DEPTH=5)
+    def test_queue_depth(self):
+        with patch("tasks.backpressure.measure_queue_depth", return_value=10):
+            self.assertEqual("queue_depth", measure_health().exceeded())
+
+    @override_settings(WEBHOOK_MAX_QUEUE_DEPTH=5)
+    def test_queue_depth_unavailable(self):
+        with patch("tasks.backpressure.measure_queue_depth", side_effect=ConnectionError()):
+            health = measure_health()
+            self.assertIsNone(health.queue_depth)
+            self.assertIsNone(health.exceeded())
+
+
+class TestMeasureQueueDepth(TestCase):
+
+    def _connection(self, *declarations) -> MagicMock:
+        connection = MagicMock()
+        connection.channel_errors = (ChannelError,)
+        connection.channel.return_value.__enter__.return_value.queue_declare.side_effect = declarations
+        return connection
+
+    @override_settings(PROFILE_UPDATE_SHARDS=3)
+    def test_queue_not_declared(self):
+        connection = self._connection(MagicMock(message_count=4), ChannelError("NOT_FOUND - no queue 'profile_updates.1'"), MagicMock(message_count=2))
+        with patch("tasks.backpressure.app.connection_for_read") as mock_connection_for_read:
+            mock_connection_for_read.return_value.__enter__.return_value = connection
+            self.assertEqual(6, measure_queue_depth())
+        self.assertEqual(3, connection.channel.call_count)
+
+    @override_settings(PROFILE_UPDATE_SHARDS=2)
+    def test_channel_error(self):
+        connection = self._connection(MagicMock(message_count=4), ChannelError("ACCESS_REFUSED"))
+        with patch("tasks.backpressure.app.connection_for_read") as mock_connection_for_read:
+            mock_connection_for_read.return_value.__enter__.return_value = connection
+            with self.assertRaises(ChannelError):
+                measure_queue_depth()
+
+
+class TestBackpressure(TestCase):
+
+    @override_settings(WEBHOOK_HEALTH_TTL=60, WEBHOOK_MAX_FAILED_BACKLOG=5)
+    def test_cached_health(self):
+        backpressure = Backpressure()
+        with patch("tasks.backpressure.measure_health", return_value=Health(failed_backlog=10)) as mock_measure_health:
+            self.assertEqual("failed_backlog", backpressure.rejection_reason())
+            self.assertEqual("failed_backlog", backpressure.rejection_reason())
+            mock_measure_health.assert_called_once()
+
+    @override_settings(WEBHOOK_HEALTH_TTL=0, WEBHOOK_MAX_FAILED_BACKLOG=5)
+    def test_expired_health(self):
+        backpressure = Backpressure()
+        with patch("tasks.backpressure.measure_health", side_effect=[Health(failed_backlog=10), Health(failed_backlog=1)]):
+            self.assertEqual("failed_backlog", backpressure.rejection_reason())
+            self.assertIsNone(backpressure.rejection_reason())
+
+    def test_disabled_threshold(self):
+        with override_settings(WEBHOOK_MAX_FAILED_BACKLOG=0):
+            self.assertIsNone(Health(failed_backlog=10).exceeded())
+
+
+@override_settings(WEBHOOK_MAX_QUEUE_DEPTH=5, WEBHOOK_MAX_FAILED_BACKLOG=0)
+class TestBackpressureCollector(TestCase):
+
+    def test_unmeasured(self):
+        with patch("tasks.backpressure.backpressure.health", return_value=Health(queue_depth=None, failed_backlog=None, recovery_delay=0.0, failure_ratio=0.0)):
+            metrics = {metric.name: metric for metric in BackpressureCollector().collect()}
+        unmeasured = {sample.labels["signal"]: sample.value for sample in metrics["survey_webhook_backpressure_unmeasured"].samples}
+        self.assertEqual({"queue_depth": 1, "failed_backlog": 0, "recovery_delay": 0, "failure_ratio": 0}, unmeasured)
@@ -0,0 +1,62 @@
+from __future__ import absolute_import, annotations
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TransactionTestCase
+from django.utils import timezone
+from wenet.interface.exceptions import ApiException
+
+from tasks.dead_letters import DeadLetterReplayer
+from tasks.models import DeadLetterProfileUpdate, FailedProfileUpdateTask, LastUserProfileUpdate
+from ws.models.survey import SurveyAnswer
+
+
+class TestDeadLetterReplayer(TransactionTestCase):
+
+    def _dead_letter(self, wenet_id: str) -> DeadLetterProfileUpdate:
+        return DeadLetterProfileUpdate.objects.create(
+            wenet_id=wenet_id,
+            raw_survey_answer=SurveyAnswer(wenet_id=wenet_id, answers={}).to_repr(),
+            failure_datetime=timezone.now() - timedelta(hours=1),
+            retry_count=10
+        )
+
+    def test_replay(self):
+        with patch("tasks.tasks.ProfileHandler.update_profile") as mock_update_profile:
+            for index in range(5):
+                self._dead_letter(f"wenetId{index}")
+
+            outcomes = DeadLetterReplayer(concurrency=2, rate=100).replay(DeadLetterProfileUpdate.objects.all())
+            self.assertEqual({DeadLetterReplayer.REPLAYED: 5, DeadLetterReplayer.FAILED: 0, DeadLetterReplayer.SUPERSEDED: 0}, outcomes)
+            self.assertEqual(5, mock_update_profile.call_count)
+            self.assertEqual(0, DeadLetterProfileUpdate.objects.count())
+            self.assertEqual(5, LastUserProfileUpdate.objects.count())
+
+    def test_replay_failure(self):
+        with patch("tasks.tasks.ProfileHandler.update_profile") as mock_update_profile:
+            mock_update_profile.side_effect = ApiException(500, "Internal server error")
+            self._dead_letter("wenetId")
+
+            outcomes = DeadLetterReplayer(concurrency=2, rate=100).replay(DeadLetterProfileUpdate.objects.all())
+            self.assertEqual(1, outcomes[DeadLetterReplayer.FAILED])
+            self.assertEqual("ApiException", DeadLetterProfileUpdate.objects.get(wenet_id="wenetId").last_error_type)
+
+    def test_replay_superseded(self):
+        with patch("tasks.tasks.ProfileHandler.update_profile") as mock_update_profile:
+            self._dead_letter("wenetId")
+            LastUserProfileUpdate.register("wenetId")
+
+            outcomes = DeadLetterReplayer(concurrency=2, rate=100).replay(DeadLetterProfileUpdate.objects.all())
+            self.assertEqual(1, outcomes[DeadLetterReplayer.SUPERSEDED])
+            mock_update_profile.assert_not_called()
+            self.assertEqual(0, DeadLetterProfileUpdate.objects.count())
+
+    def test_requeue(self):
+        dead_letter = self._dead_letter("wenetId")
+
+        self.assertTrue(dead_letter.requeue())
+        self.assertEqual(0, DeadLetterProfileUpdate.objects.count())
+        failed_profile_update_task = FailedProfileUpdateTask.objects.get(wenet_id="wenetId")
+        self.assertEqual(0, failed_profile_update_task.retry_count)
+        self.assertEqual(dead_letter.failure_datetime, failed_profile_update_task.failure_datetime)
@@ -0,0 +1,33 @@
+from __future__ import absolute_import, annotations
+
+from django.test import TestCase
+
+from tasks.freshness import QueueFreshness
+
+
+class TestQueueFreshness(TestCase):
+
+    def test_summary(self):
+        freshness = QueueFreshness()
+        for wait in range(1, 101):
+            freshness.record("profile_updates", wait / 100)
+        freshness.record("recovery", 300.0)
+
+        summary = freshness.summary()
+        self.assertEqual(100, summary["profile_updates"]["count"])
+        self.assertAlmostEqual(0.51, summary["profile_updates"]["median"])
+        self.assertAlmostEqual(0.96, summary["profile_updates"]["p95"])
+        self.assertAlmostEqual(1.0, summary["profile_updates"]["max"])
+        self.assertEqual(1, summary["recovery"]["count"])
+
+        freshness.reset()
+        self.assertEqual({}, freshness.summary())
+
+    def test_bounded_samples(self):
+        freshness = QueueFreshness(max_samples=10)
+        for wait in range(100):
+            freshness.record("recovery", float(wait))
+
+        summary = freshness.summary()
+        self.assertEqual(100, summary["recovery"]["count"])
+        self.assertEqual(99.0, summary["recovery"]["max"])
@@ -0,0 +1,109 @@
+from __future__ import absolute_import, annotations
+
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tasks.models import FailedProfileUpdateTask, LastUserProfileUpdate, ProfileSectionShadow, ProfileUpdateCheckpoint
+
+
+class TestFailedProfileUpdateTask(TestCase):
+
+    def test_register(self):
+        FailedProfileUpdateTask.register("wenetId", {"wenet_id": "wenetId", "answers": {}}, timezone.now())
+        FailedProfileUpdateTask.objects.filter(wenet_id="wenetId").update(retry_count=2)
+        FailedProfileUpdateTask.register("wenetId", {"wenet_id": "wenetId", "answers": {"A01": {}}}, timezone.now())
+
+        self.assertEqual(1, FailedProfileUpdateTask.objects.count())
+        failed_profile_update_task = FailedProfileUpdateTask.objects.get(wenet_id="wenetId")
+        self.assertEqual({"wenet_id": "wenetId", "answers": {"A01": {}}}, failed_profile_update_task.raw_survey_answer)
+        self.assertEqual(2, failed_profile_update_task.retry_count)
+
+
+class TestLastUserProfileUpdate(TestCase):
+
+    def test_register(self):
+        LastUserProfileUpdate.register("wenetId")
+        last_update = LastUserProfileUpdate.objects.get(wenet_id="wenetId").last_update
+        LastUserProfileUpdate.register("wenetId")
+
+        self.assertEqual(1, LastUserProfileUpdate.objects.count())
+        self.assertGreaterEqual(LastUserProfileUpdate.objects.get(wenet_id="wenetId").last_update, last_update)
+
+
+class TestProfileSectionShadow(TestCase):
+
+    def test_store(self):
+        competences = [{"name": "english_score", "ontology": "num", "level": 0.5}]
+        ProfileSectionShadow.store("wenetId", {ProfileSectionShadow.COMPETENCES: [], ProfileSectionShadow.MATERIALS: []})
+        ProfileSectionShadow.store("wenetId", {ProfileSectionShadow.COMPETENCES: competences})
+
+        shadows = ProfileSectionShadow.load("wenetId")
+        self.assertEqual({ProfileSectionShadow.COMPETENCES, ProfileSectionShadow.MATERIALS}, set(shadows))
+        self.assertEqual(competences, shadows[ProfileSectionShadow.COMPETENCES].content)
+        self.assertEqual(ProfileSectionShadow.compute_digest(competences), shadows[ProfileSectionShadow.COMPETENCES].digest)
+        self.assertEqual({}, ProfileSectionShadow.load("otherWenetId"))
+
+    def test_discard(self):
+        ProfileSectionShadow.store("wenetId", {ProfileSectionShadow.COMPETENCES: [], ProfileSectionShadow.MEANINGS: []})
+        ProfileSectionShadow.discard("wenetId", [ProfileSectionShadow.COMPETENCES])
+
+        self.assertEqual({ProfileSectionShadow.MEANINGS}, set(ProfileSectionShadow.load("wenetId")))
+
+    @override_settings(PROFILE_SHADOW_TTL=3600)
+    def test_is_fresh(self):
+        ProfileSectionShadow.store("wenetId", {ProfileSectionShadow.COMPETENCES: []})
+        self.assertTrue(ProfileSectionShadow.load("wenetId")[ProfileSectionShadow.COMPETENCES].is_fresh())
+
+        ProfileSectionShadow.objects.update(written_at=timezone.now() - timedelta(hours=2))
+        self.assertFalse(ProfileSectionShadow.load("wenetId")[ProfileSectionShadow.COMPETENCES].is_fresh())
+
+    def test_digest(self):
+        self.assertEqual(ProfileSectionShadow.compute_digest([{"a": 1, "b": 2}]), ProfileSectionShadow.compute_digest([{"b": 2, "a": 1}]))
+        self.assertNotEqual(ProfileSectionShadow.compute_digest([{"a": 1}]), ProfileSectionShadow.compute_digest([{"a": 2}]))
+
+
+class TestProfileUpdateCheckpoint(TestCase):
+
+    def test_resume(self):
+        raw_survey_answer = {"wenet_id": "wenetId", "answers": {"A01": {}}}
+        checkpoint = ProfileUpdateCheckpoint.start("wenetId", raw_survey_answer)
+        checkpoint.record(ProfileUpdateCheckpoint.PROFILE)
+        checkpoint.record(ProfileUpdateCheckpoint.COMPETENCES)
+
+        checkpoint = ProfileUpdateCheckpoint.start("wenetId", {"answers": {"A01": {}}, "wenet_id": "wenetId"})
+        self.assertEqual(2, checkpoint.attempts)
+        self.assertTrue(checkpoint.is_written(ProfileUpdateCheckpoint.COMPETENCES))
+        self.assertFalse(checkpoint.is_written(ProfileUpdateCheckpoint.MEANINGS))
+        self.assertEqual(2, ProfileUpdateCheckpoint.objects.get(wenet_id="wenetId").attempts)
+
+    def test_newer_answer(self):
+        ProfileUpdateCheckpoint.start("wenetId", {"wenet_id": "wenetId", "answers": {}}).record(ProfileUpdateCheckpoint.PROFILE)
+
+        checkpoint = ProfileUpdateCheckpoint.start("wenetId", {"wenet_id": "wenetId", "answers": {"A01": {}}})
+        self.assertEqual(1, checkpoint.attempts)
+        self.assertFalse(checkpoint.is_written(ProfileUpdateCheckpoint.PROFILE))
+        self.assertEqual([], ProfileUpdateCheckpoint.objects.get(wenet_id="wenetId").sections)
+
+    def test_attempts_of(self):
+        self.assertEqual(0, ProfileUpdateCheckpoint.attempts_of("wenetId", {"wenet_id": "wenetId", "answers": {}}))
+        ProfileUpdateCheckpoint.start("wenetId", {"wenet_id": "wenetId", "answers": {}})
+        ProfileUpdateCheckpoint.start("wenetId", {"wenet_id": "wenetId", "answers": {}})
+
+        self.assertEqual(2, ProfileUpdateCheckpoint.attempts_of("wenetId", {"wenet_id": "wenetId", "answers": {}}))
+        self.assertEqual(0, ProfileUpdateCheckpoint.attempts_of("wenetId", {"wenet_id": "wenetId", "answers": {"A01": {}}}))
+
+    def test_end(self):
+        ProfileUpdateCheckpoint.start("wenetId", {"wenet_id": "wenetId", "answers": {}})
+        checkpoint = ProfileUpdateCheckpoint.start("wenetId", {"wenet_id": "wenetId", "answers": {}})
+        checkpoint.record(ProfileUpdateCheckpoint.PROFILE)
+        checkpoint.end()
+
+        self.assertEqual(1, ProfileUpdateCheckpoint.attempts_of("wenetId", {"wenet_id": "wenetId", "answers": {}}))
+        self.assertEqual([ProfileUpdateCheckpoint.PROFILE], ProfileUpdateCheckpoint.objects.get(wenet_id="wenetId").sections)
+
+    def test_clear(self):
+        ProfileUpdateCheckpoint.start("wenetId", {"wenet_id": "wenetId", "answers": {}})
+        ProfileUpdateCheckpoint.clear("wenetId")
+        self.assertFalse(ProfileUpdateCheckpoint.objects.exists())
@@ -0,0 +1,40 @@
+from __future__ import absolute_import, annotations
+
+import threading
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from tasks.models import TaskOutcome
+from tasks.outcomes import OutcomeLedger
+
+
+@override_settings(TASK_OUTCOME_FLUSH_INTERVAL=3600)
+class TestOutcomeLedger(TestCase):
+
+    def test_flush(self):
+        ledger = OutcomeLedger()
+        ledger.record("update_user_profile", TaskOutcome.SUCCESS)
+        ledger.record("update_user_profile", TaskOutcome.SUCCESS)
+        ledger.record("update_user_profile", TaskOutcome.FAILED)
+        self.assertEqual(0, TaskOutcome.objects.count())
+
+        ledger.flush()
+        ledger.record("update_user_profile", TaskOutcome.SUCCESS)
+        ledger.flush()
+
+        self.assertEqual(2, TaskOutcome.objects.count())
+        self.assertEqual(3, TaskOutcome.objects.get(task="update_user_profile", outcome=TaskOutcome.SUCCESS).count)
+        self.assertEqual(1, TaskOutcome.objects.get(task="update_user_profile", outcome=TaskOutcome.FAILED).count)
+
+    def test_flush_idle_process(self):
+        ledger = OutcomeLedger()
+        ledger.record("update_user_profile", TaskOutcome.SUCCESS)
+        flushed = threading.Event()
+
+        with patch.object(ledger, "flush", side_effect=flushed.set), override_settings(TASK_OUTCOME_FLUSH_INTERVAL=0.05):
+            ledger.start()
+            self.addCleanup(ledger.stop)
+            # no task records an outcome anymore, the thread flushes the pending ones
+            self.assertTrue(flushed.wait(timeout=5))
+            ledger.stop()
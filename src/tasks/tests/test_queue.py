@@ -0,0 +1,63 @@
+from __future__ import absolute_import, annotations
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+
+from tasks.models import FailedProfileUpdateTask
+from tasks.queue import FailedProfileUpdateQueue
+
+
+class TestFailedProfileUpdateQueue(TestCase):
+
+    @staticmethod
+    def _create_task(wenet_id: str, next_attempt_at: datetime) -> FailedProfileUpdateTask:
+        return FailedProfileUpdateTask.objects.create(
+            wenet_id=wenet_id,
+            raw_survey_answer={"wenetId": wenet_id, "answers": []},
+            failure_datetime=timezone.now(),
+            next_attempt_at=next_attempt_at
+        )
+
+    def test_next_attempt_at(self):
+        now = timezone.now()
+        first_attempt = FailedProfileUpdateQueue.next_attempt_at(0)
+        self.assertGreaterEqual(first_attempt, now + timedelta(seconds=settings.PROFILE_UPDATE_RETRY_DELAY / 2))
+        self.assertLessEqual(first_attempt, timezone.now() + timedelta(seconds=settings.PROFILE_UPDATE_RETRY_DELAY))
+
+        last_attempt = FailedProfileUpdateQueue.next_attempt_at(100)
+        self.assertLessEqual(last_attempt, timezone.now() + timedelta(seconds=settings.PROFILE_UPDATE_RETRY_MAX_DELAY))
+
+    def test_claim(self):
+        now = timezone.now()
+        oldest_task = self._create_task("1", now - timedelta(minutes=10))
+        due_task = self._create_task("2", now - timedelta(minutes=1))
+        self._create_task("3", now + timedelta(minutes=10))
+
+        queue = FailedProfileUpdateQueue()
+        self.assertEqual([oldest_task.id], queue.claim(1))
+        self.assertEqual([due_task.id], queue.claim(10))
+        self.assertEqual([], queue.claim(10))
+
+        oldest_task.refresh_from_db()
+        self.assertGreater(oldest_task.next_attempt_at, now + timedelta(seconds=settings.PROFILE_UPDATE_CLAIM_TIMEOUT / 2))
+
+    def test_extend_claim(self):
+        queue = FailedProfileUpdateQueue()
+        task = self._create_task("1", timezone.now() - timedelta(minutes=1))
+        self.assertEqual([task.id], queue.claim(1))
+        claimed_until = FailedProfileUpdateTask.objects.get(id=task.id).next_attempt_at
+
+        self.assertFalse(queue.extend_claim(task.id, claimed_until - timedelta(seconds=1)))
+        self.assertTrue(queue.extend_claim(task.id, claimed_until))
+        self.assertGreaterEqual(FailedProfileUpdateTask.objects.get(id=task.id).next_attempt_at, claimed_until)
+        self.assertFalse(queue.extend_claim(task.id, claimed_until))
+
+    def test_next_attempt_of(self):
+        self.assertLessEqual(FailedProfileUpdateQueue.next_attempt_of("1"), timezone.now() + timedelta(seconds=settings.PROFILE_UPDATE_RETRY_DELAY))
+
+        self._create_task("1", timezone.now())
+        FailedProfileUpdateTask.objects.filter(wenet_id="1").update(retry_count=2)
+        self.assertGreaterEqual(FailedProfileUpdateQueue.next_attempt_of("1"), timezone.now() + timedelta(seconds=settings.PROFILE_UPDATE_RETRY_DELAY * 2))
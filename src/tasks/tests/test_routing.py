@@ -0,0 +1,61 @@
+from __future__ import absolute_import, annotations
+
+from collections import Counter
+from unittest.mock import Mock
+
+from celery.exceptions import WorkerTerminate
+from django.test import TestCase, override_settings
+
+from tasks.routing import shard_for_user, shards_for_worker, worker_for_shard, route_by_user, setup_shard_worker
+
+
+class TestRouting(TestCase):
+
+    def test_shard_for_user(self):
+        wenet_ids = [str(index) for index in range(1000)]
+        shards = {wenet_id: shard_for_user(wenet_id, 8) for wenet_id in wenet_ids}
+        self.assertEqual(shards, {wenet_id: shard_for_user(wenet_id, 8) for wenet_id in wenet_ids})
+        self.assertEqual(set(range(8)), set(shards.values()))
+
+        # adding a shard only moves users to the new shard
+        for wenet_id in wenet_ids:
+            shard = shard_for_user(wenet_id, 9)
+            self.assertIn(shard, [shards[wenet_id], 8])
+
+    def test_shards_for_worker(self):
+        workers = ["worker-a", "worker-b", "worker-c"]
+        assignment = {shard: worker_for_shard(shard, workers) for shard in range(32)}
+        self.assertEqual(32, sum(len(shards_for_worker(worker, workers, 32)) for worker in workers))
+        self.assertEqual(3, len(Counter(assignment.values())))
+
+        # a worker leaving hands over only its own shards
+        remaining = ["worker-a", "worker-c"]
+        for shard, worker in assignment.items():
+            if worker != "worker-b":
+                self.assertEqual(worker, worker_for_shard(shard, remaining))
+
+    @override_settings(PROFILE_UPDATE_SHARDS=4)
+    def test_route_by_user(self):
+        shard = shard_for_user("wenetId", 4)
+        self.assertEqual({"queue": f"profile_updates.{shard}"}, route_by_user("tasks.tasks.update_user_profile", ({"wenetId": "wenetId", "answers": {}},), {}, {}))
+        self.assertEqual({"queue": f"recovery.{shard}"}, route_by_user("tasks.tasks.recover_profile_update_error", (1,), {"wenet_id": "wenetId"}, {}))
+        self.assertIsNone(route_by_user("tasks.tasks.purge_credentials", (), {}, {}))
+
+    def test_route_by_user_without_shards(self):
+        self.assertIsNone(route_by_user("tasks.tasks.update_user_profile", ({"wenetId": "wenetId", "answers": {}},), {}, {}))
+
+    @override_settings(PROFILE_UPDATE_SHARDS=4, SHARD_WORKERS=["shard-1", "shard-2"], WORKER_NAME="shard-1")
+    def test_setup_shard_worker(self):
+        worker = Mock(concurrency=4)
+        setup_shard_worker(sender=worker)
+        self.assertEqual(1, worker.concurrency)
+
+    @override_settings(PROFILE_UPDATE_SHARDS=4, SHARD_WORKERS=["shard-1", "shard-2"], WORKER_NAME="shard-3")
+    def test_setup_unknown_shard_worker(self):
+        with self.assertRaises(WorkerTerminate):
+            setup_shard_worker(sender=Mock(concurrency=1))
+
+    @override_settings(PROFILE_UPDATE_SHARDS=4, SHARD_WORKERS=["shard-1", "shard-1"], WORKER_NAME="shard-1")
+    def test_setup_duplicated_shard_worker(self):
+        with self.assertRaises(WorkerTerminate):
+            setup_shard_worker(sender=Mock(concurrency=1))
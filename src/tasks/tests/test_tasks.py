@@ -1,15 +1,22 @@
 from __future__ import absolute_import, annotations
 
-from datetime import datetime
-from unittest.mock import Mock, patch
+from datetime import datetime, timedelta
+from unittest.mock import ANY, Mock, patch
 
 from django.db import transaction
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from wenet.interface.exceptions import AuthenticationException, ApiException
 from wenet.model.user.profile import WeNetUserProfile
 
-from tasks.models import FailedProfileUpdateTask, LastUserProfileUpdate
-from tasks.tasks import ProfileHandler, update_user_profile, recover_profile_update_error
+from authentication.models import CachedCredentials
+from common.cache import DjangoCacheCredentials
+
+from tasks.models import FailedProfileUpdateTask, LastUserProfileUpdate, DeadLetterProfileUpdate, ProfileSectionShadow, ProfileUpdateCheckpoint
+from tasks.queue import FailedProfileUpdateQueue
+from tasks.tasks import ProfileHandler, update_user_profile, recover_profile_update_error, refresh_expiring_credentials, \
+    recover_profile_update_errors
+from tasks.timeline import Timeline
 from django.conf import settings
 from ws.models.survey import SurveyAnswer, SingleChoiceAnswer
 
@@ -108,6 +115,93 @@ class TestCeleryTask(TestCase):
             self.assertEqual(0, len(FailedProfileUpdateTask.objects.all()))
             self.assertEqual(1, len(LastUserProfileUpdate.objects.all()))
 
+    def test_recover_profile_update_error_by_id(self):
+        with patch("tasks.tasks.ProfileHandler.update_profile") as mock_update_profile:
+            failed_profile_update_task = FailedProfileUpdateTask.objects.create(
+                wenet_id="wenetId",
+                raw_survey_answer=SurveyAnswer(wenet_id="wenetId", answers={"A01": SingleChoiceAnswer("A01", SingleChoiceAnswer.FIELD_TYPE, "5")}).to_repr(),
+                failure_datetime=datetime.now()
+            )
+
+            recover_profile_update_error(failed_profile_update_task.id)
+            mock_update_profile.assert_called_once()
+            self.assertEqual(0, len(FailedProfileUpdateTask.objects.all()))
+            self.assertEqual(1, len(LastUserProfileUpdate.objects.all()))
+
+            recover_profile_update_error(failed_profile_update_task.id)
+            mock_update_profile.assert_called_once()
+
+    def test_recover_profile_update_error_claimed_again(self):
+        with patch("tasks.tasks.ProfileHandler.update_profile") as mock_update_profile:
+            claimed_until = timezone.now() + timedelta(seconds=settings.PROFILE_UPDATE_CLAIM_TIMEOUT)
+            failed_profile_update_task = FailedProfileUpdateTask.objects.create(
+                wenet_id="wenetId",
+                raw_survey_answer=SurveyAnswer(wenet_id="wenetId", answers={"A01": SingleChoiceAnswer("A01", SingleChoiceAnswer.FIELD_TYPE, "5")}).to_repr(),
+                failure_datetime=timezone.now(),
+                next_attempt_at=claimed_until
+            )
+
+            # the first claim expired while the recovery waited on the broker, the update was claimed again since
+            recover_profile_update_error(failed_profile_update_task.id, wenet_id="wenetId", claimed_until=(claimed_until - timedelta(seconds=settings.PROFILE_UPDATE_CLAIM_TIMEOUT)).isoformat())
+            mock_update_profile.assert_not_called()
+            self.assertEqual(claimed_until, FailedProfileUpdateTask.objects.get(id=failed_profile_update_task.id).next_attempt_at)
+
+            recover_profile_update_error(failed_profile_update_task.id, wenet_id="wenetId", claimed_until=claimed_until.isoformat())
+            mock_update_profile.assert_called_once()
+            self.assertFalse(FailedProfileUpdateTask.objects.exists())
+
+    def test_update_user_profile_failed_again(self):
+        with patch("tasks.tasks.ProfileHandler.update_profile") as mock_update_profile:
+            mock_update_profile.side_effect = Exception()
+            survey_answer = SurveyAnswer(wenet_id="wenetId", answers={"A01": SingleChoiceAnswer("A01", SingleChoiceAnswer.FIELD_TYPE, "5")})
+            FailedProfileUpdateTask.register("wenetId", survey_answer.to_repr(), timezone.now())
+            FailedProfileUpdateTask.objects.filter(wenet_id="wenetId").update(retry_count=3)
+
+            start = timezone.now()
+            update_user_profile(survey_answer.to_repr())
+            failed_profile_update_task = FailedProfileUpdateTask.objects.get(wenet_id="wenetId")
+            # the new failure keeps the backoff of the attempts already failed
+            self.assertEqual(3, failed_profile_update_task.retry_count)
+            self.assertGreaterEqual(failed_profile_update_task.next_attempt_at, start + timedelta(seconds=settings.PROFILE_UPDATE_RETRY_DELAY * 2 ** 3 / 2))
+
+    @staticmethod
+    def _lose_worker(survey_answer: SurveyAnswer, *args) -> None:
+        # the attempt starts, then its worker is killed
+        ProfileUpdateCheckpoint.start(survey_answer.wenet_id, survey_answer.to_repr())
+        raise SystemExit()
+
+    @override_settings(PROFILE_UPDATE_MAX_INTERRUPTED_ATTEMPTS=2)
+    def test_update_user_profile_interrupted(self):
+        with patch("tasks.tasks.ProfileHandler.update_profile", side_effect=self._lose_worker) as mock_update_profile:
+            survey_answer = SurveyAnswer(wenet_id="wenetId", answers={"A01": SingleChoiceAnswer("A01", SingleChoiceAnswer.FIELD_TYPE, "5")})
+            for _ in range(2):
+                with self.assertRaises(SystemExit):
+                    update_user_profile(survey_answer.to_repr())
+
+            # the broker delivers the update again, it is left to the recoveries
+            update_user_profile(survey_answer.to_repr())
+            self.assertEqual(2, mock_update_profile.call_count)
+            self.assertEqual("WorkerLostError", FailedProfileUpdateTask.objects.get(wenet_id="wenetId").last_error_type)
+
+    @override_settings(PROFILE_UPDATE_MAX_INTERRUPTED_ATTEMPTS=2)
+    def test_recover_profile_update_error_interrupted(self):
+        with patch("tasks.tasks.ProfileHandler.update_profile", side_effect=self._lose_worker) as mock_update_profile:
+            survey_answer = SurveyAnswer(wenet_id="wenetId", answers={"A01": SingleChoiceAnswer("A01", SingleChoiceAnswer.FIELD_TYPE, "5")})
+            failed_profile_update_task = FailedProfileUpdateTask.objects.create(
+                wenet_id="wenetId",
+                raw_survey_answer=survey_answer.to_repr(),
+                failure_datetime=timezone.now()
+            )
+            for _ in range(2):
+                with self.assertRaises(SystemExit):
+                    recover_profile_update_error(failed_profile_update_task.id)
+
+            recover_profile_update_error(failed_profile_update_task.id)
+            self.assertEqual(2, mock_update_profile.call_count)
+            self.assertFalse(FailedProfileUpdateTask.objects.exists())
+            self.assertEqual("WorkerLostError", DeadLetterProfileUpdate.objects.get(wenet_id="wenetId").last_error_type)
+            self.assertFalse(ProfileUpdateCheckpoint.objects.exists())
+
     def test_recover_profile_update_error_without_profile_update_exception(self):
         with patch("tasks.tasks.ProfileHandler.update_profile") as mock_update_profile:
             mock_update_profile.side_effect = Exception()
@@ -296,4 +390,189 @@ class TestCeleryTask(TestCase):
 
             recover_profile_update_error(failed_profile_update_task.raw_survey_answer)
             mock_update_profile.assert_not_called()
-            self.assertEqual(0, len(FailedProfileUpdateTask.objects.all()))
\ No newline at end of file
+            self.assertEqual(0, len(FailedProfileUpdateTask.objects.all()))
+            self.assertEqual(1, len(DeadLetterProfileUpdate.objects.all()))
+            self.assertEqual(10, DeadLetterProfileUpdate.objects.get(wenet_id="wenetId").retry_count)
+
+    def test_refresh_expiring_credentials(self):
+        with patch("common.credentials.CredentialsRefresher.refresh") as mock_refresh:
+            mock_refresh.return_value = True
+            cache = DjangoCacheCredentials()
+            cache.cache({"token": "token", "refresh_token": "refreshToken"}, key="expiring", expires_in=60)
+            cache.cache({"token": "token", "refresh_token": "refreshToken"}, key="valid", expires_in=settings.CREDENTIALS_REFRESH_AHEAD * 2)
+            CachedCredentials.objects.create(key="disabled", data={}, expires_at=None)
+
+            refresh_expiring_credentials()
+            mock_refresh.assert_called_once_with("expiring")
+
+    def test_recover_profile_update_errors(self):
+        with patch("tasks.tasks.recover_profile_update_error.apply_async") as mock_recover:
+            due_task = FailedProfileUpdateTask.objects.create(
+                wenet_id="wenetId",
+                raw_survey_answer=SurveyAnswer(wenet_id="wenetId", answers={}).to_repr(),
+                failure_datetime=datetime.now()
+            )
+            FailedProfileUpdateTask.objects.create(
+                wenet_id="otherWenetId",
+                raw_survey_answer=SurveyAnswer(wenet_id="otherWenetId", answers={}).to_repr(),
+                failure_datetime=datetime.now(),
+                next_attempt_at=FailedProfileUpdateQueue.next_attempt_at(0)
+            )
+
+            recover_profile_update_errors()
+            claimed_until = FailedProfileUpdateTask.objects.get(id=due_task.id).next_attempt_at
+            mock_recover.assert_called_once_with((due_task.id,), {"wenet_id": "wenetId", "claimed_until": claimed_until.isoformat()}, producer=ANY)
+
+            mock_recover.reset_mock()
+            recover_profile_update_errors()
+            mock_recover.assert_not_called()
+
+
+@patch("tasks.tasks.time.sleep", Mock())
+class TestProfileHandlerShadows(TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        settings.WENET_APP_ID = ""
+        settings.WENET_APP_SECRET = ""
+        settings.WENET_INSTANCE_URL = ""
+        self.survey_answer = SurveyAnswer(wenet_id="wenetId", answers={"A01": SingleChoiceAnswer("A01", SingleChoiceAnswer.FIELD_TYPE, "5")})
+        self.competences = [{"name": "english_score", "ontology": "num", "level": 0.5}]
+        for method, value in [("get_user_profile", None), ("get_user_competences", self.competences), ("get_user_meanings", []),
+                              ("get_user_materials", []), ("update_user_profile", None), ("update_user_competences", None),
+                              ("update_user_meanings", None), ("update_user_materials", None)]:
+            patcher = patch(f"wenet.interface.service_api.ServiceApiInterface.{method}", return_value=value)
+            setattr(self, f"mock_{method}", patcher.start())
+            self.addCleanup(patcher.stop)
+        self.mock_get_user_profile.side_effect = lambda profile_id: WeNetUserProfile.empty(profile_id)
+
+    def test_update_profile_without_shadows(self):
+        ProfileHandler("wenetId").update_profile(self.survey_answer)
+
+        self.assertEqual(2, self.mock_get_user_competences.call_count)
+        shadows = ProfileSectionShadow.load("wenetId")
+        self.assertEqual(set(ProfileSectionShadow.SECTIONS), set(shadows))
+        self.assertEqual(self.competences, shadows[ProfileSectionShadow.COMPETENCES].content)
+
+    def test_update_profile_with_shadows(self):
+        ProfileSectionShadow.store("wenetId", {ProfileSectionShadow.COMPETENCES: self.competences, ProfileSectionShadow.MEANINGS: [], ProfileSectionShadow.MATERIALS: []})
+
+        ProfileHandler("wenetId").update_profile(self.survey_answer)
+        self.assertEqual(2, self.mock_get_user_profile.call_count)
+        self.assertEqual(1, self.mock_get_user_competences.call_count)
+        self.assertEqual(1, self.mock_get_user_meanings.call_count)
+        self.assertEqual(1, self.mock_get_user_materials.call_count)
+        self.mock_update_user_competences.assert_called_once_with("wenetId", self.competences)
+
+    @override_settings(PROFILE_SHADOW_TTL=3600)
+    def test_update_profile_with_stale_shadows(self):
+        ProfileSectionShadow.store("wenetId", {ProfileSectionShadow.COMPETENCES: [], ProfileSectionShadow.MEANINGS: [], ProfileSectionShadow.MATERIALS: []})
+        ProfileSectionShadow.objects.update(written_at=timezone.now() - timedelta(hours=2))
+
+        ProfileHandler("wenetId").update_profile(self.survey_answer)
+        self.assertEqual(2, self.mock_get_user_competences.call_count)
+        self.mock_update_user_competences.assert_called_once_with("wenetId", self.competences)
+
+    def test_update_profile_rejected(self):
+        self.mock_update_user_meanings.side_effect = AuthenticationException(403, "message")
+
+        ProfileHandler("wenetId").update_profile(self.survey_answer)
+        self.assertEqual({ProfileSectionShadow.COMPETENCES, ProfileSectionShadow.MATERIALS}, set(ProfileSectionShadow.load("wenetId")))
+
+    def test_update_profile_failure(self):
+        ProfileSectionShadow.store("wenetId", {ProfileSectionShadow.COMPETENCES: self.competences, ProfileSectionShadow.MEANINGS: [], ProfileSectionShadow.MATERIALS: []})
+        self.mock_update_user_materials.side_effect = ApiException(500, "message")
+
+        with self.assertRaises(ApiException):
+            ProfileHandler("wenetId").update_profile(self.survey_answer)
+        self.assertEqual({}, ProfileSectionShadow.load("wenetId"))
+
+
+@patch("tasks.tasks.time.sleep", Mock())
+class TestProfileHandlerCheckpoints(TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        settings.WENET_APP_ID = ""
+        settings.WENET_APP_SECRET = ""
+        settings.WENET_INSTANCE_URL = ""
+        self.survey_answer = SurveyAnswer(wenet_id="wenetId", answers={"A01": SingleChoiceAnswer("A01", SingleChoiceAnswer.FIELD_TYPE, "5")})
+        for method, value in [("get_user_profile", None), ("get_user_competences", []), ("get_user_meanings", []),
+                              ("get_user_materials", []), ("update_user_profile", None), ("update_user_competences", None),
+                              ("update_user_meanings", None), ("update_user_materials", None)]:
+            patcher = patch(f"wenet.interface.service_api.ServiceApiInterface.{method}", return_value=value)
+            setattr(self, f"mock_{method}", patcher.start())
+            self.addCleanup(patcher.stop)
+        self.mock_get_user_profile.side_effect = lambda profile_id: WeNetUserProfile.empty(profile_id)
+
+    def test_resume_after_failure(self):
+        self.mock_update_user_materials.side_effect = ApiException(500, "message")
+        with self.assertRaises(ApiException):
+            ProfileHandler("wenetId").update_profile(self.survey_answer)
+        checkpoint = ProfileUpdateCheckpoint.objects.get(wenet_id="wenetId")
+        self.assertEqual([ProfileUpdateCheckpoint.PROFILE, ProfileUpdateCheckpoint.COMPETENCES, ProfileUpdateCheckpoint.MEANINGS], checkpoint.sections)
+
+        self.mock_update_user_materials.side_effect = None
+        ProfileHandler("wenetId").update_profile(self.survey_answer)
+        self.mock_update_user_profile.assert_called_once()
+        self.mock_update_user_competences.assert_called_once()
+        self.mock_update_user_meanings.assert_called_once()
+        self.assertEqual(2, self.mock_update_user_materials.call_count)
+        self.assertFalse(ProfileUpdateCheckpoint.objects.filter(wenet_id="wenetId").exists())
+
+    def test_resume_timeline(self):
+        self.mock_update_user_meanings.side_effect = ApiException(500, "message")
+        with self.assertRaises(ApiException):
+            ProfileHandler("wenetId").update_profile(self.survey_answer, Timeline("trace", "wenetId"))
+
+        self.mock_update_user_meanings.side_effect = None
+        timeline = Timeline("trace", "wenetId")
+        ProfileHandler("wenetId").update_profile(self.survey_answer, timeline)
+        # the sections resumed are reached by the last attempt, after its read of the profile
+        self.assertGreaterEqual(timeline.stages["profile_written"], timeline.stages["fetched"])
+        self.assertGreaterEqual(timeline.stages["competences_written"], timeline.stages["fetched"])
+        self.assertIn("materials_written", timeline.stages)
+
+    @override_settings(PROFILE_UPDATE_MAX_INTERRUPTED_ATTEMPTS=2)
+    def test_failed_attempts_not_interrupted(self):
+        self.mock_update_user_meanings.side_effect = ApiException(500, "message")
+        # the same answer is submitted again, each update fails with an error of the platform
+        for _ in range(3):
+            update_user_profile(self.survey_answer.to_repr())
+        self.assertEqual(3, self.mock_update_user_meanings.call_count)
+        self.assertEqual(0, ProfileUpdateCheckpoint.objects.get(wenet_id="wenetId").attempts)
+        self.assertEqual("ApiException", FailedProfileUpdateTask.objects.get(wenet_id="wenetId").last_error_type)
+
+    def test_newer_answer_writes_all_sections(self):
+        self.mock_update_user_meanings.side_effect = ApiException(500, "message")
+        with self.assertRaises(ApiException):
+            ProfileHandler("wenetId").update_profile(self.survey_answer)
+
+        self.mock_update_user_meanings.side_effect = None
+        newer_survey_answer = SurveyAnswer(wenet_id="wenetId", answers={"A01": SingleChoiceAnswer("A01", SingleChoiceAnswer.FIELD_TYPE, "4")})
+        ProfileHandler("wenetId").update_profile(newer_survey_answer)
+        self.assertEqual(2, self.mock_update_user_profile.call_count)
+        self.assertEqual(2, self.mock_update_user_competences.call_count)
+        self.assertEqual(2, self.mock_update_user_meanings.call_count)
+        self.mock_update_user_materials.assert_called_once()
+
+    def test_rejected_section_not_recorded(self):
+        self.mock_update_user_competences.side_effect = AuthenticationException(403, "message")
+        self.mock_update_user_materials.side_effect = ApiException(500, "message")
+        with self.assertRaises(ApiException):
+            ProfileHandler("wenetId").update_profile(self.survey_answer)
+
+        self.assertEqual([ProfileUpdateCheckpoint.PROFILE, ProfileUpdateCheckpoint.MEANINGS], ProfileUpdateCheckpoint.objects.get(wenet_id="wenetId").sections)
+
+    def test_recovery_resumes(self):
+        self.mock_update_user_meanings.side_effect = ApiException(500, "message")
+        update_user_profile(self.survey_answer.to_repr())
+        failed_profile_update_task = FailedProfileUpdateTask.objects.get(wenet_id="wenetId")
+
+        self.mock_update_user_meanings.side_effect = None
+        recover_profile_update_error(failed_profile_update_task.id)
+        self.assertFalse(FailedProfileUpdateTask.objects.exists())
+        self.mock_update_user_profile.assert_called_once()
+        self.mock_update_user_competences.assert_called_once()
+        self.assertEqual(2, self.mock_update_user_meanings.call_count)
+        self.mock_update_user_materials.assert_called_once()
@@ -0,0 +1,93 @@
+from __future__ import absolute_import, annotations
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from tasks.models import FailedProfileUpdateTask, SubmissionTimeline
+from tasks.tasks import update_user_profile
+from tasks.timeline import FreshnessReport, Timeline
+from ws.models.survey import SurveyAnswer
+
+
+class TestTimeline(TestCase):
+
+    def test_save(self):
+        received_at = timezone.now()
+        timeline = Timeline("trace", "wenetId")
+        timeline.mark("received", received_at)
+        timeline.mark("enqueued")
+        timeline.save(attempt=False)
+
+        timeline.mark("started")
+        timeline.mark("completed")
+        timeline.save()
+
+        submission_timeline = SubmissionTimeline.objects.get(trace_id="trace")
+        self.assertEqual(received_at, submission_timeline.received_at)
+        self.assertIsNotNone(submission_timeline.enqueued_at)
+        self.assertIsNotNone(submission_timeline.completed_at)
+        self.assertIsNone(submission_timeline.fetched_at)
+        self.assertEqual(1, submission_timeline.attempts)
+
+    def test_save_without_trace_id(self):
+        timeline = Timeline(None, "wenetId")
+        timeline.mark("started")
+        timeline.save()
+        self.assertEqual(0, SubmissionTimeline.objects.count())
+
+    def test_update_user_profile(self):
+        with patch("tasks.tasks.ProfileHandler.update_profile"):
+            update_user_profile(SurveyAnswer(wenet_id="wenetId", answers={}).to_repr(), trace_id="trace")
+        submission_timeline = SubmissionTimeline.objects.get(trace_id="trace")
+        self.assertIsNotNone(submission_timeline.started_at)
+        self.assertIsNotNone(submission_timeline.completed_at)
+
+    def test_update_user_profile_exception(self):
+        with patch("tasks.tasks.ProfileHandler.update_profile", side_effect=Exception()):
+            update_user_profile(SurveyAnswer(wenet_id="wenetId", answers={}).to_repr(), trace_id="trace")
+        self.assertIsNone(SubmissionTimeline.objects.get(trace_id="trace").completed_at)
+        self.assertEqual("trace", FailedProfileUpdateTask.objects.get(wenet_id="wenetId").trace_id)
+
+
+class TestFreshnessReport(TestCase):
+
+    def test_build(self):
+        received_at = timezone.now()
+        for index in range(4):
+            SubmissionTimeline.objects.create(
+                trace_id=f"trace{index}",
+                wenet_id=f"wenetId{index}",
+                attempts=1 if index > 0 else 2,
+                received_at=received_at,
+                enqueued_at=received_at + timedelta(seconds=1),
+                started_at=received_at + timedelta(seconds=1 + index),
+                completed_at=received_at + timedelta(seconds=10 + index) if index < 3 else None
+            )
+
+        report = FreshnessReport(SubmissionTimeline.objects.all()).build()
+        self.assertEqual(4, report["submissions"])
+        self.assertEqual(3, report["completed"])
+        self.assertEqual(1, report["retried"])
+        self.assertEqual(11, report["freshness"]["median"])
+        self.assertEqual(12, report["freshness"]["max"])
+        self.assertEqual(["completed", "started", "enqueued"], [statistics["stage"] for statistics in report["stages"]])
+
+    def test_build_with_stage_of_previous_attempt(self):
+        received_at = timezone.now()
+        SubmissionTimeline.objects.create(
+            trace_id="trace",
+            wenet_id="wenetId",
+            attempts=2,
+            received_at=received_at,
+            started_at=received_at + timedelta(seconds=60),
+            profile_written_at=received_at + timedelta(seconds=5),
+            competences_written_at=received_at + timedelta(seconds=62),
+            completed_at=received_at + timedelta(seconds=63)
+        )
+
+        report = FreshnessReport(SubmissionTimeline.objects.all()).build()
+        durations = {statistics["stage"]: statistics["max"] for statistics in report["stages"]}
+        self.assertEqual({"started": 60, "competences_written": 2, "completed": 1}, durations)
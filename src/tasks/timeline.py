@@ -0,0 +1,103 @@
+from __future__ import absolute_import, annotations
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from tasks.models import SubmissionTimeline
+
+
+logger = logging.getLogger("wenet-survey-web-app.tasks.timeline")
+
+
+class Timeline:
+    """
+    Collect the stages reached by a submission while it is processed, they are written with a single statement when
+    the timeline is saved. A timeline without a trace id (e.g., a submission received before the timelines were
+    recorded) records nothing.
+    """
+
+    def __init__(self, trace_id: Optional[str], wenet_id: str) -> None:
+        self.trace_id = trace_id
+        self.wenet_id = wenet_id
+        self.stages: Dict[str, datetime] = {}
+
+    @staticmethod
+    def generate_trace_id() -> str:
+        return uuid.uuid4().hex
+
+    def mark(self, stage: str, reached_at: Optional[datetime] = None) -> None:
+        if self.trace_id is not None:
+            self.stages[stage] = reached_at if reached_at is not None else timezone.now()
+
+    def save(self, attempt: bool = True) -> None:
+        """
+        Write the stages reached so far, a failure is only logged since the timeline must never fail the processing.
+
+        :param attempt: True if the stages were reached by an attempt of updating the profile
+        """
+        if self.trace_id is None or not self.stages:
+            return
+        try:
+            SubmissionTimeline.record(self.trace_id, self.wenet_id, self.stages, attempt=attempt)
+        except Exception as e:
+            logger.warning(f"Unable to record the timeline of the submission [{self.trace_id}]", exc_info=e)
+        self.stages = {}
+
+
+class FreshnessReport:
+    """
+    Summarize the timelines of the submissions: how long after being received their profile was updated and how long
+    each stage took, measured from the previous stage reached by the submission. A stage reached before the previous
+    one was left by an earlier attempt, it is excluded.
+    """
+
+    def __init__(self, timelines: QuerySet) -> None:
+        self._timelines = timelines
+
+    def build(self) -> dict:
+        fields = [f"{stage}_at" for stage in SubmissionTimeline.STAGES]
+        submissions = 0
+        retried = 0
+        freshness = []
+        durations: Dict[str, List[float]] = {}
+        for row in self._timelines.values_list("attempts", *fields).iterator():
+            submissions += 1
+            if row[0] > 1:
+                retried += 1
+            reached = dict(zip(SubmissionTimeline.STAGES, row[1:]))
+            if reached["received"] is not None and reached["completed"] is not None:
+                freshness.append((reached["completed"] - reached["received"]).total_seconds())
+
+            previous = None
+            for stage in SubmissionTimeline.STAGES:
+                if reached[stage] is None or (previous is not None and reached[stage] < previous):
+                    continue
+                if previous is not None:
+                    durations.setdefault(stage, []).append((reached[stage] - previous).total_seconds())
+                previous = reached[stage]
+
+        stages = [dict(self._percentiles(values), stage=stage, count=len(values)) for stage, values in durations.items()]
+        return {
+            "submissions": submissions,
+            "completed": len(freshness),
+            "retried": retried,
+            "freshness": self._percentiles(freshness),
+            "stages": sorted(stages, key=lambda statistics: statistics["p95"], reverse=True)
+        }
+
+    @staticmethod
+    def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+        ordered = sorted(values)
+        if not ordered:
+            return {"median": None, "p95": None, "p99": None, "max": None}
+        return {
+            "median": ordered[len(ordered) // 2],
+            "p95": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+            "p99": ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)],
+            "max": ordered[-1]
+        }
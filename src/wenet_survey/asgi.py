@@ -7,10 +7,46 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
+import atexit
+import mimetypes
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+from django.utils.cache import patch_vary_headers
+from django.views import static
+
+from common.metrics import mark_process_dead
+from common.storage import IMMUTABLE_CACHE_CONTROL, is_immutable, select_variant
+from common.warmup import warm_up
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wenet_survey.settings')
 
-application = get_asgi_application()
+
+class CollectedStaticFilesHandler(ASGIStaticFilesHandler):
+    """
+    Serve the collected static files, as the static map of uwsgi does, with their precompressed variant accepted by
+    the client. The files with the hash of their content in their name are cached by the browsers.
+    """
+
+    def serve(self, request):
+        name = self.file_path(request.path)
+        variant, encoding = select_variant(settings.STATIC_ROOT, name, request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        response = static.serve(request, variant, document_root=settings.STATIC_ROOT)
+        if encoding is not None:
+            response["Content-Type"] = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            response["Content-Encoding"] = encoding
+            del response["Content-Disposition"]  # it names the variant
+        patch_vary_headers(response, ["Accept-Encoding"])
+        if is_immutable(name):
+            response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+application = CollectedStaticFilesHandler(get_asgi_application())
+
+# each uvicorn process imports the app, the database connections belong to the threads running the blocking calls
+warm_up(database=False)
+# the warm processes are counted by a live gauge, the process must leave it when it exits
+atexit.register(mark_process_dead)
@@ -23,7 +23,22 @@ app.autodiscover_tasks()
 default_schedule = {
     "recover_profile_update_errors": {
         "task": "tasks.tasks.recover_profile_update_errors",
-        "schedule": crontab(minute="*/15"),  # Execute every 15 minutes
+        "schedule": crontab(),  # Execute every minute, only the due updates are recovered
+        "args": (),
+    },
+    "refresh_expiring_credentials": {
+        "task": "tasks.tasks.refresh_expiring_credentials",
+        "schedule": crontab(minute="*/5"),  # Execute every 5 minutes
+        "args": (),
+    },
+    "purge_credentials": {
+        "task": "tasks.tasks.purge_credentials",
+        "schedule": crontab(minute=30, hour=3),  # Execute every day at 3:30
+        "args": (),
+    },
+    "purge_task_results": {
+        "task": "tasks.tasks.purge_task_results",
+        "schedule": crontab(minute=0, hour=4),  # Execute every day at 4:00
         "args": (),
     }
 }
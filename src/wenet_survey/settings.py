@@ -13,10 +13,6 @@ import logging.config
 import os
 from pathlib import Path
 
-import sentry_sdk
-from sentry_sdk.integrations.django import DjangoIntegration
-from sentry_sdk.integrations.logging import LoggingIntegration
-
 from common.log.logging import get_logging_configuration
 
 logging.config.dictConfig(get_logging_configuration("wenet-survey"))
@@ -26,18 +22,27 @@ logger = logging.getLogger(__name__)
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-sentry_logging = LoggingIntegration(
-    level=logging.INFO,  # Capture info and above as breadcrumbs
-    event_level=logging.WARNING  # Set to log warning message, in this way we get a Sentry issue when someone add an unknown component in tally
-)
-
-sentry_sdk.init(
-    integrations=[DjangoIntegration()],
-    traces_sample_rate=float(os.getenv("SENTRY_SAMPLE_RATE", "0.5")),
-    # If you wish to associate users to errors (assuming you are using
-    # django.contrib.auth) you may enable sending PII data.
-    send_default_pii=True
-)
+if os.getenv("SENTRY_DSN", None):
+    # sentry is imported only when it is configured, without the integrations it would enable for every installed
+    # library (e.g., sqlalchemy, pulled in by kombu), since they slow down the startup of each process
+    import sentry_sdk
+    from sentry_sdk.integrations.celery import CeleryIntegration
+    from sentry_sdk.integrations.django import DjangoIntegration
+    from sentry_sdk.integrations.logging import LoggingIntegration
+
+    sentry_logging = LoggingIntegration(
+        level=logging.INFO,  # Capture info and above as breadcrumbs
+        event_level=logging.WARNING  # Set to log warning message, in this way we get a Sentry issue when someone add an unknown component in tally
+    )
+
+    sentry_sdk.init(
+        integrations=[DjangoIntegration(), CeleryIntegration()],
+        auto_enabling_integrations=False,
+        traces_sample_rate=float(os.getenv("SENTRY_SAMPLE_RATE", "0.5")),
+        # If you wish to associate users to errors (assuming you are using
+        # django.contrib.auth) you may enable sending PII data.
+        send_default_pii=True
+    )
 
 # Environment variables
 # TODO enabled when the project templete support the loading of different settings during the build and test phase
@@ -58,6 +63,55 @@ SURVEY_FORM_ID_MN = os.getenv("SURVEY_FORM_ID_MN")
 SURVEY_FORM_ID_DA = os.getenv("SURVEY_FORM_ID_DA")
 BASE_URL = os.getenv("BASE_URL", "")
 MAX_RETRY_PROFILE_UPDATE = int(os.getenv("MAX_RETRY_PROFILE_UPDATE", "10"))
+PROFILE_UPDATE_RETRY_DELAY = int(os.getenv("PROFILE_UPDATE_RETRY_DELAY", "120"))
+PROFILE_UPDATE_RETRY_MAX_DELAY = int(os.getenv("PROFILE_UPDATE_RETRY_MAX_DELAY", "21600"))
+PROFILE_UPDATE_CLAIM_TIMEOUT = int(os.getenv("PROFILE_UPDATE_CLAIM_TIMEOUT", "900"))
+PROFILE_UPDATE_RECOVERY_BATCH_SIZE = int(os.getenv("PROFILE_UPDATE_RECOVERY_BATCH_SIZE", "100"))
+PROFILE_UPDATE_RECOVERY_LIMIT = int(os.getenv("PROFILE_UPDATE_RECOVERY_LIMIT", "1000"))
+# the competences, meanings and materials last read after an update are reused by the next update of the user for as
+# many seconds, instead of being read again from the platform, 0 always reads them
+PROFILE_SHADOW_TTL = int(os.getenv("PROFILE_SHADOW_TTL", "86400"))
+# an update running for as many seconds is interrupted and recovered from the last section written, 0 never interrupts it
+PROFILE_UPDATE_SOFT_TIME_LIMIT = int(os.getenv("PROFILE_UPDATE_SOFT_TIME_LIMIT", "300"))
+# an update whose worker was lost (e.g., killed out of memory) as many times in a row is no longer redelivered by the
+# broker but moved to the dead letters, the attempts failing with an error are not counted, 0 always redelivers it
+PROFILE_UPDATE_MAX_INTERRUPTED_ATTEMPTS = int(os.getenv("PROFILE_UPDATE_MAX_INTERRUPTED_ATTEMPTS", "3"))
+CREDENTIALS_LOCAL_CACHE_SIZE = int(os.getenv("CREDENTIALS_LOCAL_CACHE_SIZE", "1024"))
+CREDENTIALS_LOCAL_CACHE_TTL = int(os.getenv("CREDENTIALS_LOCAL_CACHE_TTL", "10"))
+CREDENTIALS_TOKEN_LIFETIME = int(os.getenv("CREDENTIALS_TOKEN_LIFETIME", "3600"))
+CREDENTIALS_REFRESH_AHEAD = int(os.getenv("CREDENTIALS_REFRESH_AHEAD", "900"))
+CREDENTIALS_REFRESH_BATCH_SIZE = int(os.getenv("CREDENTIALS_REFRESH_BATCH_SIZE", "200"))
+CREDENTIALS_REFRESH_RATE = float(os.getenv("CREDENTIALS_REFRESH_RATE", "5"))
+CREDENTIALS_REFRESH_RETRY_DELAY = int(os.getenv("CREDENTIALS_REFRESH_RETRY_DELAY", "900"))
+CREDENTIALS_TOUCH_INTERVAL = int(os.getenv("CREDENTIALS_TOUCH_INTERVAL", "3600"))
+CREDENTIALS_ORPHAN_TIMEOUT = int(os.getenv("CREDENTIALS_ORPHAN_TIMEOUT", "3600"))
+CREDENTIALS_RETENTION_DAYS = int(os.getenv("CREDENTIALS_RETENTION_DAYS", "30"))
+CREDENTIALS_PURGE_BATCH_SIZE = int(os.getenv("CREDENTIALS_PURGE_BATCH_SIZE", "1000"))
+TASK_FRESHNESS_LOG_INTERVAL = int(os.getenv("TASK_FRESHNESS_LOG_INTERVAL", "60"))
+TASK_OUTCOME_FLUSH_INTERVAL = int(os.getenv("TASK_OUTCOME_FLUSH_INTERVAL", "10"))
+TASK_OUTCOME_RETENTION_DAYS = int(os.getenv("TASK_OUTCOME_RETENTION_DAYS", "90"))
+TASK_RESULT_RETENTION_DAYS = int(os.getenv("TASK_RESULT_RETENTION_DAYS", "1"))
+TASK_RESULT_PURGE_BATCH_SIZE = int(os.getenv("TASK_RESULT_PURGE_BATCH_SIZE", "1000"))
+SUBMISSION_TIMELINE_RETENTION_DAYS = int(os.getenv("SUBMISSION_TIMELINE_RETENTION_DAYS", "30"))
+PROFILE_UPDATE_SHARDS = int(os.getenv("PROFILE_UPDATE_SHARDS", "0"))
+WORKER_NAME = os.getenv("WORKER_NAME")
+SHARD_WORKERS = os.getenv("SHARD_WORKERS").split(";") if os.getenv("SHARD_WORKERS", None) is not None else []
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9540"))
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "5"))
+# the uwsgi master and the main process of the worker load the app before forking the processes sharing its memory
+PRELOAD_APP = os.getenv("PRELOAD_APP", "TRUE").upper() == "TRUE"
+# written by the worker once it consumes the tasks with warm processes, for the readiness probe of the deployment
+WORKER_READY_FILE = os.getenv("WORKER_READY_FILE", "/tmp/survey-worker-ready")
+ASYNC_BLOCKING_THREADS = int(os.getenv("ASYNC_BLOCKING_THREADS", "20"))
+WEBHOOK_HEALTH_TTL = int(os.getenv("WEBHOOK_HEALTH_TTL", "10"))
+WEBHOOK_RETRY_AFTER = int(os.getenv("WEBHOOK_RETRY_AFTER", "300"))
+WEBHOOK_MAX_QUEUE_DEPTH = int(os.getenv("WEBHOOK_MAX_QUEUE_DEPTH", "5000"))
+WEBHOOK_MAX_FAILED_BACKLOG = int(os.getenv("WEBHOOK_MAX_FAILED_BACKLOG", "1000"))
+WEBHOOK_MAX_RECOVERY_DELAY = int(os.getenv("WEBHOOK_MAX_RECOVERY_DELAY", "1800"))
+WEBHOOK_MAX_FAILURE_RATIO = float(os.getenv("WEBHOOK_MAX_FAILURE_RATIO", "0.5"))
+WEBHOOK_FAILURE_WINDOW = int(os.getenv("WEBHOOK_FAILURE_WINDOW", "300"))
+WEBHOOK_FAILURE_MIN_RUNS = int(os.getenv("WEBHOOK_FAILURE_MIN_RUNS", "20"))
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
@@ -127,19 +181,31 @@ WSGI_APPLICATION = 'wenet_survey.wsgi.application'
 
 temp_default_db_name = os.getenv("DJANGO_DB", "sqlite3")
 
+# the connections are kept open for the requests and the tasks of the next seconds, 0 closes them after each one
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "TRUE").upper() == "TRUE"
+# the connections go through pgbouncer in transaction pooling mode, the server side cursors would not survive it
+PG_BOUNCER = os.getenv("PG_BOUNCER", "FALSE").upper() == "TRUE"
+
 if temp_default_db_name == "sqlite3":
     temp_default_db = {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'common.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
     }
 elif temp_default_db_name == "postgres":
     temp_default_db = {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'common.backends.postgresql',
         'NAME': os.getenv("PG_DATABASE"),
         'USER': os.getenv("PG_USER", "postgres"),
         'PASSWORD': os.getenv("PG_PASSWORD", ""),
         'HOST': os.getenv("PG_HOST", "127.0.0.1"),
         'PORT': os.getenv("PG_PORT", "5432"),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'DISABLE_SERVER_SIDE_CURSORS': PG_BOUNCER,
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv("PG_CONNECT_TIMEOUT", "5")),
+        },
     }
 else:
     raise RuntimeError(f"Unable to load a database of type {temp_default_db_name}")
@@ -149,6 +215,24 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Optional cache shared between the web app and the workers, used in front of the database for the cached credentials
+if os.getenv("CREDENTIALS_CACHE_BACKEND", None) is not None:
+    CACHES['credentials'] = {
+        'BACKEND': os.getenv("CREDENTIALS_CACHE_BACKEND"),
+        'LOCATION': os.getenv("CREDENTIALS_CACHE_LOCATION", ""),
+        'KEY_PREFIX': 'wenet-survey',
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -194,6 +278,7 @@ USE_TZ = True
 STATIC_URL = f"/{BASE_URL}static/"
 STATIC_ROOT = "/var/www/static/"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
+STATICFILES_STORAGE = "common.storage.CompressedManifestStaticFilesStorage"
 
 LOCALE_PATHS = [os.path.join(BASE_DIR, "locale"), ]
 
@@ -210,3 +295,22 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# the processes of the pool warm up before taking their first task, connecting to the database
+CELERY_WORKER_PROC_ALIVE_TIMEOUT = 4.0 + (int(os.getenv("PG_CONNECT_TIMEOUT", "5")) if temp_default_db_name == "postgres" else 0)
+
+# Fresh submissions, recoveries and maintenance jobs are consumed from separate queues, so a recovery backlog does not
+# delay the profile update of a user that just completed the survey. Tasks without a route go to the maintenance queue.
+PROFILE_UPDATE_QUEUE = "profile_updates"
+RECOVERY_QUEUE = "recovery"
+MAINTENANCE_QUEUE = "maintenance"
+
+CELERY_TASK_DEFAULT_QUEUE = MAINTENANCE_QUEUE
+# with `PROFILE_UPDATE_SHARDS` the updates of each user are routed to the queues of its shard, see `tasks.routing`
+CELERY_TASK_ROUTES = [
+    "tasks.routing.route_by_user",
+    {
+        "tasks.tasks.update_user_profile": {"queue": PROFILE_UPDATE_QUEUE},
+        "tasks.tasks.recover_profile_update_error": {"queue": RECOVERY_QUEUE},
+        "tasks.tasks.recover_profile_update_errors": {"queue": RECOVERY_QUEUE},
+    }
+]
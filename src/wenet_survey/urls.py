@@ -21,6 +21,8 @@ from authentication.views.home import HomeView
 from authentication.views.logout import LogoutView
 from authentication.views.oauth import OauthView
 from survey.views.survey import SurveyView
+from ws.views.metrics import MetricsView
+from ws.views.ready import ReadyView
 from ws.views.survey import SurveyEventView
 
 
@@ -30,5 +32,7 @@ urlpatterns = [
     path(f"{settings.BASE_URL}logout/", LogoutView.as_view()),
     path(f"{settings.BASE_URL}survey/", SurveyView.as_view()),
     path(f"{settings.BASE_URL}survey/event/", SurveyEventView.as_view()),
+    path(f"{settings.BASE_URL}metrics/", MetricsView.as_view()),
+    path(f"{settings.BASE_URL}ready/", ReadyView.as_view()),
     path(f"{settings.BASE_URL}admin/", admin.site.urls),
 ]
@@ -9,8 +9,21 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wenet_survey.settings')
 
 application = get_wsgi_application()
+
+if settings.PRELOAD_APP:
+    # the uwsgi master loads the app once, the processes it forks (again after `max-requests`) share its memory
+    from common.preload import preload
+    preload()
+
+from common.preload import register_uwsgi_hooks  # noqa: E402
+from common.warmup import warm_up  # noqa: E402
+
+# the processes forked by uwsgi warm up on their own, any other server runs the app in this process
+if not register_uwsgi_hooks():
+    warm_up()
@@ -0,0 +1,44 @@
+from __future__ import absolute_import, annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common.memory import child_pids, read_process_memory
+
+
+class Command(BaseCommand):
+
+    help = "Report the memory each process forked by the uwsgi master or by the main process of the worker shares with the others"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pid", type=int, default=None, help="The process forking the others, e.g., the main process of the worker")
+        parser.add_argument("--pidfile", default="/tmp/project-master.pid", help="The file with the pid of the forking process, used without --pid (default the pidfile of the uwsgi master)")
+
+    def handle(self, *args, **options):
+        pid = options["pid"]
+        if pid is None:
+            try:
+                with open(options["pidfile"]) as pidfile:
+                    pid = int(pidfile.read().strip())
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Unable to read the pid from [{options['pidfile']}]: {e}")
+
+        try:
+            parent = read_process_memory(pid)
+            children = []
+            for child_pid in child_pids(pid):
+                try:
+                    children.append(read_process_memory(child_pid))
+                except OSError:
+                    pass  # the process exited in the meantime, e.g., recycled after `max-requests`
+        except OSError as e:
+            raise CommandError(f"Unable to read the memory of the process [{pid}]: {e}")
+
+        self.stdout.write(f"{'pid':>8} {'rss MiB':>10} {'shared MiB':>12} {'private MiB':>12} {'pss MiB':>10}")
+        for process in [parent] + children:
+            self.stdout.write(f"{process.pid:>8} {process.rss / 1024:>10.1f} {process.shared / 1024:>12.1f} {process.private / 1024:>12.1f} {process.pss / 1024:>10.1f}")
+        if children:
+            rss = sum(child.rss for child in children)
+            pss = sum(child.pss for child in children)
+            self.stdout.write("")
+            self.stdout.write(f"Children: {len(children)}, private {sum(child.private for child in children) / len(children) / 1024:.1f} MiB and shared {sum(child.shared for child in children) / len(children) / 1024:.1f} MiB on average")
+            self.stdout.write(f"Saved by the sharing: {(rss - pss) / 1024:.1f} MiB ({(rss - pss) / len(children) / 1024:.1f} MiB per child), the children use {pss / 1024:.1f} MiB instead of {rss / 1024:.1f} MiB")
@@ -0,0 +1,38 @@
+from __future__ import absolute_import, annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from common.startup import STARTUP_TARGETS, measure_startup
+
+
+class Command(BaseCommand):
+
+    help = "Profile the time spent importing the modules at the startup of the web app, of the worker and of the management commands"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=list(STARTUP_TARGETS), nargs="+", default=list(STARTUP_TARGETS), help="The kinds of process to profile (default all)")
+        parser.add_argument("--top", type=int, default=20, help="The number of slowest imports to show (default 20)")
+        parser.add_argument("--sort", choices=["cumulative", "self"], default="cumulative", help="Sort the imports by their time including or excluding the nested imports (default cumulative)")
+
+    def handle(self, *args, **options):
+        over_budget = []
+        for target in options["target"]:
+            try:
+                # the first run warms up the cache of the compiled modules, as in a deployed process
+                measure_startup(target)
+                duration = measure_startup(target).duration
+                profile = measure_startup(target, profile_imports=True)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+
+            self.stdout.write(f"{target}: started in {duration * 1000:.0f} ms (budget {settings.STARTUP_BUDGET_SECONDS * 1000:.0f} ms)")
+            self.stdout.write(f"{'module':<70} {'self ms':>10} {'cumulative ms':>14}")
+            for import_time in profile.slowest(options["top"], options["sort"]):
+                self.stdout.write(f"{import_time.module:<70} {import_time.self_us / 1000:>10.1f} {import_time.cumulative_us / 1000:>14.1f}")
+            self.stdout.write("")
+            if duration > settings.STARTUP_BUDGET_SECONDS:
+                over_budget.append(target)
+
+        if over_budget:
+            raise CommandError(f"The startup of {', '.join(over_budget)} exceeds the budget of {settings.STARTUP_BUDGET_SECONDS} seconds")
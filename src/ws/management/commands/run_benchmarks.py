@@ -0,0 +1,54 @@
+from __future__ import absolute_import, annotations
+
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.runner import BenchmarkRunner
+from benchmarks.suite import run_suite
+
+
+class Command(BaseCommand):
+
+    help = "Benchmark the parsing of the survey events and the application of the rules, optionally comparing the results with a baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fields", type=int, nargs="+", default=[91, 200], help="The numbers of fields of the generated survey events (default 91 200)")
+        parser.add_argument("--options", type=int, nargs="+", default=[10], help="The numbers of options of each choice field (default 10)")
+        parser.add_argument("--profile-sizes", type=int, nargs="+", default=[0, 100], help="The numbers of competences, meanings and materials already in the profile (default 0 100)")
+        parser.add_argument("--rounds", type=int, default=200, help="The number of measured calls of each benchmark (default 200)")
+        parser.add_argument("--output", default=None, help="The JSON file where to store the results")
+        parser.add_argument("--baseline", default=None, help="The JSON file with the results to compare with")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="The relative slowdown of the median above which a benchmark is a regression (default 0.2)")
+
+    def handle(self, *args, **options):
+        # the rules log each question not answered, the logging would dominate the measures
+        logging.disable(logging.WARNING)
+        try:
+            runner = BenchmarkRunner(rounds=options["rounds"])
+            run_suite(runner, options["fields"], options["options"], options["profile_sizes"])
+        finally:
+            logging.disable(logging.NOTSET)
+
+        self.stdout.write(f"{'benchmark':<80} {'median ms':>10} {'p95 ms':>10}")
+        for result in runner.results:
+            self.stdout.write(f"{BenchmarkRunner.key(result):<80} {result['median_ms']:>10.3f} {result['p95_ms']:>10.3f}")
+        if options["output"] is not None:
+            runner.save(options["output"])
+            self.stdout.write(f"Results stored in {options['output']}")
+
+        if options["baseline"] is not None:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+            regressions = []
+            self.stdout.write(f"{'benchmark':<80} {'baseline ms':>11} {'ratio':>7}")
+            for comparison in runner.compare(baseline, options["tolerance"]):
+                if comparison["ratio"] is None:
+                    self.stdout.write(f"{comparison['benchmark']:<80} {'-':>11} {'-':>7}")
+                else:
+                    self.stdout.write(f"{comparison['benchmark']:<80} {comparison['baseline_median_ms']:>11.3f} {comparison['ratio']:>7.2f}")
+                if comparison["regression"]:
+                    regressions.append(comparison["benchmark"])
+            if regressions:
+                raise CommandError(f"{len(regressions)} benchmarks regressed more than {options['tolerance']:.0%}: {', '.join(regressions)}")
@@ -0,0 +1,29 @@
+from __future__ import absolute_import, annotations
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.platform import FakePlatformServer, FakePlatformState
+
+
+class Command(BaseCommand):
+
+    help = "Run a fake WeNet platform serving the endpoints used by the profile updates, for load tests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1", help="The address to listen on (default 127.0.0.1)")
+        parser.add_argument("--port", type=int, default=8090, help="The port to listen on (default 8090)")
+        parser.add_argument("--latency", type=float, default=0.05, help="The mean seconds each request takes (default 0.05)")
+        parser.add_argument("--jitter", type=float, default=0.02, help="The maximum variation in seconds of the latency (default 0.02)")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="The fraction of requests failing with 500 (default 0)")
+        parser.add_argument("--rate-limit", type=float, default=None, help="The requests per second above which the platform replies with 429 (default unlimited)")
+
+    def handle(self, *args, **options):
+        state = FakePlatformState(options["latency"], options["jitter"], options["error_rate"], options["rate_limit"])
+        server = FakePlatformServer((options["host"], options["port"]), state)
+        self.stdout.write(f"Fake platform listening on http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,41 @@
+from __future__ import absolute_import, annotations
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from benchmarks.load import LoadDriver
+
+
+class Command(BaseCommand):
+
+    help = "Submit survey events to the web app and measure the profile updates against a fake platform (see run_fake_platform)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--webhook-url", default=f"http://127.0.0.1:8000/{settings.BASE_URL}survey/event/", help="The url of the survey event webhook of the web app")
+        parser.add_argument("--platform-url", default="http://127.0.0.1:8090", help="The url of the fake platform, the workers must use it as WENET_INSTANCE_URL")
+        parser.add_argument("--events", type=int, default=100, help="The number of submitted events, each one from a different user (default 100)")
+        parser.add_argument("--rate", type=float, default=10, help="The events submitted per second (default 10)")
+        parser.add_argument("--concurrency", type=int, default=8, help="The maximum number of submissions in progress (default 8)")
+        parser.add_argument("--fields", type=int, default=91, help="The number of fields of each event (default 91)")
+        parser.add_argument("--timeout", type=float, default=600, help="The seconds to wait for the profile updates to complete (default 600)")
+        parser.add_argument("--output", default=None, help="The JSON file where to store the report")
+
+    def handle(self, *args, **options):
+        driver = LoadDriver(options["webhook_url"], options["platform_url"], options["rate"], options["concurrency"], options["fields"])
+        self.stdout.write(f"Submitting {options['events']} events at {options['rate']} events/s")
+        driver.run(options["events"])
+        self.stdout.write(f"Waiting for the profile updates of {len(driver.submissions)} accepted events")
+        report = driver.report(driver.wait(options["timeout"]))
+
+        self.stdout.write(f"Completed {report['completed']} of {report['submitted']} profile updates")
+        self.stdout.write(f"  webhook statuses: {report['webhook_statuses']}, platform statuses: {report['platform_statuses']}")
+        if report["throughput"] is not None:
+            self.stdout.write(f"  throughput: {report['throughput']:.2f} profile updates/s")
+        for metric in ["webhook_latency", "queue_lag", "end_to_end_latency"]:
+            values = ", ".join(f"{name} {value:.3f}s" if value is not None else f"{name} -" for name, value in report[metric].items())
+            self.stdout.write(f"  {metric.replace('_', ' ')}: {values}")
+        if options["output"] is not None:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
@@ -0,0 +1,36 @@
+from __future__ import absolute_import, annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from tasks.models import FailedProfileUpdateTask
+
+
+class TestMetricsView(APITestCase):
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_get(self):
+        FailedProfileUpdateTask.objects.create(wenet_id="1", raw_survey_answer={}, failure_datetime=timezone.now(), next_attempt_at=timezone.now() - timedelta(minutes=1))
+        FailedProfileUpdateTask.objects.create(wenet_id="2", raw_survey_answer={}, failure_datetime=timezone.now(), next_attempt_at=timezone.now() + timedelta(minutes=1))
+
+        response = self.client.get(f"/{settings.BASE_URL}metrics/", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        content = response.content.decode("utf-8")
+        self.assertIn("survey_failed_profile_updates 2.0", content)
+        self.assertIn("survey_failed_profile_updates_due 1.0", content)
+        self.assertIn("survey_dead_letter_profile_updates 0.0", content)
+        self.assertIn("survey_webhook_request_duration_seconds", content)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_get_with_token(self):
+        self.assertEqual(status.HTTP_401_UNAUTHORIZED, self.client.get(f"/{settings.BASE_URL}metrics/").status_code)
+        self.assertEqual(status.HTTP_200_OK, self.client.get(f"/{settings.BASE_URL}metrics/", HTTP_AUTHORIZATION="Bearer secret").status_code)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_get_without_token(self):
+        self.assertEqual(status.HTTP_403_FORBIDDEN, self.client.get(f"/{settings.BASE_URL}metrics/").status_code)
@@ -0,0 +1,29 @@
+from __future__ import absolute_import, annotations
+
+from django.conf import settings
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from common.warmup import reset_warm_up, warm_up
+
+
+class TestReadyView(APITestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        reset_warm_up()
+        self.addCleanup(reset_warm_up)
+
+    def test_get_not_ready(self):
+        response = self.client.get(f"/{settings.BASE_URL}ready/")
+        self.assertEqual(status.HTTP_503_SERVICE_UNAVAILABLE, response.status_code)
+        self.assertFalse(response.json()["ready"])
+
+    @override_settings(WENET_INSTANCE_URL="")
+    def test_get(self):
+        warm_up()
+
+        response = self.client.get(f"/{settings.BASE_URL}ready/")
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response.json()["ready"])
@@ -1,12 +1,14 @@
 from __future__ import absolute_import, annotations
 
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from django.conf import settings
 from django.http import JsonResponse
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from tasks.backpressure import Health, backpressure
 from tasks.tasks import CeleryTask
 
 
@@ -115,3 +117,17 @@ class TestSurveyEventView(APITestCase):
         self.assertIsInstance(response, JsonResponse)
         self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
         CeleryTask.update_user_profile.assert_not_called()
+
+    @override_settings(WEBHOOK_MAX_FAILED_BACKLOG=5, WEBHOOK_RETRY_AFTER=120)
+    def test_post_throttled(self):
+        CeleryTask.update_user_profile = Mock(return_value=None)
+        backpressure.reset()
+        self.addCleanup(backpressure.reset)
+        url = f"/{settings.BASE_URL}survey/event/"
+        with patch("tasks.backpressure.measure_health", return_value=Health(failed_backlog=10)):
+            response = self.client.post(url, {}, format="json")
+
+        self.assertIsInstance(response, JsonResponse)
+        self.assertEqual(status.HTTP_503_SERVICE_UNAVAILABLE, response.status_code)
+        self.assertEqual("120", response["Retry-After"])
+        CeleryTask.update_user_profile.assert_not_called()
@@ -0,0 +1,34 @@
+from __future__ import absolute_import, annotations
+
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+from common.metrics import exposition, process_registry
+from tasks.backpressure import BackpressureCollector
+from tasks.metrics import BacklogCollector
+
+
+backlog_registry = CollectorRegistry()
+backlog_registry.register(BacklogCollector())
+backlog_registry.register(BackpressureCollector())
+
+
+class MetricsView(APIView):
+    """
+    Expose the metrics of the web app in the Prometheus text format, together with the backlog of the profile updates and
+    the signals of the backpressure of the webhook. The metrics are readable only with the `METRICS_TOKEN`, the endpoint
+    is closed when it is not set.
+    """
+
+    def get(self, request: Request):
+        if not settings.METRICS_TOKEN:
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+        if not hmac.compare_digest(request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {settings.METRICS_TOKEN}"):
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+        return HttpResponse(exposition(process_registry(), backlog_registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,19 @@
+from __future__ import absolute_import, annotations
+
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+from common.warmup import is_ready, warm_up_seconds
+
+
+class ReadyView(APIView):
+    """
+    Report if the process serving the request completed its warm-up, for the readiness probe of the deployment.
+    """
+
+    def get(self, request: Request):
+        if not is_ready():
+            return JsonResponse({"ready": False}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return JsonResponse({"ready": True, "warmUpSeconds": warm_up_seconds()})
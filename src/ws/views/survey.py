@@ -1,15 +1,22 @@
 from __future__ import absolute_import, annotations
 
 import logging
+import time
+from datetime import datetime
 
+from django.conf import settings
 from django.http import JsonResponse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.views import APIView
 
+from common.metrics import WEBHOOK_REJECTIONS, WEBHOOK_REQUEST_DURATION
 from ws.models.survey import SurveyAnswer
 from ws.serializers.survey import SurveyEventSerializer
+from tasks.backpressure import backpressure
 from tasks.tasks import CeleryTask
+from tasks.timeline import Timeline
 
 
 logger = logging.getLogger("wenet-survey-web-app.ws.views.survey")
@@ -17,14 +24,38 @@ logger = logging.getLogger("wenet-survey-web-app.ws.views.survey")
 
 class SurveyEventView(APIView):
 
+    OUTCOMES = {
+        status.HTTP_200_OK: "accepted",
+        status.HTTP_400_BAD_REQUEST: "invalid",
+        status.HTTP_503_SERVICE_UNAVAILABLE: "throttled"
+    }
+
     def post(self, request: Request):
+        start = time.perf_counter()
+        response = self._handle_event(request, timezone.now())
+        WEBHOOK_REQUEST_DURATION.labels(outcome=self.OUTCOMES.get(response.status_code, "error")).observe(time.perf_counter() - start)
+        return response
+
+    def _handle_event(self, request: Request, received_at: datetime):
+        signal = backpressure.rejection_reason()
+        if signal is not None:
+            # the submission is retried by Tally once the profile updates keep up again
+            WEBHOOK_REJECTIONS.labels(signal=signal).inc()
+            response = JsonResponse({"message": f"The survey submissions are temporarily not accepted, the {signal} is above its threshold"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response["Retry-After"] = str(settings.WEBHOOK_RETRY_AFTER)
+            return response
+
         serializer = SurveyEventSerializer(data=request.data)
         if serializer.is_valid():
             try:
                 survey_event = serializer.save()
                 survey_answer = SurveyAnswer.from_tally(survey_event)
-                logger.info(f"Received an answer from user [{survey_answer.wenet_id}] with {len(survey_answer.answers.keys())} answers")
-                CeleryTask.update_user_profile(survey_answer)
+                timeline = Timeline(Timeline.generate_trace_id(), survey_answer.wenet_id)
+                timeline.mark("received", received_at)
+                logger.info(f"Received an answer from user [{survey_answer.wenet_id}] with {len(survey_answer.answers.keys())} answers, trace [{timeline.trace_id}]")
+                CeleryTask.update_user_profile(survey_answer, timeline.trace_id)
+                timeline.mark("enqueued")
+                timeline.save(attempt=False)
                 return JsonResponse({}, status=status.HTTP_200_OK)
             except ValueError as e:
                 logger.exception("Exception in extracting data from the survey event", exc_info=e)